@@ -1,8 +1,10 @@
 require 'docker'
 
-# Creates a report by analyzign an input dataset using the Dolos dockerfile
+# Creates a report by analyzign an input dataset, using a long-lived Dolos
+# worker from DolosWorkerPool if the pool is enabled, or the Dolos dockerfile
+# otherwise (or when no worker could be started).
 #
-# This is largely based on Dodona's SubmissionRunner
+# Running in Docker is largely based on Dodona's SubmissionRunner
 class AnalyzeDatasetJob < ApplicationJob
   queue_as :default
 
@@ -22,12 +24,12 @@ class AnalyzeDatasetJob < ApplicationJob
 
     prepare
     @dataset.zipfile.open do |zipfile_tmp|
-      execute(zipfile_tmp.path)
+      execute_in_worker(zipfile_tmp.path) || execute(zipfile_tmp.path)
     end
   rescue StandardError => e
     @report.update(
       status: 'error',
-      error: truncate("Error while running Docker: #{e}\n" + e.backtrace.join("\n"))
+      error: truncate("Error while running Dolos: #{e}\n" + e.backtrace.join("\n"))
     )
   ensure
     finalize
@@ -42,6 +44,58 @@ class AnalyzeDatasetJob < ApplicationJob
     @output_dir = @mount.join(OUTPUT_DIRNAME)
   end
 
+  # Analyzes the dataset with a worker of the pool. Returns false if the pool is
+  # disabled or no worker could be started, so Docker should be used instead.
+  def execute_in_worker(zipfile_path)
+    pool = DolosWorkerPool.instance
+    return false unless pool.enabled?
+
+    # Dolos only reads a path ending in .zip as a ZIP file, which the tempfile
+    # of the upload does not always do
+    input_path = @mount.join('input.zip')
+    FileUtils.ln_s(zipfile_path, input_path)
+
+    # The worker analyzes in a single thread, so its parsers stay loaded
+    options = { reportName: @dataset.name, workers: 1 }
+    options[:language] = @dataset.programming_language if @dataset.programming_language.present?
+
+    result = nil
+    begin
+      pool.with_worker do |worker|
+        result = worker.analyze(
+          paths: [input_path.to_s],
+          output: @output_dir,
+          options: options,
+          timeout: TIMEOUT,
+          memory_limit: MEMORY_LIMIT / 1_000_000
+        ) do |progress|
+          Rails.logger.debug { "Report #{@report.id}: #{progress['stage']} #{progress['done']}/#{progress['total']}" }
+        end
+      end
+    rescue DolosWorker::StartError => e
+      # A worker that stopped responding during the analysis is an error, but
+      # if it could not be started Docker is used instead
+      Rails.logger.warn("Analyzing report #{@report.id} in Docker: #{e.message}")
+      return false
+    end
+
+    exit_status = case result['error']
+                  when nil then 0
+                  when 'out-of-memory' then 137
+                  else 1
+                  end
+    # The worker logs the output of the analysis to its stderr
+    @report.update(
+      stdout: truncate(result['stderr']),
+      stderr: truncate([*result['warnings'], result['error']].compact.join("\n")),
+      exit_status: exit_status,
+      memory: result['peakHeap'] / (1024.0 * 1024.0),
+      run_time: result['runTime'] / 1000.0
+    )
+    collect_results(exit_status)
+    true
+  end
+
   def execute(zipfile_path)
     cmd = [
       '-V', # enable verbose errors
@@ -147,6 +201,10 @@ class AnalyzeDatasetJob < ApplicationJob
       run_time: (after_time - before_time)
     )
 
+    collect_results(exit_status)
+  end
+
+  def collect_results(exit_status)
     @report.collect_files_from(@output_dir)
 
     if exit_status == 137
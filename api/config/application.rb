@@ -14,6 +14,12 @@ module DolosApi
     config.front_end_base_url = nil # overwritten in production.rb, development.rb, testing.rb
     config.front_end_html_path = '#/share/'
 
+    # Analyze datasets with a pool of long-lived `dolos worker` processes
+    # instead of a Docker container per report when DOLOS_WORKERS is set. The
+    # Docker container is still used when no worker can be started.
+    config.dolos_workers = ENV.fetch('DOLOS_WORKERS', '0').to_i
+    config.dolos_worker_command = ENV.fetch('DOLOS_WORKER_COMMAND', 'dolos worker').split
+
     # Please, add to the `ignore` list any other `lib` subdirectories that do
     # not contain `.rb` files, or that should not be reloaded or eager loaded.
     # Common ones are `templates`, `generators`, or `middleware`, for example.
@@ -0,0 +1,109 @@
+require 'json'
+require 'io/wait'
+require 'open3'
+
+# A long-lived `dolos worker` process, which analyzes datasets on request.
+#
+# Requests and responses are exchanged as lines of JSON over stdin and stdout
+# of the process, see cli/src/cli/commands/worker.ts. The worker keeps the
+# parsers loaded between requests, so only the first analysis pays for
+# starting Node.js and loading the parsers.
+class DolosWorker
+  # Raised when the process could not be started or stopped responding. The
+  # worker is stopped and should not be used anymore.
+  class Error < StandardError; end
+
+  # Raised when the process could not be started.
+  class StartError < Error; end
+
+  # How long to wait for the process to start
+  START_TIMEOUT = 30.seconds
+  # How long to wait for a result after the timeout of the request, the
+  # worker aborts the analysis itself when it takes too long
+  GRACE_PERIOD = 15.seconds
+
+  def initialize(command)
+    @stdin, @stdout, @stderr, @thread = Open3.popen3(*command)
+    @stdin.sync = true
+    @stderr_lines = []
+    # Drain stderr, so the process does not block when its buffer is full
+    @stderr_reader = Thread.new do
+      @stderr.each_line { |line| @stderr_lines << line }
+    rescue IOError
+      nil
+    end
+    @next_id = 0
+
+    ready = read_response(Time.zone.now + START_TIMEOUT)
+    raise Error, "Unexpected first response of the worker: #{ready}" unless ready['type'] == 'ready'
+  rescue StandardError => e
+    stop
+    raise StartError, "Could not start the Dolos worker: #{e.message}"
+  end
+
+  def alive?
+    @thread.alive?
+  end
+
+  # Analyzes the given paths and writes the report to the output directory.
+  # Yields the progress events of the analysis, and returns the result as a
+  # hash with the keys of WorkerResult: status, error, warnings, runTime (in
+  # milliseconds) and peakHeap (in bytes), and the lines written to stderr
+  # during the analysis.
+  def analyze(paths:, output:, options: {}, timeout:, memory_limit:)
+    @next_id += 1
+    id = @next_id.to_s
+    @stderr_lines.clear
+    request = {
+      id: id,
+      paths: paths,
+      output: output.to_s,
+      options: options,
+      timeout: timeout.to_f,
+      memoryLimit: memory_limit
+    }
+    @stdin.puts(request.to_json)
+
+    deadline = Time.zone.now + timeout + GRACE_PERIOD
+    loop do
+      response = read_response(deadline)
+      next unless response['id'] == id
+
+      case response['type']
+      when 'progress'
+        yield response if block_given?
+      when 'result'
+        return response.merge('stderr' => @stderr_lines.join)
+      end
+    end
+  rescue StandardError => e
+    stop
+    raise Error, "The Dolos worker stopped responding: #{e.message}"
+  end
+
+  def stop
+    @stdin&.close unless @stdin&.closed?
+    return unless @thread&.alive?
+
+    Process.kill('KILL', @thread.pid)
+    @thread.join(5)
+  rescue Errno::ESRCH
+    nil
+  end
+
+  private
+
+  def read_response(deadline)
+    loop do
+      remaining = deadline - Time.zone.now
+      raise Error, 'timeout' if remaining <= 0
+      raise Error, 'no response in time' unless @stdout.wait_readable(remaining)
+
+      line = @stdout.gets
+      raise Error, "the process exited#{": #{@stderr_lines.join.strip}" if @stderr_lines.any?}" if line.nil?
+      next if line.strip.empty?
+
+      return JSON.parse(line)
+    end
+  end
+end
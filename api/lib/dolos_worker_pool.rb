@@ -0,0 +1,89 @@
+# A pool of long-lived Dolos workers (see DolosWorker), shared by the jobs of
+# this process. Workers are started when they are first needed, and replaced
+# when they stopped responding.
+#
+# The pool is configured with `config.dolos_workers` (the maximum amount of
+# workers, 0 disables the pool) and `config.dolos_worker_command`.
+class DolosWorkerPool
+  def self.instance
+    @instance ||= new(
+      Rails.configuration.dolos_workers,
+      Rails.configuration.dolos_worker_command
+    )
+  end
+
+  def initialize(size, command)
+    @size = size
+    @command = command
+    @idle = []
+    @started = 0
+    @mutex = Mutex.new
+    @available = ConditionVariable.new
+  end
+
+  def enabled?
+    @size.positive?
+  end
+
+  # Yields an idle worker, starting one if there are less than `size`
+  # workers, or waiting until a worker is idle otherwise. Raises a
+  # DolosWorker::StartError if a worker could not be started.
+  def with_worker
+    worker = checkout
+    begin
+      yield worker
+    ensure
+      checkin(worker)
+    end
+  end
+
+  def shutdown
+    @mutex.synchronize do
+      @idle.each(&:stop)
+      @started -= @idle.length
+      @idle.clear
+    end
+  end
+
+  private
+
+  def checkout
+    @mutex.synchronize do
+      loop do
+        while (worker = @idle.pop)
+          return worker if worker.alive?
+
+          # A worker that stopped is replaced
+          worker.stop
+          @started -= 1
+        end
+        break if @started < @size
+
+        @available.wait(@mutex)
+      end
+      @started += 1
+    end
+    start
+  end
+
+  def start
+    DolosWorker.new(@command)
+  rescue StandardError
+    @mutex.synchronize do
+      @started -= 1
+      @available.signal
+    end
+    raise
+  end
+
+  def checkin(worker)
+    @mutex.synchronize do
+      if worker.alive?
+        @idle.push(worker)
+      else
+        @started -= 1
+      end
+      @available.signal
+    end
+  end
+end
@@ -13,6 +13,15 @@ class AnalyzeDatasetJobTest < ActiveJob::TestCase
     assert @report.all_files_present?
   end
 
+  test 'should fall back to docker when no worker can be started' do
+    DolosWorkerPool.stubs(:instance).returns(DolosWorkerPool.new(1, ['false']))
+
+    AnalyzeDatasetJob.perform_now(@report)
+    assert_nil @report.error
+    assert_equal 'finished', @report.status
+    assert @report.all_files_present?
+  end
+
   test 'should detect programming language' do
     assert_nil @report.dataset.programming_language
 
@@ -0,0 +1,74 @@
+#!/usr/bin/env node
+// Measures the cold-start time of the Dolos CLI: showing the help text and a
+// small analysis of two files. Every run starts a new node process, so the
+// times include loading the modules and native bindings.
+//
+// Usage: node benchmark/startup.mjs [--runs <n>] [--output <file>] [--baseline <file>]
+//
+// With --output the results are written as JSON, with --baseline they are
+// compared with the results of an earlier run.
+import { spawnSync } from "node:child_process";
+import { mkdtempSync, readFileSync, rmSync, writeFileSync } from "node:fs";
+import { tmpdir } from "node:os";
+import { fileURLToPath } from "node:url";
+import path from "node:path";
+
+const root = path.dirname(path.dirname(fileURLToPath(import.meta.url)));
+const cli = path.join(root, "dist", "cli.js");
+const samples = path.join(root, "..", "samples", "javascript");
+
+const output = mkdtempSync(path.join(tmpdir(), "dolos-startup-"));
+
+const scenarios = {
+  "help": () => ["run", "--help"],
+  "two files": run => [
+    "run", "-f", "csv", "-o", path.join(output, `run-${run}`),
+    path.join(samples, "sample.js"), path.join(samples, "copy_of_sample.js"),
+  ],
+};
+
+function option(name, fallback) {
+  const index = process.argv.indexOf(name);
+  return index >= 0 ? process.argv[index + 1] : fallback;
+}
+
+function median(values) {
+  const sorted = [...values].sort((a, b) => a - b);
+  const middle = Math.floor(sorted.length / 2);
+  return sorted.length % 2 ? sorted[middle] : (sorted[middle - 1] + sorted[middle]) / 2;
+}
+
+const runs = parseInt(option("--runs", "10"));
+const results = {};
+for (const [name, args] of Object.entries(scenarios)) {
+  const times = [];
+  for (let i = 0; i < runs; i++) {
+    const start = process.hrtime.bigint();
+    const result = spawnSync(process.execPath, [cli, ...args(i)], { stdio: "ignore" });
+    const time = Number(process.hrtime.bigint() - start) / 1e6;
+    if (result.status !== 0) {
+      rmSync(output, { recursive: true });
+      console.error(`"${name}" exited with status ${result.status}`);
+      process.exit(1);
+    }
+    times.push(time);
+  }
+  results[name] = { median: median(times), min: Math.min(...times), max: Math.max(...times), runs };
+}
+rmSync(output, { recursive: true });
+
+const baselinePath = option("--baseline");
+const baseline = baselinePath ? JSON.parse(readFileSync(baselinePath, "utf-8")) : {};
+for (const [name, { median, min, max }] of Object.entries(results)) {
+  let line = `${name.padEnd(12)} median ${median.toFixed(1)} ms (min ${min.toFixed(1)}, max ${max.toFixed(1)})`;
+  if (baseline[name]) {
+    const change = (median / baseline[name].median - 1) * 100;
+    line += `, ${change >= 0 ? "+" : ""}${change.toFixed(1)}% compared to the baseline`;
+  }
+  console.log(line);
+}
+
+const resultsPath = option("--output");
+if (resultsPath) {
+  writeFileSync(resultsPath, JSON.stringify(results, null, 2));
+}
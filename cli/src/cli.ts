@@ -3,6 +3,7 @@ import * as Utils from "./cli/util/utils.js";
 import { Command } from "commander";
 import { runCommand } from "./cli/commands/run.js";
 import { serveCommand } from "./cli/commands/serve.js";
+import { workerCommand } from "./cli/commands/worker.js";
 import { readFileSync } from "fs";
 
 const pkg = JSON.parse(readFileSync(new URL("../package.json", import.meta.url), "utf-8"));
@@ -27,4 +28,5 @@ program
 program
   .addCommand(runCommand(program), { isDefault: true })
   .addCommand(serveCommand(program))
+  .addCommand(workerCommand(program))
   .parse(process.argv);
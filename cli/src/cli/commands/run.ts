@@ -6,19 +6,17 @@ import {
 } from "../util/utils.js";
 
 import { DEFAULT_HOST, DEFAULT_PORT } from "../server.js";
-import { TerminalView } from "../views/terminalView.js";
-import { FileView } from "../views/fileView.js";
-import { WebView } from "../views/webView.js";
+import { View } from "../views/view.js";
 import { Command } from "commander";
 import * as Utils from "../util/utils.js";
-import { Dolos, Options } from "@dodona/dolos-lib";
+import { Dolos, Options, phases, Report, saveIndex } from "@dodona/dolos-lib";
 
 export function runCommand(program: Command): Command {
   return new Command("run")
     .argument(
       "<paths...>",
-      "Input file(s) for the analysis. Can be a list of source code files, " +
-      "a CSV-file, or a zip-file with a top level info.csv file."
+      "Input file(s) for the analysis. Can be a list of source code files " +
+      "and directories, a CSV-file, or a zip-file with a top level info.csv file."
     )
     .description("Run an analysis and show the results.")
     .option(
@@ -97,6 +95,17 @@ export function runCommand(program: Command): Command {
       ),
       x => parseFloat(x),
     )
+    .option(
+      "--min-shared-fingerprints <integer>",
+      Utils.indent(
+        "The minimum amount of fingerprints two files should share before " +
+        "they are compared. Pairs of files sharing fewer fingerprints are " +
+        "not reported. Use 0 to compare every pair of files.",
+        Options.defaultMinSharedFingerprints
+      ),
+      x => parseFloat(x),
+      Options.defaultMinSharedFingerprints
+    )
     .option(
       "-f, --output-format <format>",
       Utils.indent(
@@ -172,6 +181,125 @@ export function runCommand(program: Command): Command {
         "Include the comments during the tokenization process."
       )
     )
+    .option(
+      "--freeze-index",
+      Utils.indent(
+        "Convert the fingerprint index to a compact read-only representation " +
+        "after all files are added. This reduces the memory usage on large datasets."
+      )
+    )
+    .option(
+      "--workers <integer>",
+      Utils.indent(
+        "The number of worker threads used to tokenize the files. " +
+        "Use 1 to tokenize all files on the main thread.",
+        Options.defaultWorkers
+      ),
+      x => parseInt(x),
+      Options.defaultWorkers
+    )
+    .option(
+      "--hash-engine <name>",
+      Utils.indent(
+        "The hash function used for the fingerprints. Options are 'default', " +
+        "'imul32' (faster) and 'dual52' (fewer hash collisions on large datasets).",
+        Options.defaultHashEngine
+      ),
+      Options.defaultHashEngine
+    )
+    .option(
+      "--parallel-scoring",
+      Utils.indent(
+        "Compute the similarity of the pairs of files using the worker threads " +
+        "set with --workers. This also freezes the fingerprint index (see --freeze-index)."
+      )
+    )
+    .option(
+      "--cache-dir <path>",
+      Utils.indent(
+        "Store the tokenized files in this directory, so unchanged files do not " +
+        "need to be parsed again when Dolos is run on them later."
+      )
+    )
+    .option(
+      "--cache-max-size <megabytes>",
+      Utils.indent(
+        "The maximum size of the cache directory, the least recently used " +
+        "files are removed when the cache grows larger.",
+        Options.defaultCacheMaxSize
+      ),
+      x => parseInt(x),
+      Options.defaultCacheMaxSize
+    )
+    .option(
+      "--against <path>",
+      Utils.indent(
+        "Compare the given files against the files in an index snapshot (see " +
+        "--save-index) instead of with each other. Only the pairs of the given files " +
+        "are reported, with at most --limit-results pairs per file."
+      )
+    )
+    .option(
+      "--compress",
+      Utils.indent(
+        "Write the CSV files of the report gzip-compressed (e.g. pairs.csv.gz). " +
+        "Only has effect when the output format is 'csv' or 'web'."
+      )
+    )
+    .option(
+      "--progress",
+      Utils.indent(
+        "Print the progress of the analysis to stderr, as lines like " +
+        "'[progress] tokenize 120/500' (stage, done and total)."
+      )
+    )
+    .option(
+      "--timeout <seconds>",
+      Utils.indent(
+        "Stop the analysis with an error if it takes longer than this amount of seconds."
+      ),
+      x => parseFloat(x)
+    )
+    .option(
+      "--profile",
+      Utils.indent(
+        "Print how long each phase of the analysis took and how much data was " +
+        "processed to stderr when done. These are also stored in the metadata of the report."
+      )
+    )
+    .option(
+      "--exclude <pattern>",
+      Utils.indent(
+        "Skip the files and directories matching this glob pattern when reading " +
+        "a directory. Can be given multiple times. Patterns without a '/' are " +
+        "matched against every file and directory name. Hidden files and " +
+        "node_modules are skipped if no patterns are given."
+      ),
+      (x, acc: string[] = []) => [...acc, x]
+    )
+    .option(
+      "--max-file-size <kilobytes>",
+      Utils.indent(
+        "Skip the files in a directory that are larger than this size.",
+        Options.defaultMaxFileSize
+      ),
+      x => parseInt(x),
+      Options.defaultMaxFileSize
+    )
+    .option(
+      "--low-memory",
+      Utils.indent(
+        "Move the tokens of the files to a temporary file once their fingerprints " +
+        "are computed, to analyze large datasets with less memory."
+      )
+    )
+    .option(
+      "--save-index <path>",
+      Utils.indent(
+        "Write a snapshot of the fingerprint index of the analyzed files to this " +
+        "file, so it can be loaded again without parsing the files."
+      )
+    )
     .action(async (locations, options) => run(locations, { ...options , ...program.opts() }));
 }
 
@@ -185,6 +313,35 @@ interface RunOptions extends Options {
   outputFormat: string;
   outputDestination: string;
   ignore: string;
+  saveIndex?: string;
+  compress?: boolean;
+  profile?: boolean;
+  progress?: boolean;
+  timeout?: number;
+}
+
+// Pairs are scored when the report is shown, so the progress is printed from a
+// hook instead of the progress stream of the analysis
+const printProgress = Utils.throttleProgress(({ stage, done, total }) =>
+  console.error(`[progress] ${stage} ${done}/${total}`)
+);
+
+function printProfile(report: Report): void {
+  const { durations, counters } = report.profile;
+  const rows: Array<[string, string]> = [
+    ...phases.map((phase): [string, string] => [phase, `${durations[phase].toFixed(1)} ms`]),
+    ["files", counters.files.toString()],
+    ["tokens", counters.tokens.toString()],
+    ["kgrams", counters.kgrams.toString()],
+    ["fingerprints", counters.fingerprints.toString()],
+    ["ignored fingerprints", counters.ignoredFingerprints.toString()],
+    ["peak heap", `${(counters.peakHeap / 1024 / 1024).toFixed(1)} MB`],
+  ];
+  const width = Math.max(...rows.map(([name]) => name.length)) + 2;
+  console.error("Profile:");
+  for (const [name, value] of rows) {
+    console.error(`  ${name.padEnd(width)}${value}`);
+  }
 }
 
 export async function run(locations: string[], options: RunOptions): Promise<void> {
@@ -199,6 +356,13 @@ export async function run(locations: string[], options: RunOptions): Promise<voi
   }
 
   await tryCatch(options.verbose, async () => {
+    // setTimeout fires immediately for delays that do not fit in 32 bits
+    const maxTimeout = Math.floor((2 ** 31 - 1) / 1000);
+    const timeout = options.timeout;
+    if (timeout !== undefined && !(timeout > 0 && timeout <= maxTimeout)) {
+      throw new Error(`timeout must be a positive number of at most ${maxTimeout} seconds, but was ${timeout}`);
+    }
+
     const dolos = new Dolos({
       reportName: options.name,
       kgramData: options.compare,
@@ -209,29 +373,76 @@ export async function run(locations: string[], options: RunOptions): Promise<voi
       maxFingerprintPercentage: options.maxFingerprintPercentage,
       minFragmentLength: options.minFragmentLength,
       minSimilarity: options.minSimilarity,
+      minSharedFingerprints: options.minSharedFingerprints,
       limitResults: options.limitResults,
       sortBy: options.sortBy,
       fragmentSortBy: options.fragmentSortBy,
-      includeComments: options.includeComments
-    });
-    const report = await dolos.analyzePaths(locations, options.ignore);
+      includeComments: options.includeComments,
+      freezeIndex: options.freezeIndex,
+      workers: options.workers,
+      parallelScoring: options.parallelScoring,
+      hashEngine: options.hashEngine,
+      cacheDir: options.cacheDir,
+      cacheMaxSize: options.cacheMaxSize,
+      against: options.against,
+      maxFileSize: options.maxFileSize,
+      exclude: options.exclude,
+      lowMemory: options.lowMemory
+    }, options.progress ? { progress: printProgress } : {});
+
+    // Stop the analysis (and its workers) when interrupted or when it takes too long
+    const controller = new AbortController();
+    const interrupt = (): void => controller.abort(new Error("The analysis was interrupted"));
+    process.once("SIGINT", interrupt);
+    process.once("SIGTERM", interrupt);
+    const timer = timeout === undefined ? undefined : setTimeout(
+      () => controller.abort(new Error(`The analysis took longer than ${timeout} seconds`)),
+      timeout * 1000
+    );
+
+    let report: Report;
+    try {
+      report = await dolos.analyzePaths(locations, options.ignore, controller.signal);
+    } finally {
+      clearTimeout(timer);
+      process.off("SIGINT", interrupt);
+      process.off("SIGTERM", interrupt);
+    }
 
     if (report.warnings.length > 0) {
       report.warnings.forEach(warn => warning(warn));
     }
 
+    if (options.saveIndex) {
+      await saveIndex(report.index, options.saveIndex);
+    }
+
+    // The views are only imported when they are used to keep startup fast
+    const terminal = async (): Promise<View> =>
+      new (await import("../views/terminalView.js")).TerminalView(report, options);
+    const web = async (): Promise<View> =>
+      new (await import("../views/webView.js")).WebView(report, options);
     const view = closestMatch(options.outputFormat, {
-      "terminal": () => new TerminalView(report, options),
-      "console": () => new TerminalView(report, options),
-      "csv": () => new FileView(report, options),
-      "html": () => new WebView(report, options),
-      "web": () => new WebView(report, options),
+      "terminal": terminal,
+      "console": terminal,
+      "csv": async () => new (await import("../views/fileView.js")).FileView(report, options),
+      "html": web,
+      "web": web,
     });
 
     if (view == null) {
       throw new Error(`Invalid output format: ${options.outputFormat}`);
     }
 
-    await view().show();
+    try {
+      await (await view()).show();
+    } finally {
+      // Removes the tokens offloaded in low-memory mode
+      dolos.close();
+    }
+
+    if (options.profile) {
+      printProfile(report);
+    }
   });
 }
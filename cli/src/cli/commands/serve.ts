@@ -49,7 +49,9 @@ export async function serve(reportDir: string, options: ServeOptions): Promise<v
   tryCatch(options.verbose, async () => {
     try {
       for (const file of ["files.csv", "kgrams.csv", "metadata.csv", "pairs.csv"]) {
-        await fs.access(path.join(reportDir, file), constants.R_OK);
+        const location = path.join(reportDir, file);
+        await fs.access(location, constants.R_OK)
+          .catch(() => fs.access(`${location}.gz`, constants.R_OK));
       }
     } catch (e) {
       error(e.message);
@@ -0,0 +1,264 @@
+import { Command } from "commander";
+import { performance } from "node:perf_hooks";
+import { createInterface } from "node:readline";
+import { Worker } from "node:worker_threads";
+import { CustomOptions, ProgressEvent } from "@dodona/dolos-lib";
+import * as Utils from "../util/utils.js";
+import { setLogging, throttleProgress, tryCatch } from "../util/utils.js";
+
+/**
+ * A request to analyze a dataset and write its report as CSV files, read as
+ * one line of JSON from stdin.
+ */
+export interface WorkerRequest {
+  id: string;
+  // The files, directories, CSV or ZIP files to analyze (see `dolos run`)
+  paths: string[];
+  // The directory to write the report to, which should not exist yet
+  output: string;
+  ignore?: string;
+  // The options of the analysis, which always runs with `workers: 1`
+  options?: CustomOptions;
+  compress?: boolean;
+  // Limits of this request, the defaults of the worker are used if missing
+  timeout?: number;
+  memoryLimit?: number;
+}
+
+/**
+ * The lines of JSON written to stdout: once `ready` when the worker started,
+ * then the progress and (exactly one) result of each request in order.
+ */
+export type WorkerResponse =
+  { type: "ready", version: string } |
+  { type: "progress", id: string } & ProgressEvent |
+  { type: "result", id: string } & WorkerResult;
+
+export interface WorkerResult {
+  status: "finished" | "failed";
+  // "timeout", "out-of-memory" or the message of the error when failed
+  error: string | null;
+  warnings: string[];
+  // In milliseconds
+  runTime: number;
+  // The peak used heap of the analysis, in bytes
+  peakHeap: number;
+}
+
+/**
+ * The messages sent to an analysis thread (see workerThread.ts).
+ */
+export type ThreadRequest =
+  { type: "preload", languages: string[] } |
+  { type: "analyze", request: WorkerRequest } |
+  { type: "abort" };
+
+/**
+ * The messages sent back by an analysis thread.
+ */
+export type ThreadResponse =
+  { type: "progress" } & ProgressEvent |
+  { type: "result", result: WorkerResult };
+
+interface WorkerOptions {
+  timeout: number;
+  memoryLimit: number;
+  preload: string[];
+  verbose: boolean;
+}
+
+export function workerCommand(program: Command): Command {
+  return new Command("worker")
+    .description(
+      "Run a long-lived worker that analyzes datasets on request. Requests are " +
+      "read as lines of JSON from stdin, their progress and results are written " +
+      "as lines of JSON to stdout. Parsers stay loaded between requests."
+    )
+    .option(
+      "--timeout <seconds>",
+      Utils.indent(
+        "The default maximum time of an analysis, requests can set their own timeout.",
+        "60"
+      ),
+      x => parseFloat(x),
+      60
+    )
+    .option(
+      "--memory-limit <megabytes>",
+      Utils.indent(
+        "The default maximum heap size of an analysis, requests can set their own limit.",
+        "2000"
+      ),
+      x => parseInt(x),
+      2000
+    )
+    .option(
+      "--preload <language...>",
+      Utils.indent(
+        "Load the parsers of these languages when the worker starts."
+      ),
+      []
+    )
+    .action(options => worker({ ...options, ...program.opts() }));
+}
+
+/**
+ * Runs the analyses in a worker thread with a limited heap, which is reused
+ * for the next request (so parsers stay loaded) unless it was stopped or the
+ * next request has a different memory limit.
+ */
+class AnalysisThread {
+
+  // How long to wait for an aborted analysis before terminating the thread
+  public static readonly abortGracePeriod = 5000;
+
+  private readonly thread: Worker;
+  private stopped = false;
+
+  constructor(public readonly memoryLimit: number, preload: string[]) {
+    this.thread = new Worker(new URL("../workerThread.js", import.meta.url), {
+      resourceLimits: { maxOldGenerationSizeMb: memoryLimit },
+      // stdout is reserved for the responses
+      stdout: true,
+    });
+    this.thread.stdout.pipe(process.stderr);
+    // The analysis in progress handles errors as well, see analyze
+    this.thread.on("error", () => this.stopped = true);
+    this.thread.on("exit", () => this.stopped = true);
+    if (preload.length > 0) {
+      this.post({ type: "preload", languages: preload });
+    }
+  }
+
+  get isStopped(): boolean {
+    return this.stopped;
+  }
+
+  private post(message: ThreadRequest): void {
+    this.thread.postMessage(message);
+  }
+
+  public async terminate(): Promise<void> {
+    this.stopped = true;
+    await this.thread.terminate();
+  }
+
+  public analyze(
+    request: WorkerRequest,
+    timeout: number,
+    onProgress: (event: ProgressEvent) => void
+  ): Promise<WorkerResult> {
+    const start = performance.now();
+    const failed = (error: string): WorkerResult =>
+      ({ status: "failed", error, warnings: [], runTime: performance.now() - start, peakHeap: 0 });
+
+    return new Promise(resolve => {
+      let abortTimer: NodeJS.Timeout | undefined = undefined;
+      let killTimer: NodeJS.Timeout | undefined = undefined;
+      const done = (result: WorkerResult): void => {
+        clearTimeout(abortTimer);
+        clearTimeout(killTimer);
+        this.thread.off("message", onMessage);
+        this.thread.off("error", onError);
+        this.thread.off("exit", onExit);
+        resolve(result);
+      };
+      const onMessage = (message: ThreadResponse): void => {
+        if (message.type === "progress") {
+          const { stage, done, total } = message;
+          onProgress({ stage, done, total });
+        } else {
+          done(message.result);
+        }
+      };
+      const onError = (error: Error & { code?: string }): void => {
+        this.stopped = true;
+        done(failed(error.code === "ERR_WORKER_OUT_OF_MEMORY" ? "out-of-memory" : error.message));
+      };
+      const onExit = (code: number): void => {
+        done(failed(`The analysis thread stopped with exit code ${code}`));
+      };
+      this.thread.on("message", onMessage);
+      this.thread.on("error", onError);
+      this.thread.on("exit", onExit);
+
+      // Abort the analysis when it takes too long, and stop the thread if it
+      // does not respond to that in time (e.g. while writing the report)
+      abortTimer = setTimeout(() => {
+        this.post({ type: "abort" });
+        killTimer = setTimeout(() => {
+          done(failed("timeout"));
+          this.terminate();
+        }, AnalysisThread.abortGracePeriod);
+      }, timeout * 1000);
+
+      this.post({ type: "analyze", request });
+    });
+  }
+}
+
+/**
+ * Parses a line of JSON as a request. The error has the id of the request if
+ * the line is valid JSON with an id.
+ */
+function parseRequest(line: string): WorkerRequest {
+  const request = JSON.parse(line);
+  if (typeof request?.id !== "string" || !Array.isArray(request.paths) || typeof request.output !== "string") {
+    throw Object.assign(
+      new Error("a request needs an id, paths and an output directory"),
+      { id: typeof request?.id === "string" ? request.id : undefined }
+    );
+  }
+  return request;
+}
+
+function respond(response: WorkerResponse): void {
+  process.stdout.write(JSON.stringify(response) + "\n");
+}
+
+export async function worker(options: WorkerOptions): Promise<void> {
+  if (options.verbose) {
+    setLogging("info");
+  }
+
+  await tryCatch(options.verbose, async () => {
+    let thread = new AnalysisThread(options.memoryLimit, options.preload);
+    respond({ type: "ready", version: process.version });
+
+    // Requests are handled one at a time, in the order they are received
+    for await (const line of createInterface({ input: process.stdin, crlfDelay: Infinity })) {
+      if (line.trim() === "") {
+        continue;
+      }
+      let request: WorkerRequest;
+      try {
+        request = parseRequest(line);
+      } catch (e) {
+        respond({
+          type: "result",
+          id: e.id ?? "",
+          status: "failed",
+          error: `Invalid request: ${e.message}`,
+          warnings: [],
+          runTime: 0,
+          peakHeap: 0,
+        });
+        continue;
+      }
+
+      const memoryLimit = request.memoryLimit ?? options.memoryLimit;
+      if (thread.isStopped || thread.memoryLimit !== memoryLimit) {
+        await thread.terminate();
+        thread = new AnalysisThread(memoryLimit, options.preload);
+      }
+      const result = await thread.analyze(
+        request,
+        request.timeout ?? options.timeout,
+        throttleProgress(event => respond({ type: "progress", id: request.id, ...event }))
+      );
+      respond({ type: "result", id: request.id, ...result });
+    }
+
+    await thread.terminate();
+  });
+}
@@ -61,11 +61,21 @@ export default async function runServer(
     }
 
     fs.readFile(filePath, (err, data) => {
-      if (err) {
-        notFound(response);
-      } else {
+      if (!err) {
         response.writeHead(200, { "Content-Type": type });
         response.end(data);
+      } else if (reqPath.startsWith("/data")) {
+        // Reports can be written with gzip-compressed files
+        fs.readFile(`${filePath}.gz`, (gzErr, gzData) => {
+          if (gzErr) {
+            notFound(response);
+          } else {
+            response.writeHead(200, { "Content-Type": type, "Content-Encoding": "gzip" });
+            response.end(gzData);
+          }
+        });
+      } else {
+        notFound(response);
       }
     });
   });
@@ -1,4 +1,4 @@
-import { LanguageError } from "@dodona/dolos-lib";
+import { LanguageError, ProgressEvent } from "@dodona/dolos-lib";
 /*
  * This module contains shared helper functions.
  */
@@ -144,3 +144,21 @@ export async function tryCatch(verbose: boolean, run: () => Promise<void>): Prom
 
 
 
+
+/**
+ * Returns a callback passing the progress events to `report`, at most every
+ * `interval` milliseconds per stage and when a stage is done.
+ */
+export function throttleProgress(
+  report: (event: ProgressEvent) => void,
+  interval = 250
+): (event: ProgressEvent) => void {
+  const reported = new Map<string, number>();
+  return event => {
+    const now = Date.now();
+    if (event.done === event.total || now - (reported.get(event.stage) ?? 0) >= interval) {
+      reported.set(event.stage, now);
+      report(event);
+    }
+  };
+}
@@ -1,22 +1,34 @@
 import { View } from "./view.js";
 import { stringify } from "csv-stringify";
 import { Writable } from "stream";
+import { once } from "node:events";
+import { pipeline } from "node:stream/promises";
+import { createGzip } from "node:zlib";
 import { createWriteStream, promises as fs } from "fs";
 import {
   Report,
   Pair,
   SharedFingerprint,
-  FileEntry
+  FileEntry,
+  FrozenIndex,
+  TokenEncoding,
+  TokenTable,
+  TokenizedFile
 } from "@dodona/dolos-lib";
 
-function writeCSVto<T>(
+/**
+ * Writes the data as CSV to the given stream, one row at a time. Waits when
+ * the stream is full (so the rows are not all buffered in memory) and until
+ * the stream is finished.
+ */
+async function writeCSVto<T>(
   out: Writable,
-  data: T[],
+  data: Iterable<T>,
   extractor: {[field: string]: (obj: T) => string | number | null}
-): void {
+): Promise<void> {
 
   const csv = stringify();
-  csv.pipe(out);
+  const written = pipeline(csv, out);
 
   const keys: string[] = [];
   const extractors: Array<(obj: T) => string | number | null> = [];
@@ -27,23 +39,34 @@ function writeCSVto<T>(
 
   csv.write(keys);
   for(const datum of data) {
-    csv.write(extractors.map(e => e(datum)));
+    if (!csv.write(extractors.map(e => e(datum)))) {
+      await Promise.race([once(csv, "drain"), written]);
+    }
   }
   csv.end();
+  await written;
 }
 
 export interface Options {
   outputDestination?: string;
+  compress?: boolean;
 }
 
 export class FileView extends View {
 
   protected outputDestination: string;
+  protected compress: boolean;
+
+  // The distinct tokens of the written files, stored once in the metadata
+  private readonly vocabulary = new TokenTable();
+  // For each token table of the files, the index in the vocabulary of its ids
+  private readonly vocabularyIndices: Map<TokenTable, Array<number>> = new Map();
 
   constructor(protected report: Report, options: Options) {
     super();
     this.outputDestination =
       options.outputDestination || this.createName();
+    this.compress = options.compress === true;
   }
 
   private createName(): string {
@@ -52,10 +75,10 @@ export class FileView extends View {
     return `dolos-report-${ timestamp }-${ dashedName }`;
   }
 
-  public writePairs(out: Writable): void {
-    writeCSVto<Pair>(
+  public async writePairs(out: Writable): Promise<void> {
+    await writeCSVto<Pair>(
       out,
-      this.report.allPairs(),
+      this.report.iteratePairs(),
       {
         "id": p => p.id,
         "leftFileId": p => p.leftFile.id,
@@ -70,10 +93,10 @@ export class FileView extends View {
       });
   }
 
-  public writekgrams(out: Writable): void {
-    writeCSVto<SharedFingerprint>(
+  public async writekgrams(out: Writable): Promise<void> {
+    await writeCSVto<SharedFingerprint>(
       out,
-      this.report.sharedFingerprints(),
+      this.report.iterateSharedFingerprints(),
       {
         "id": s => s.id,
         "hash": s => s.hash,
@@ -83,25 +106,63 @@ export class FileView extends View {
       });
   }
 
-  public writeFiles(out: Writable): void {
-    writeCSVto<FileEntry>(
+  public async writeFiles(out: Writable): Promise<void> {
+    const report = this.report;
+    function* entries(): Iterable<FileEntry> {
+      yield* report.entries();
+      yield* report.ignoredEntries();
+    }
+    await writeCSVto<FileEntry>(
       out,
-      this.report.entries().concat(this.report.ignoredEntries()),
+      entries(),
       {
         "id": f => f.file.id,
         "ignored": f => f.isIgnored ? "true" : "false",
         "path": f => f.file.path,
         "content": f => f.file.content,
-        "amountOfKgrams": f => f.kgrams.length,
-        "ast": f => JSON.stringify(f.file.tokens),
-        "mapping": f => JSON.stringify(f.file.mapping),
+        "amountOfKgrams": f => FrozenIndex.kgramCount(f),
+        "ast": f => this.encodeTokens(f.file),
+        "mapping": f => TokenEncoding.encodeMapping(f.file.packedMapping),
         "extra": f => JSON.stringify(f.file.extra)
       });
   }
 
-  public writeMetadata(out: Writable): void {
-    const metaData = this.report.metadata();
-    writeCSVto<[string, string]>(
+  /**
+   * Encodes the tokens of the file as indices in the vocabulary of the report,
+   * adding its tokens to the vocabulary.
+   */
+  private encodeTokens(file: TokenizedFile): string {
+    // Offloaded files read their ids from disk on every access
+    const ids = file.tokenIds;
+    if (ids === null) {
+      return TokenEncoding.encodeTokens(file.decodeTokens().map(token => this.vocabulary.intern(token)));
+    }
+    const table = file.table!;
+    let indices = this.vocabularyIndices.get(table);
+    if (indices === undefined) {
+      indices = [];
+      this.vocabularyIndices.set(table, indices);
+    }
+    const encoded = new Uint32Array(ids.length);
+    for (let i = 0; i < encoded.length; i++) {
+      const id = ids[i];
+      indices[id] ??= this.vocabulary.intern(table.token(id));
+      encoded[i] = indices[id];
+    }
+    return TokenEncoding.encodeTokens(encoded);
+  }
+
+  /**
+   * Writes the metadata of the report. Should be written after the files, it
+   * contains the vocabulary of their tokens.
+   */
+  public async writeMetadata(out: Writable): Promise<void> {
+    const vocabulary = Array.from({ length: this.vocabulary.size }, (_, i) => this.vocabulary.token(i));
+    const metaData = {
+      ...this.report.metadata(),
+      tokenVocabulary: JSON.stringify(vocabulary),
+    };
+    await writeCSVto<[string, string]>(
       out,
       Object.entries(metaData),
       {
@@ -111,6 +172,23 @@ export class FileView extends View {
       });
   }
 
+  /**
+   * Writes a file of the report with the given writer, gzip-compressed (with
+   * an extra `.gz` extension) if compression is enabled. Resolves when all data
+   * is written to disk.
+   */
+  private async writeOutput(location: string, write: (out: Writable) => Promise<void>): Promise<void> {
+    if (!this.compress) {
+      await write(createWriteStream(location));
+      return;
+    }
+    const gzip = createGzip();
+    await Promise.all([
+      pipeline(gzip, createWriteStream(`${location}.gz`)),
+      write(gzip),
+    ]);
+  }
+
   async writeToDirectory(): Promise<string> {
     const dirName = this.outputDestination;
     if (await fs.stat(dirName).catch(() => false)) {
@@ -118,17 +196,18 @@ export class FileView extends View {
     }
     await fs.mkdir(dirName, { recursive: true });
 
+    // The time until the metadata is written is included in its writeReportTime
+    this.report.profile.start("writeReport");
     console.log(`Writing results to directory: ${dirName}`);
-    this.writeMetadata(createWriteStream(`${dirName}/metadata.csv`));
-    console.log("Metadata written.");
-    this.writePairs(createWriteStream(`${dirName}/pairs.csv`));
-
+    await this.writeOutput(`${dirName}/pairs.csv`, out => this.writePairs(out));
     console.log("Pairs written.");
-
-    this.writekgrams(createWriteStream(`${dirName}/kgrams.csv`));
+    await this.writeOutput(`${dirName}/kgrams.csv`, out => this.writekgrams(out));
     console.log("Kgrams written.");
-    this.writeFiles(createWriteStream(`${dirName}/files.csv`));
+    await this.writeOutput(`${dirName}/files.csv`, out => this.writeFiles(out));
     console.log("Files written.");
+    await this.writeOutput(`${dirName}/metadata.csv`, out => this.writeMetadata(out));
+    console.log("Metadata written.");
+    this.report.profile.end("writeReport");
     console.log("Completed");
     return dirName;
   }
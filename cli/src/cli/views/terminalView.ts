@@ -150,7 +150,7 @@ export class TerminalView extends View {
     const nl = (i: number): string =>
       this.c.grey((i + 1).toString().padEnd(lineNrWidth));
 
-    const fragments = pair.buildFragments();
+    const fragments = this.report.profile.timeSync("buildFragments", () => pair.buildFragments());
 
     type FragmentSorter = (b1: Fragment, b2: Fragment) => number;
     const fragmentSorter = closestMatch<FragmentSorter | null>(
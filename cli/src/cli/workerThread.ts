@@ -0,0 +1,75 @@
+import { parentPort } from "node:worker_threads";
+import { performance } from "node:perf_hooks";
+import { Dolos, LanguagePicker } from "@dodona/dolos-lib";
+import { FileView } from "./views/fileView.js";
+import { ThreadRequest, ThreadResponse, WorkerRequest, WorkerResult } from "./commands/worker.js";
+import { error } from "./util/utils.js";
+
+/**
+ * Analyzes the requests of a `dolos worker` one at a time, see
+ * AnalysisThread. The parsers of the languages stay loaded in this thread
+ * between requests.
+ */
+
+const port = parentPort!;
+let controller: AbortController | null = null;
+
+function post(response: ThreadResponse): void {
+  port.postMessage(response);
+}
+
+async function preload(languages: string[]): Promise<void> {
+  const picker = new LanguagePicker();
+  for (const name of languages) {
+    try {
+      await (await picker.findLanguage(name)).createTokenizer();
+    } catch (e) {
+      error(`Could not preload ${name}: ${e.message}`);
+    }
+  }
+}
+
+async function analyze(request: WorkerRequest): Promise<WorkerResult> {
+  controller = new AbortController();
+  const signal = controller.signal;
+  const start = performance.now();
+  let dolos: Dolos | null = null;
+  try {
+    // Analyze in this thread: the parsers of tokenizer threads would be loaded
+    // again for every request, and they would not share its memory limit
+    dolos = new Dolos({ ...request.options, workers: 1 }, {
+      progress: event => post({ type: "progress", ...event }),
+    });
+    const report = await dolos.analyzePaths(request.paths, request.ignore, signal);
+    const view = new FileView(report, { outputDestination: request.output, compress: request.compress });
+    await view.writeToDirectory();
+    return {
+      status: "finished",
+      error: null,
+      warnings: report.warnings,
+      runTime: performance.now() - start,
+      peakHeap: report.profile.counters.peakHeap,
+    };
+  } catch (e) {
+    return {
+      status: "failed",
+      error: signal.aborted ? "timeout" : e.message,
+      warnings: [],
+      runTime: performance.now() - start,
+      peakHeap: process.memoryUsage().heapUsed,
+    };
+  } finally {
+    dolos?.close();
+    controller = null;
+  }
+}
+
+port.on("message", async (message: ThreadRequest) => {
+  if (message.type === "abort") {
+    controller?.abort(new Error("The analysis took too long"));
+  } else if (message.type === "preload") {
+    await preload(message.languages);
+  } else {
+    post({ type: "result", result: await analyze(message.request) });
+  }
+});
@@ -7,15 +7,47 @@ import { SharedFingerprint } from "./sharedFingerprint.js";
 import { ASTRegion } from "./pairedOccurrence.js";
 import { Pair } from "./pair.js";
 import { assert, assertDefined, closestMatch } from "../util/utils.js";
+import { BoundedHeap } from "../util/boundedHeap.js";
+import { FrozenIndex } from "./frozenIndex.js";
+import { HashEngine } from "../hashing/hashEngine.js";
+import { IndexSnapshot } from "./indexSnapshot.js";
+import { File } from "../file/file.js";
+import { TokenTable } from "../hashing/tokenTable.js";
 
 export type Hash = number;
 
 export interface FileEntry {
   file: TokenizedFile;
-  kgrams: Array<Range>;
+  // The kgrams of this entry, or null once it has been frozen: use
+  // FrozenIndex.kgrams and FrozenIndex.kgramCount to read them in both cases
+  kgrams: Array<Range> | null;
   shared: Set<SharedFingerprint>;
   ignored: Set<SharedFingerprint>;
   isIgnored: boolean;
+  // The frozen index holding the kgrams of this entry, if it has been frozen
+  frozen?: FrozenIndex;
+}
+
+/**
+ * A pair of files that share fingerprints, scored without constructing a
+ * Pair.
+ */
+interface PairCandidate {
+  left: FileEntry;
+  right: FileEntry;
+  shared: number;
+  overlap: number;
+  similarity: number;
+}
+
+/**
+ * The scores a pair can be sorted on, see FingerprintIndex.sortMetric. The
+ * longest fragment is only needed to sort on it.
+ */
+export interface PairScores {
+  similarity: number;
+  overlap: number;
+  longest?: number;
 }
 
 export interface Occurrence {
@@ -34,19 +66,23 @@ export class FingerprintIndex {
   private readonly index: Map<Hash, SharedFingerprint>;
   // A set of ignored hashes (either manually added, or through the ignored files, NOT because of maxFileCount)
   private readonly ignoredHashes: Set<number>;
+  // The compact representation of this index, once it has been frozen
+  private frozen: FrozenIndex | null = null;
 
   /**
    * Creates a Fingerprint Index which is able to compare files with each other
    * based on their winnowed fingerprints (kgrams of tokens).
    *
+   * The hash engine determines the hashes of the fingerprints, see HashEngine.
    */
   constructor(
-    private readonly kgramLength: number,
-    private readonly kgramsInWindow: number,
-    kgramData?: boolean,
+    public readonly kgramLength: number,
+    public readonly kgramsInWindow: number,
+    private readonly kgramData = false,
     private maxFingerprintFileCount = Number.MAX_SAFE_INTEGER,
+    public readonly hashEngine = HashEngine.default,
   ) {
-    this.hashFilter = new WinnowFilter(this.kgramLength, this.kgramsInWindow, kgramData);
+    this.hashFilter = new WinnowFilter(this.kgramLength, this.kgramsInWindow, kgramData, hashEngine);
     this.files = new Map<number, FileEntry>();
     this.ignoredFiles = new Map<number, FileEntry>();
     this.index = new Map<Hash, SharedFingerprint>();
@@ -54,6 +90,7 @@ export class FingerprintIndex {
   }
 
   public addIgnoredFile(file: TokenizedFile): void {
+    assert(this.frozen === null, "Cannot add files to a frozen index");
     assert(!this.ignoredFiles.has(file.id), `This file has already been ignored: ${file.file.path}`);
     const entry: FileEntry = {
       file,
@@ -87,8 +124,14 @@ export class FingerprintIndex {
     }
   }
 
+  /**
+   * Adds the given files to the index.
+   *
+   * Files can also be added to a frozen index (e.g. an index restored from a
+   * snapshot), their kgrams and occurrences are stored as objects until the
+   * index is frozen again.
+   */
   public addFiles(tokenizedFiles: TokenizedFile[]): Map<Hash, SharedFingerprint> {
-
     for (const f of tokenizedFiles) {
       assert(!this.files.has(f.id), `This file has already been analyzed: ${f.file.path}`);
     }
@@ -111,20 +154,26 @@ export class FingerprintIndex {
 
   private addEntry(entry: FileEntry): void {
     const file = entry.file;
+    const kgrams = entry.kgrams;
+    assertDefined(kgrams, "Cannot add kgrams to a frozen entry");
     let kgram = 0;
-    for (
-      const { data, hash, start, stop  }
-      of this.hashFilter.fingerprints(file.tokens)
-    ) {
+    const hashes = file.tokenIds ?
+      this.hashFilter.hashTokenIds(file.tokenIds, file.table!) :
+      this.hashFilter.hashTokenArray(file.decodeTokens());
+    this.hashFilter.streamFingerprints(hashes, (hash, start, stop) => {
+      const data = this.kgramData ? file.tokenSlice(start, stop + 1) : null;
 
       // add kgram to file
-      entry.kgrams.push(new Range(start, stop));
+      kgrams.push(new Range(start, stop));
+
+      const startRegion = file.region(start);
+      const stopRegion = file.region(stop);
 
       // sanity check
       assert(
         Region.isInOrder(
-          file.mapping[start],
-          file.mapping[stop]
+          startRegion,
+          stopRegion
         )
         // If we end our kgram on a ')', the location of the opening token is used.
         // However, the location of this token in the file might be before
@@ -132,15 +181,15 @@ export class FingerprintIndex {
         // For example: the last token of every ast is ')', closing the program.
         // The location of this token is always (0, 0), since the program root is the first token.
         // In this way, the 'end' token is before any other token in the AST.
-        || file.tokens[stop] === ")" ,
+        || file.token(stop) === ")" ,
         `Invalid ordering:
-             expected ${file.mapping[start]}
-             to start be before the end of ${file.mapping[stop]}`
+             expected ${startRegion}
+             to start be before the end of ${stopRegion}`
       );
 
       const location = Region.merge(
-        file.mapping[start],
-        file.mapping[stop]
+        startRegion,
+        stopRegion
       );
 
       const part: Occurrence = {
@@ -165,7 +214,186 @@ export class FingerprintIndex {
       }
 
       kgram += 1;
+    });
+  }
+
+  /**
+   * Converts the kgrams and fingerprint occurrences of this index into a
+   * compact columnar representation (see FrozenIndex), dropping the Range and
+   * Occurrence objects of every kgram. These are materialized again on
+   * demand, e.g. when fragments are built.
+   *
+   * A frozen index can still be queried and its ignored fingerprints can
+   * still be changed, but no more ignored files can be added. When files
+   * were added since the index was frozen, it is frozen again including them.
+   */
+  public freeze(): FrozenIndex {
+    if (this.frozen !== null && this.entries().every(e => e.frozen === this.frozen)) {
+      return this.frozen;
+    }
+    const entries = this.entries().concat(this.ignoredEntries());
+    const fingerprints = this.sharedFingerprints();
+    const frozen = FrozenIndex.build(entries, fingerprints, this.kgramData);
+    for (let slot = 0; slot < fingerprints.length; slot++) {
+      fingerprints[slot].freeze(frozen, slot);
+    }
+    for (const entry of entries) {
+      FingerprintIndex.freezeEntry(entry, frozen);
+    }
+    this.frozen = frozen;
+    return frozen;
+  }
+
+  private static freezeEntry(entry: FileEntry, frozen: FrozenIndex): void {
+    entry.frozen = frozen;
+    entry.kgrams = null;
+  }
+
+  /**
+   * Freezes this index and returns a binary snapshot of it (see
+   * IndexSnapshot), containing the files with their tokens, the kgrams, the
+   * fingerprints and their occurrences, and the ignored hashes.
+   */
+  public snapshot(): Uint8Array {
+    const frozen = this.freeze();
+    const fingerprints = this.sharedFingerprints();
+
+    const symbols = new TokenTable();
+    const tokenOffsets = new Float64Array(frozen.files.length + 1);
+    for (let p = 0; p < frozen.files.length; p++) {
+      tokenOffsets[p + 1] = tokenOffsets[p] + frozen.files[p].tokenCount;
+    }
+    const tokens = new Uint32Array(tokenOffsets[frozen.files.length]);
+    const mapping = new Uint32Array(4 * tokens.length);
+    for (let p = 0; p < frozen.files.length; p++) {
+      const file = frozen.files[p];
+      const fileTokens = file.decodeTokens();
+      for (let i = 0; i < fileTokens.length; i++) {
+        tokens[tokenOffsets[p] + i] = symbols.intern(fileTokens[i]);
+      }
+      mapping.set(file.packedMapping, 4 * tokenOffsets[p]);
+    }
+
+    return IndexSnapshot.encode({
+      kgramLength: this.kgramLength,
+      kgramsInWindow: this.kgramsInWindow,
+      kgramData: this.kgramData,
+      maxFingerprintFileCount: this.maxFingerprintFileCount,
+      hashEngine: this.hashEngine.name,
+      analysedCount: this.files.size,
+      paths: frozen.files.map(f => f.path),
+      contents: frozen.files.map(f => f.content),
+      extras: frozen.files.map(f => f.extra),
+      symbols: Array.from({ length: symbols.size }, (_, i) => symbols.token(i)),
+      tokenOffsets,
+      tokens,
+      mapping,
+      kgramOffsets: frozen.kgramOffsets,
+      kgramStarts: frozen.kgramStarts,
+      kgramStops: frozen.kgramStops,
+      kgramSlots: frozen.kgramSlots,
+      kgramLocations: frozen.kgramLocations,
+      hashes: frozen.hashes,
+      postingOffsets: frozen.postingOffsets,
+      postingFiles: frozen.postingFiles,
+      postingKgrams: frozen.postingKgrams,
+      ignoredSlots: Uint8Array.from(fingerprints, f => f.ignored ? 1 : 0),
+      ignoredHashes: Float64Array.from(this.ignoredHashes),
+    });
+  }
+
+  /**
+   * Restores a frozen index from a snapshot created by `snapshot`. The kgram
+   * and posting columns are used as is, only the files and fingerprint
+   * objects are created.
+   *
+   * @param bytes The snapshot.
+   * @param table The token table to store the tokens of the files in.
+   */
+  public static restore(bytes: Uint8Array, table = new TokenTable()): FingerprintIndex {
+    const data = IndexSnapshot.decode(bytes);
+    const index = new FingerprintIndex(
+      data.kgramLength,
+      data.kgramsInWindow,
+      data.kgramData,
+      data.maxFingerprintFileCount,
+      HashEngine.byName(data.hashEngine)
+    );
+
+    const ids = Uint32Array.from(data.symbols, s => table.intern(s));
+    const files = new Array<TokenizedFile>(data.paths.length);
+    for (let p = 0; p < files.length; p++) {
+      const from = data.tokenOffsets[p];
+      const to = data.tokenOffsets[p + 1];
+      const tokens = data.tokens.slice(from, to);
+      for (let i = 0; i < tokens.length; i++) {
+        tokens[i] = ids[tokens[i]];
+      }
+      files[p] = new TokenizedFile(
+        new File(data.paths[p], data.contents[p], data.extras[p]),
+        tokens,
+        data.mapping.subarray(4 * from, 4 * to),
+        table
+      );
+    }
+
+    const frozen = new FrozenIndex(
+      files,
+      data.kgramData,
+      data.kgramOffsets,
+      data.kgramStarts,
+      data.kgramStops,
+      data.kgramSlots,
+      data.kgramLocations,
+      data.hashes,
+      data.postingOffsets,
+      data.postingFiles,
+      data.postingKgrams,
+    );
+
+    const fingerprints = new Array<SharedFingerprint>(data.hashes.length);
+    for (let slot = 0; slot < fingerprints.length; slot++) {
+      let kgram = null;
+      if (data.kgramData) {
+        const posting = data.postingOffsets[slot];
+        const first = data.kgramOffsets[data.postingFiles[posting]] + data.postingKgrams[posting];
+        kgram = files[data.postingFiles[posting]].tokenSlice(data.kgramStarts[first], data.kgramStops[first] + 1);
+      }
+      const shared = new SharedFingerprint(data.hashes[slot], kgram);
+      shared.freeze(frozen, slot);
+      shared.ignored = data.ignoredSlots[slot] === 1;
+      fingerprints[slot] = shared;
+      index.index.set(shared.hash, shared);
+    }
+
+    for (let p = 0; p < files.length; p++) {
+      const isIgnored = p >= data.analysedCount;
+      const entry: FileEntry = {
+        file: files[p],
+        kgrams: [],
+        isIgnored,
+        shared: new Set<SharedFingerprint>(),
+        ignored: new Set<SharedFingerprint>()
+      };
+      if (!isIgnored) {
+        for (let kgram = data.kgramOffsets[p]; kgram < data.kgramOffsets[p + 1]; kgram++) {
+          const shared = fingerprints[data.kgramSlots[kgram]];
+          (shared.ignored ? entry.ignored : entry.shared).add(shared);
+        }
+      }
+      FingerprintIndex.freezeEntry(entry, frozen);
+      (isIgnored ? index.ignoredFiles : index.files).set(files[p].id, entry);
     }
+
+    for (const hash of data.ignoredHashes) {
+      index.ignoredHashes.add(hash);
+    }
+    index.frozen = frozen;
+    return index;
+  }
+
+  public isFrozen(): boolean {
+    return this.frozen !== null;
   }
 
   public addIgnoredHashes(hashes: Array<Hash>): void {
@@ -202,6 +430,14 @@ export class FingerprintIndex {
     return Array.from(this.index.values());
   }
 
+  /**
+   * Lazily iterates over the shared fingerprints of this index, without
+   * copying them into an array.
+   */
+  public iterateSharedFingerprints(): IterableIterator<SharedFingerprint> {
+    return this.index.values();
+  }
+
   public entries(): Array<FileEntry> {
     return Array.from(this.files.values());
   }
@@ -218,27 +454,313 @@ export class FingerprintIndex {
     return new Pair(entry1, entry2);
   }
 
-  public allPairs(sortBy?: string): Array<Pair> {
-    const pairs = [];
+  /**
+   * Returns the pairs of analysed files sharing at least
+   * `minSharedFingerprints` (non-ignored) fingerprints, in the same order as
+   * they would be visited by comparing every file with every other file.
+   *
+   * Instead of intersecting the fingerprints of every possible pair, this
+   * walks the list of files of each shared fingerprint and counts how many
+   * fingerprints each pair of files has in common. Pairs of files without
+   * enough common fingerprints are never considered.
+   *
+   * @param minSharedFingerprints The minimum amount of fingerprints a pair of
+   * files should share to be a candidate.
+   * @param minSimilarity Only include pairs with at least this similarity.
+   */
+  public candidatePairs(minSharedFingerprints = 1, minSimilarity = 0): Array<[FileEntry, FileEntry]> {
+    const pairs: Array<[FileEntry, FileEntry]> = [];
+    for (const candidate of this.pairCandidates(minSharedFingerprints)) {
+      if (candidate.similarity >= minSimilarity) {
+        pairs.push([candidate.left, candidate.right]);
+      }
+    }
+    return pairs;
+  }
+
+  /**
+   * Yields a scored candidate for each pair of files sharing at least
+   * `minSharedFingerprints` fingerprints (or every pair if this is 0), in the
+   * order of the nested loop over all entries.
+   *
+   * The coverage and similarity of each candidate are computed from the
+   * posting lists, without constructing a Pair.
+   */
+  private *pairCandidates(minSharedFingerprints: number): Generator<PairCandidate> {
     const entries = Array.from(this.files.values());
+    const positions = new Map<number, number>();
     for (let i = 0; i < entries.length; i++) {
-      for (let j = i + 1; j < entries.length; j++) {
-        pairs.push(new Pair(entries[i], entries[j]));
+      positions.set(entries[i].file.id, i);
+    }
+
+    // A pair of entry positions (i, j) with i < j is stored as i * n + j,
+    // sorting these keys numerically results in the order of the nested loop
+    const n = entries.length;
+    const slots = new Map<number, number>();
+    const sharedCounts: number[] = [];
+    const leftCovered: number[] = [];
+    const rightCovered: number[] = [];
+    const filePositions: number[] = [];
+    const occurrenceCounts: number[] = [];
+    for (const shared of this.index.values()) {
+      filePositions.length = 0;
+      for (const file of shared.files()) {
+        const position = positions.get(file.id);
+        if (position !== undefined && entries[position].shared.has(shared)) {
+          filePositions.push(position);
+        }
+      }
+      filePositions.sort((a, b) => a - b);
+      for (let i = 0; i < filePositions.length; i++) {
+        occurrenceCounts[i] = shared.occurrenceCount(entries[filePositions[i]].file);
+      }
+      for (let i = 0; i < filePositions.length; i++) {
+        const row = filePositions[i] * n;
+        for (let j = i + 1; j < filePositions.length; j++) {
+          const key = row + filePositions[j];
+          let slot = slots.get(key);
+          if (slot === undefined) {
+            slot = sharedCounts.length;
+            slots.set(key, slot);
+            sharedCounts.push(0);
+            leftCovered.push(0);
+            rightCovered.push(0);
+          }
+          sharedCounts[slot] += 1;
+          leftCovered[slot] += occurrenceCounts[i];
+          rightCovered[slot] += occurrenceCounts[j];
+        }
       }
     }
 
-    if (sortBy) {
-      type SortFn = (a: Pair, b: Pair) => number;
-      const sortfn = closestMatch<SortFn>(sortBy || "similarity", {
-        "total overlap": (a, b) => b.overlap - a.overlap,
-        "longest fragment": (a, b) => b.longest - a.longest,
-        similarity: (a, b) => b.similarity - a.similarity,
-      });
+    const candidate = (left: FileEntry, right: FileEntry, slot?: number): PairCandidate =>
+      slot === undefined ?
+        FingerprintIndex.scoreCandidate(left, right, 0, 0) :
+        FingerprintIndex.scoreCandidate(left, right, sharedCounts[slot], leftCovered[slot] + rightCovered[slot]);
+
+    if (minSharedFingerprints <= 0) {
+      for (let i = 0; i < n; i++) {
+        for (let j = i + 1; j < n; j++) {
+          yield candidate(entries[i], entries[j], slots.get(i * n + j));
+        }
+      }
+      return;
+    }
 
-      assertDefined(sortfn, `${sortBy} is not a valid field to sort on`);
+    let keys = 0;
+    const candidates = new Float64Array(slots.size);
+    for (const [key, slot] of slots) {
+      if (sharedCounts[slot] >= minSharedFingerprints) {
+        candidates[keys++] = key;
+      }
+    }
 
-      pairs.sort(sortfn);
+    for (const key of candidates.subarray(0, keys).sort()) {
+      const i = Math.floor(key / n);
+      yield candidate(entries[i], entries[key - i * n], slots.get(key));
+    }
+  }
+
+  private static scoreCandidate(left: FileEntry, right: FileEntry, shared: number, covered: number): PairCandidate {
+    const denominator = FrozenIndex.kgramCount(left) + FrozenIndex.kgramCount(right)
+      - left.ignored.size - right.ignored.size;
+    return {
+      left,
+      right,
+      shared,
+      overlap: covered,
+      similarity: denominator > 0 ? covered / denominator : 0,
+    };
+  }
+
+  /**
+   * Yields a scored candidate for each analysed file sharing at least
+   * `minSharedFingerprints` (at least 1) fingerprints with the given entry,
+   * with the given entry as left side, ordered by file id.
+   *
+   * Only the files in the posting lists of the fingerprints of the entry are
+   * visited, so the cost does not depend on the amount of files in the index.
+   */
+  private *candidatesOf(entry: FileEntry, minSharedFingerprints: number): Generator<PairCandidate> {
+    const sharedCounts = new Map<number, number>();
+    const covered = new Map<number, number>();
+    for (const shared of entry.shared) {
+      const count = shared.occurrenceCount(entry.file);
+      for (const other of shared.files()) {
+        if (other.id !== entry.file.id && this.files.has(other.id)) {
+          sharedCounts.set(other.id, (sharedCounts.get(other.id) ?? 0) + 1);
+          covered.set(other.id, (covered.get(other.id) ?? 0) + count + shared.occurrenceCount(other));
+        }
+      }
+    }
+
+    const ids = Array.from(sharedCounts.keys()).sort((a, b) => a - b);
+    for (const id of ids) {
+      const shared = sharedCounts.get(id)!;
+      if (shared >= minSharedFingerprints) {
+        yield FingerprintIndex.scoreCandidate(entry, this.files.get(id)!, shared, covered.get(id)!);
+      }
+    }
+  }
+
+  /**
+   * Returns the `k` best pairs of the given file with the other analysed files
+   * of this index, sorted from best to worst according to the given field.
+   * The given file is the left file of every pair.
+   *
+   * This only visits the files sharing fingerprints with the given file, so
+   * a newly added file can be compared with a large index without comparing
+   * all other files with each other.
+   *
+   * @param file An analysed file of this index.
+   * @param k The maximum amount of pairs to return.
+   * @param sortBy The field to sort on: similarity, total overlap or longest
+   * fragment.
+   * @param minSimilarity Only consider pairs with at least this similarity.
+   * @param minSharedFingerprints The minimum amount of fingerprints a pair of
+   * files should share to be considered.
+   */
+  public topPairsOf(
+    file: TokenizedFile,
+    k: number,
+    sortBy = "similarity",
+    minSimilarity = 0,
+    minSharedFingerprints = 1
+  ): Array<Pair> {
+    const entry = this.files.get(file.id);
+    assertDefined(entry, `File ${file.path} not found in index`);
+    return this.rankCandidates(
+      this.candidatesOf(entry, Math.max(minSharedFingerprints, 1)),
+      k,
+      sortBy,
+      minSimilarity
+    );
+  }
+
+  /**
+   * Returns all pairs of files sharing at least `minSharedFingerprints`
+   * fingerprints, optionally sorted by the given field.
+   *
+   * Prefer `topPairs` or `pairsAbove` when only the best pairs are needed.
+   *
+   * @param sortBy The field to sort on: similarity, total overlap or longest
+   * fragment.
+   * @param minSharedFingerprints The minimum amount of fingerprints a pair of
+   * files should share to be included. When 0, every possible pair is returned.
+   * @param minSimilarity Only include pairs with at least this similarity.
+   */
+  public allPairs(sortBy?: string, minSharedFingerprints = 1, minSimilarity = 0): Array<Pair> {
+    const pairs = Array.from(this.pairsAbove(minSimilarity, minSharedFingerprints));
+
+    if (sortBy) {
+      FingerprintIndex.sortPairs(pairs, sortBy);
     }
     return pairs;
   }
+
+  /**
+   * Sorts the given pairs in place from best to worst according to the given
+   * field: similarity, total overlap or longest fragment. Pairs with an equal
+   * score keep their order.
+   */
+  public static sortPairs(pairs: Array<Pair>, sortBy: string): Array<Pair> {
+    const metric = FingerprintIndex.sortMetric(sortBy);
+    return pairs.sort((a, b) => metric(b) - metric(a));
+  }
+
+  /**
+   * Returns the `k` best pairs according to the given field, sorted from best
+   * to worst. Pairs with an equal score keep the order of `allPairs`.
+   *
+   * Only a bounded heap of the best candidates is kept while scanning, so
+   * at most `k` Pairs are kept alive instead of one for every pair of files.
+   * When sorting on similarity or total overlap, Pairs are only constructed
+   * for the selected candidates.
+   *
+   * @param k The maximum amount of pairs to return.
+   * @param sortBy The field to sort on: similarity, total overlap or longest
+   * fragment.
+   * @param minSimilarity Only consider pairs with at least this similarity.
+   * @param minSharedFingerprints The minimum amount of fingerprints a pair of
+   * files should share to be considered.
+   */
+  public topPairs(
+    k: number,
+    sortBy = "similarity",
+    minSimilarity = 0,
+    minSharedFingerprints = 1
+  ): Array<Pair> {
+    return this.rankCandidates(this.pairCandidates(minSharedFingerprints), k, sortBy, minSimilarity);
+  }
+
+  /**
+   * Returns the pairs of the `k` best candidates with a similarity of at least
+   * `minSimilarity`, sorted from best to worst. Candidates with an equal
+   * score keep their order.
+   */
+  private rankCandidates(
+    candidates: Iterable<PairCandidate>,
+    k: number,
+    sortBy: string,
+    minSimilarity: number
+  ): Array<Pair> {
+    const metric = FingerprintIndex.sortMetric(sortBy);
+    const needsPair = closestMatch(sortBy, { "longest fragment": true }) !== null;
+
+    interface Ranked { score: number; order: number; candidate: PairCandidate; pair?: Pair }
+    const heap = new BoundedHeap<Ranked>(
+      k,
+      (a, b) => a.score - b.score || b.order - a.order
+    );
+
+    let order = 0;
+    for (const candidate of candidates) {
+      if (candidate.similarity >= minSimilarity) {
+        if (needsPair) {
+          const pair = new Pair(candidate.left, candidate.right);
+          heap.push({ score: metric(pair), order, candidate, pair });
+        } else {
+          heap.push({ score: metric(candidate), order, candidate });
+        }
+      }
+      order += 1;
+    }
+
+    return heap.toSortedArray().map(
+      ({ candidate, pair }) => pair ?? new Pair(candidate.left, candidate.right)
+    );
+  }
+
+  /**
+   * Yields the pairs with a similarity of at least `minSimilarity`, in the
+   * order of `allPairs` without sorting. A Pair is only constructed for the
+   * candidates reaching the threshold, and is not retained by the index.
+   *
+   * @param minSimilarity The minimum similarity of a yielded pair.
+   * @param minSharedFingerprints The minimum amount of fingerprints a pair of
+   * files should share to be considered.
+   */
+  public *pairsAbove(minSimilarity: number, minSharedFingerprints = 1): Generator<Pair> {
+    for (const candidate of this.pairCandidates(minSharedFingerprints)) {
+      if (candidate.similarity >= minSimilarity) {
+        yield new Pair(candidate.left, candidate.right);
+      }
+    }
+  }
+
+  /**
+   * Returns the score of a pair for the given field to sort on: similarity,
+   * total overlap or longest fragment. Higher scores are better.
+   */
+  public static sortMetric(sortBy: string): (pair: PairScores) => number {
+    type Metric = (pair: PairScores) => number;
+    const metric = closestMatch<Metric>(sortBy, {
+      "total overlap": p => p.overlap,
+      "longest fragment": p => p.longest!,
+      similarity: p => p.similarity,
+    });
+
+    assertDefined(metric, `${sortBy} is not a valid field to sort on`);
+    return metric;
+  }
 }
@@ -27,7 +27,8 @@ export class Fragment {
     this.leftSelection = initial.left.location;
     this.rightSelection = initial.right.location;
     this.mergedStart = initial.left.start;
-    this.mergedData = initial.left.data;
+    // copy the data, as it is extended in place
+    this.mergedData = initial.left.data && Array.from(initial.left.data);
     this.mergedStop = initial.left.stop;
   }
 
@@ -0,0 +1,274 @@
+import { TokenizedFile } from "../file/tokenizedFile.js";
+import { Range } from "../util/range.js";
+import { Region } from "../util/region.js";
+import { assert } from "../util/utils.js";
+import { FileEntry, Hash, Occurrence } from "./fingerprintIndex.js";
+import { SharedFingerprint } from "./sharedFingerprint.js";
+
+/**
+ * A compact, read-only representation of the contents of a FingerprintIndex.
+ *
+ * Instead of a Range, Occurrence, ASTRegion and Region object for every kgram,
+ * all kgrams and fingerprint occurrences are stored in typed arrays using a
+ * compressed sparse row (CSR) layout:
+ *
+ * - the kgrams of the file at position `p` are stored at the indices
+ *   `kgramOffsets[p]` up to `kgramOffsets[p + 1]` of the kgram columns
+ *   (`kgramStarts`, `kgramStops`, `kgramSlots` and `kgramLocations`).
+ * - the occurrences of the fingerprint in slot `s` are stored at the indices
+ *   `postingOffsets[s]` up to `postingOffsets[s + 1]` of `postingFiles` and
+ *   `postingKgrams`, sorted by file position and kgram index.
+ *
+ * Occurrences and kgram ranges are only materialized as objects on demand.
+ */
+export class FrozenIndex {
+
+  // Map of file id to its position in `files`
+  private readonly positions: Map<number, number> = new Map();
+
+  /**
+   * Returns the amount of kgrams of the given entry, without materializing
+   * its kgrams if it is part of a frozen index.
+   */
+  public static kgramCount(entry: FileEntry): number {
+    return entry.kgrams?.length ?? entry.frozen!.kgramCount(entry.file);
+  }
+
+  /**
+   * Returns the token ranges of the kgrams of the given entry, materializing
+   * them if it is part of a frozen index.
+   */
+  public static kgrams(entry: FileEntry): Array<Range> {
+    return entry.kgrams ?? entry.frozen!.kgramsOf(entry.file);
+  }
+
+  /**
+   * Builds a frozen index from the entries (analysed and ignored files) and
+   * the shared fingerprints of a FingerprintIndex. The slot of each
+   * fingerprint is its position in the given list.
+   */
+  public static build(
+    entries: Array<FileEntry>,
+    fingerprints: Array<SharedFingerprint>,
+    kgramData: boolean
+  ): FrozenIndex {
+    const files = entries.map(e => e.file);
+
+    const kgramOffsets = new Uint32Array(entries.length + 1);
+    for (let p = 0; p < entries.length; p++) {
+      kgramOffsets[p + 1] = kgramOffsets[p] + FrozenIndex.kgramCount(entries[p]);
+    }
+    const kgramTotal = kgramOffsets[entries.length];
+
+    const postingOffsets = new Uint32Array(fingerprints.length + 1);
+    for (let s = 0; s < fingerprints.length; s++) {
+      let count = 0;
+      for (const file of fingerprints[s].files()) {
+        count += fingerprints[s].occurrencesOf(file).length;
+      }
+      postingOffsets[s + 1] = postingOffsets[s] + count;
+    }
+    const postingTotal = postingOffsets[fingerprints.length];
+
+    const frozen = new FrozenIndex(
+      files,
+      kgramData,
+      kgramOffsets,
+      new Uint32Array(kgramTotal),
+      new Uint32Array(kgramTotal),
+      new Int32Array(kgramTotal).fill(-1),
+      new Uint32Array(4 * kgramTotal),
+      Float64Array.from(fingerprints, f => f.hash),
+      postingOffsets,
+      new Uint32Array(postingTotal),
+      new Uint32Array(postingTotal),
+    );
+
+    for (let s = 0; s < fingerprints.length; s++) {
+      const fingerprint = fingerprints[s];
+      const filePositions = fingerprint.files()
+        .map(f => frozen.position(f))
+        .filter((p): p is number => p !== undefined)
+        .sort((a, b) => a - b);
+
+      let posting = postingOffsets[s];
+      for (const p of filePositions) {
+        for (const { side } of fingerprint.occurrencesOf(files[p])) {
+          const kgram = kgramOffsets[p] + side.index;
+          frozen.kgramStarts[kgram] = side.start;
+          frozen.kgramStops[kgram] = side.stop;
+          frozen.kgramSlots[kgram] = s;
+          frozen.kgramLocations[4 * kgram] = side.location.startRow;
+          frozen.kgramLocations[4 * kgram + 1] = side.location.startCol;
+          frozen.kgramLocations[4 * kgram + 2] = side.location.endRow;
+          frozen.kgramLocations[4 * kgram + 3] = side.location.endCol;
+          frozen.postingFiles[posting] = p;
+          frozen.postingKgrams[posting] = side.index;
+          posting += 1;
+        }
+      }
+      assert(posting === postingOffsets[s + 1], `Fingerprint ${fingerprint.hash} has occurrences in unknown files`);
+    }
+
+    return frozen;
+  }
+
+  constructor(
+    public readonly files: Array<TokenizedFile>,
+    public readonly kgramData: boolean,
+    public readonly kgramOffsets: Uint32Array,
+    public readonly kgramStarts: Uint32Array,
+    public readonly kgramStops: Uint32Array,
+    public readonly kgramSlots: Int32Array,
+    public readonly kgramLocations: Uint32Array,
+    public readonly hashes: Float64Array,
+    public readonly postingOffsets: Uint32Array,
+    public readonly postingFiles: Uint32Array,
+    public readonly postingKgrams: Uint32Array,
+  ) {
+    for (let p = 0; p < files.length; p++) {
+      this.positions.set(files[p].id, p);
+    }
+  }
+
+  /**
+   * The position of the given file in this index, or undefined if the file
+   * is not part of this index.
+   */
+  public position(file: TokenizedFile): number | undefined {
+    return this.positions.get(file.id);
+  }
+
+  public kgramCount(file: TokenizedFile): number {
+    const p = this.positions.get(file.id);
+    return p === undefined ? 0 : this.kgramOffsets[p + 1] - this.kgramOffsets[p];
+  }
+
+  /**
+   * Materializes the token ranges of the kgrams of the given file.
+   */
+  public kgramsOf(file: TokenizedFile): Array<Range> {
+    const p = this.positions.get(file.id);
+    const kgrams: Array<Range> = [];
+    if (p !== undefined) {
+      for (let kgram = this.kgramOffsets[p]; kgram < this.kgramOffsets[p + 1]; kgram++) {
+        kgrams.push(new Range(this.kgramStarts[kgram], this.kgramStops[kgram]));
+      }
+    }
+    return kgrams;
+  }
+
+  public hash(slot: number): Hash {
+    return this.hashes[slot];
+  }
+
+  /**
+   * The distinct files in which the fingerprint in the given slot occurs.
+   */
+  public filesOf(slot: number): Array<TokenizedFile> {
+    const files = [];
+    let last = -1;
+    for (let i = this.postingOffsets[slot]; i < this.postingOffsets[slot + 1]; i++) {
+      if (this.postingFiles[i] !== last) {
+        last = this.postingFiles[i];
+        files.push(this.files[last]);
+      }
+    }
+    return files;
+  }
+
+  public fileCount(slot: number): number {
+    let count = 0;
+    let last = -1;
+    for (let i = this.postingOffsets[slot]; i < this.postingOffsets[slot + 1]; i++) {
+      if (this.postingFiles[i] !== last) {
+        last = this.postingFiles[i];
+        count += 1;
+      }
+    }
+    return count;
+  }
+
+  /**
+   * The amount of times the fingerprint in the given slot occurs in the file.
+   */
+  public occurrenceCount(slot: number, file: TokenizedFile): number {
+    const [from, to] = this.postingRange(slot, file);
+    return to - from;
+  }
+
+  /**
+   * The kgram indices of the occurrences of the fingerprint in the given slot
+   * in the file, in ascending order.
+   */
+  public kgramIndices(slot: number, file: TokenizedFile): Array<number> {
+    const [from, to] = this.postingRange(slot, file);
+    return Array.from(this.postingKgrams.subarray(from, to));
+  }
+
+  /**
+   * Materializes the occurrences of the fingerprint in the given slot, either
+   * in all files or only in the given file.
+   */
+  public occurrences(slot: number, file?: TokenizedFile): Array<Occurrence> {
+    let from = this.postingOffsets[slot];
+    let to = this.postingOffsets[slot + 1];
+    if (file !== undefined) {
+      [from, to] = this.postingRange(slot, file);
+    }
+
+    const occurrences: Array<Occurrence> = [];
+    for (let i = from; i < to; i++) {
+      const occurrenceFile = this.files[this.postingFiles[i]];
+      const index = this.postingKgrams[i];
+      const kgram = this.kgramOffsets[this.postingFiles[i]] + index;
+      const start = this.kgramStarts[kgram];
+      const stop = this.kgramStops[kgram];
+      occurrences.push({
+        file: occurrenceFile,
+        side: {
+          index,
+          start,
+          stop,
+          data: this.kgramData ? occurrenceFile.tokenSlice(start, stop + 1) : null,
+          location: new Region(
+            this.kgramLocations[4 * kgram],
+            this.kgramLocations[4 * kgram + 1],
+            this.kgramLocations[4 * kgram + 2],
+            this.kgramLocations[4 * kgram + 3],
+          ),
+        }
+      });
+    }
+    return occurrences;
+  }
+
+  /**
+   * The range of posting indices of the fingerprint in the given slot that
+   * belong to the given file (empty if it does not occur in the file).
+   */
+  private postingRange(slot: number, file: TokenizedFile): [number, number] {
+    const p = this.positions.get(file.id);
+    const end = this.postingOffsets[slot + 1];
+    if (p === undefined) {
+      return [end, end];
+    }
+
+    // binary search for the first posting of a file at position >= p
+    let lo = this.postingOffsets[slot];
+    let hi = end;
+    while (lo < hi) {
+      const mid = (lo + hi) >>> 1;
+      if (this.postingFiles[mid] < p) {
+        lo = mid + 1;
+      } else {
+        hi = mid;
+      }
+    }
+    let to = lo;
+    while (to < end && this.postingFiles[to] === p) {
+      to += 1;
+    }
+    return [lo, to];
+  }
+}
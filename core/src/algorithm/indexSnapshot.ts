@@ -0,0 +1,308 @@
+import { ExtraInfo } from "../file/file.js";
+import { assert, crc32 } from "../util/utils.js";
+
+type TypedArray = Uint8Array | Int32Array | Uint32Array | Float64Array;
+
+/**
+ * The contents of a frozen FingerprintIndex, as stored in a snapshot.
+ *
+ * The files are stored in the order of the frozen index: first the
+ * `analysedCount` analysed files, then the ignored files. Their tokens are
+ * indices in `symbols`, the tokens of the file at position `p` are stored at
+ * `tokenOffsets[p]` up to `tokenOffsets[p + 1]` of `tokens`, with four numbers
+ * per token in `mapping`. See FrozenIndex for the kgram and posting columns.
+ */
+export interface SnapshotData {
+  kgramLength: number;
+  kgramsInWindow: number;
+  kgramData: boolean;
+  maxFingerprintFileCount: number;
+  hashEngine: string;
+  analysedCount: number;
+  paths: Array<string>;
+  contents: Array<string>;
+  extras: Array<ExtraInfo | undefined>;
+  symbols: Array<string>;
+  tokenOffsets: Float64Array;
+  tokens: Uint32Array;
+  mapping: Uint32Array;
+  kgramOffsets: Uint32Array;
+  kgramStarts: Uint32Array;
+  kgramStops: Uint32Array;
+  kgramSlots: Int32Array;
+  kgramLocations: Uint32Array;
+  hashes: Float64Array;
+  postingOffsets: Uint32Array;
+  postingFiles: Uint32Array;
+  postingKgrams: Uint32Array;
+  ignoredSlots: Uint8Array;
+  ignoredHashes: Float64Array;
+}
+
+/**
+ * Binary encoding of a SnapshotData.
+ *
+ * A snapshot starts with a header of 24 bytes: the magic bytes "DOLI", the
+ * format version and a CRC-32 checksum of the rest of the snapshot (unsigned
+ * 32-bit integers), 4 bytes of padding and the total length of the snapshot
+ * (a 64-bit float). All numbers are little-endian.
+ *
+ * Typed arrays are stored as their length followed by their contents, aligned
+ * on 8 bytes. When the bytes of a snapshot are aligned as well (e.g. a buffer
+ * of a file that was read at once) the arrays are decoded as views on the
+ * snapshot without copying.
+ */
+export class IndexSnapshot {
+
+  public static readonly version = 1;
+
+  private static readonly magic = 0x494c4f44; // "DOLI"
+  private static readonly headerLength = 24;
+
+  public static encode(data: SnapshotData): Uint8Array {
+    const writer = new SnapshotWriter();
+    writer.uint32(IndexSnapshot.magic);
+    writer.uint32(IndexSnapshot.version);
+    writer.uint32(0); // checksum
+    writer.uint32(0);
+    writer.float64(0); // length
+
+    writer.uint32(data.kgramLength);
+    writer.uint32(data.kgramsInWindow);
+    writer.uint32(data.kgramData ? 1 : 0);
+    writer.uint32(data.analysedCount);
+    writer.float64(data.maxFingerprintFileCount);
+    writer.string(data.hashEngine);
+
+    writer.uint32(data.paths.length);
+    for (let p = 0; p < data.paths.length; p++) {
+      writer.string(data.paths[p]);
+      writer.string(data.contents[p]);
+      writer.string(data.extras[p] ? JSON.stringify(data.extras[p]) : "");
+    }
+    writer.uint32(data.symbols.length);
+    for (const symbol of data.symbols) {
+      writer.string(symbol);
+    }
+
+    writer.array(data.tokenOffsets);
+    writer.array(data.tokens);
+    writer.array(data.mapping);
+    writer.array(data.kgramOffsets);
+    writer.array(data.kgramStarts);
+    writer.array(data.kgramStops);
+    writer.array(data.kgramSlots);
+    writer.array(data.kgramLocations);
+    writer.array(data.hashes);
+    writer.array(data.postingOffsets);
+    writer.array(data.postingFiles);
+    writer.array(data.postingKgrams);
+    writer.array(data.ignoredSlots);
+    writer.array(data.ignoredHashes);
+
+    const bytes = writer.finish();
+    const view = new DataView(bytes.buffer);
+    view.setFloat64(16, bytes.length, true);
+    view.setUint32(8, crc32(bytes.subarray(IndexSnapshot.headerLength)), true);
+    return bytes;
+  }
+
+  /**
+   * Decodes a snapshot, throws an error if it is not a valid snapshot of a
+   * supported version or if it is corrupted.
+   */
+  public static decode(bytes: Uint8Array): SnapshotData {
+    assert(bytes.length >= IndexSnapshot.headerLength, "Invalid index snapshot: too short");
+    const reader = new SnapshotReader(bytes);
+    assert(reader.uint32() === IndexSnapshot.magic, "Invalid index snapshot: unknown format");
+    const version = reader.uint32();
+    assert(
+      version === IndexSnapshot.version,
+      `Unsupported index snapshot version ${version}, expected version ${IndexSnapshot.version}`
+    );
+    const checksum = reader.uint32();
+    reader.uint32();
+    assert(reader.float64() === bytes.length, "Invalid index snapshot: the snapshot is truncated");
+    assert(
+      crc32(bytes.subarray(IndexSnapshot.headerLength)) === checksum,
+      "Invalid index snapshot: checksum mismatch"
+    );
+
+    const kgramLength = reader.uint32();
+    const kgramsInWindow = reader.uint32();
+    const kgramData = reader.uint32() === 1;
+    const analysedCount = reader.uint32();
+    const maxFingerprintFileCount = reader.float64();
+    const hashEngine = reader.string();
+
+    const fileCount = reader.uint32();
+    const paths = new Array<string>(fileCount);
+    const contents = new Array<string>(fileCount);
+    const extras = new Array<ExtraInfo | undefined>(fileCount);
+    for (let p = 0; p < fileCount; p++) {
+      paths[p] = reader.string();
+      contents[p] = reader.string();
+      const extra = reader.string();
+      if (extra !== "") {
+        const info = JSON.parse(extra);
+        // JSON stores a date as a string and an invalid date as null
+        if (typeof info.createdAt === "string") {
+          info.createdAt = new Date(info.createdAt);
+        } else if (info.createdAt === null) {
+          info.createdAt = new Date(NaN);
+        }
+        extras[p] = info;
+      }
+    }
+    const symbols = new Array<string>(reader.uint32());
+    for (let s = 0; s < symbols.length; s++) {
+      symbols[s] = reader.string();
+    }
+
+    return {
+      kgramLength,
+      kgramsInWindow,
+      kgramData,
+      maxFingerprintFileCount,
+      hashEngine,
+      analysedCount,
+      paths,
+      contents,
+      extras,
+      symbols,
+      tokenOffsets: reader.array(Float64Array),
+      tokens: reader.array(Uint32Array),
+      mapping: reader.array(Uint32Array),
+      kgramOffsets: reader.array(Uint32Array),
+      kgramStarts: reader.array(Uint32Array),
+      kgramStops: reader.array(Uint32Array),
+      kgramSlots: reader.array(Int32Array),
+      kgramLocations: reader.array(Uint32Array),
+      hashes: reader.array(Float64Array),
+      postingOffsets: reader.array(Uint32Array),
+      postingFiles: reader.array(Uint32Array),
+      postingKgrams: reader.array(Uint32Array),
+      ignoredSlots: reader.array(Uint8Array),
+      ignoredHashes: reader.array(Float64Array),
+    };
+  }
+}
+
+/**
+ * Writes numbers, strings and typed arrays to a growing buffer.
+ */
+class SnapshotWriter {
+  private bytes = new Uint8Array(1 << 16);
+  private view = new DataView(this.bytes.buffer);
+  private offset = 0;
+  private readonly encoder = new TextEncoder();
+
+  private reserve(length: number): void {
+    if (this.offset + length > this.bytes.length) {
+      let size = this.bytes.length * 2;
+      while (this.offset + length > size) {
+        size *= 2;
+      }
+      const bytes = new Uint8Array(size);
+      bytes.set(this.bytes.subarray(0, this.offset));
+      this.bytes = bytes;
+      this.view = new DataView(bytes.buffer);
+    }
+  }
+
+  private align(): void {
+    this.reserve(8);
+    this.offset = Math.ceil(this.offset / 8) * 8;
+  }
+
+  public uint32(value: number): void {
+    this.reserve(4);
+    this.view.setUint32(this.offset, value, true);
+    this.offset += 4;
+  }
+
+  public float64(value: number): void {
+    this.reserve(8);
+    this.view.setFloat64(this.offset, value, true);
+    this.offset += 8;
+  }
+
+  public string(value: string): void {
+    const encoded = this.encoder.encode(value);
+    this.uint32(encoded.length);
+    this.reserve(encoded.length);
+    this.bytes.set(encoded, this.offset);
+    this.offset += encoded.length;
+  }
+
+  public array(values: TypedArray): void {
+    this.float64(values.length);
+    this.align();
+    this.reserve(values.byteLength);
+    this.bytes.set(new Uint8Array(values.buffer, values.byteOffset, values.byteLength), this.offset);
+    this.offset += values.byteLength;
+  }
+
+  public finish(): Uint8Array {
+    return this.bytes.slice(0, this.offset);
+  }
+}
+
+/**
+ * Reads the values written by a SnapshotWriter.
+ */
+class SnapshotReader {
+  private readonly view: DataView;
+  private offset = 0;
+  private readonly decoder = new TextDecoder();
+
+  constructor(private readonly bytes: Uint8Array) {
+    this.view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  }
+
+  private check(length: number): void {
+    assert(this.offset + length <= this.bytes.length, "Invalid index snapshot: unexpected end of data");
+  }
+
+  public uint32(): number {
+    this.check(4);
+    const value = this.view.getUint32(this.offset, true);
+    this.offset += 4;
+    return value;
+  }
+
+  public float64(): number {
+    this.check(8);
+    const value = this.view.getFloat64(this.offset, true);
+    this.offset += 8;
+    return value;
+  }
+
+  public string(): string {
+    const length = this.uint32();
+    this.check(length);
+    const value = this.decoder.decode(this.bytes.subarray(this.offset, this.offset + length));
+    this.offset += length;
+    return value;
+  }
+
+  public array<T extends TypedArray>(type: {
+    new(buffer: ArrayBufferLike, byteOffset: number, length: number): T,
+    new(length: number): T,
+    BYTES_PER_ELEMENT: number,
+  }): T {
+    const length = this.float64();
+    this.offset = Math.ceil(this.offset / 8) * 8;
+    const byteLength = length * type.BYTES_PER_ELEMENT;
+    this.check(byteLength);
+    const byteOffset = this.bytes.byteOffset + this.offset;
+    this.offset += byteLength;
+    if (byteOffset % type.BYTES_PER_ELEMENT === 0) {
+      return new type(this.bytes.buffer, byteOffset, length);
+    }
+    // Copy the contents of an unaligned array
+    const array = new type(length);
+    new Uint8Array(array.buffer).set(this.bytes.subarray(this.offset - byteLength, this.offset));
+    return array;
+  }
+}
@@ -1,25 +1,42 @@
-import { Range } from "../util/range.js";
-import { PairedOccurrence } from "./pairedOccurrence.js";
+import { ASTRegion, PairedOccurrence } from "./pairedOccurrence.js";
 import { Fragment } from "./fragment.js";
 import { Identifiable } from "../util/identifiable.js";
 import { SharedFingerprint } from "./sharedFingerprint.js";
 import { FileEntry, Occurrence } from "./fingerprintIndex.js";
 import { TokenizedFile } from "../file/tokenizedFile.js";
+import { FrozenIndex } from "./frozenIndex.js";
 
-type LeftRight = string;
-
-interface Kgram {
+/**
+ * A kgram of a file, identified by its hash and its index in the file.
+ */
+export interface Kgram {
   hash: number,
   index: number,
 }
 
+/**
+ * The metrics of a pair that depend on the kgrams of both files.
+ */
+export interface PairMetrics {
+  leftCovered: number;
+  rightCovered: number;
+  longest: number;
+}
+
 /**
  * This class represents all the fragments between two files (i.e. the
  * pair of their hashes).
  */
 export class Pair extends Identifiable {
 
-  private readonly shared: Array<SharedFingerprint>;
+  /**
+   * The default bound on the amount of paired occurrences (combinations of
+   * occurrences of the same fingerprint in both files) used to build fragments.
+   */
+  public static maxPairedOccurrences = 1_000_000;
+
+  // The fingerprints shared by both files, computed when they are first needed
+  private shared: Array<SharedFingerprint> | null = null;
 
   public readonly leftFile: TokenizedFile;
   public readonly rightFile: TokenizedFile;
@@ -33,59 +50,106 @@ export class Pair extends Identifiable {
   public readonly leftIgnored;
   public readonly rightIgnored;
 
+  /**
+   * Creates the pair of the given entries. The metrics of the pair are
+   * computed from their shared kgrams, unless they are given (e.g. when they
+   * have already been computed in a worker thread).
+   */
   constructor(
     public readonly leftEntry: FileEntry,
     public readonly rightEntry: FileEntry,
+    metrics?: PairMetrics,
   ) {
     super();
     this.leftFile = leftEntry.file;
     this.rightFile = rightEntry.file;
-    let small, large;
-    this.shared = [];
-    if (leftEntry.shared.size < rightEntry.shared.size) {
-      small = leftEntry;
-      large = rightEntry;
-    } else {
-      small = rightEntry;
-      large = leftEntry;
-    }
 
-    for (const fingeprint of small.shared) {
-      if (large.shared.has(fingeprint)) {
-        this.shared.push(fingeprint);
+    const { leftCovered, rightCovered, longest } = metrics ?? this.computeMetrics();
+    this.longest = longest;
+    this.leftCovered = leftCovered;
+    this.rightCovered = rightCovered;
+    this.leftIgnored = leftEntry.ignored.size;
+    this.rightIgnored = rightEntry.ignored.size;
+    this.leftTotal = FrozenIndex.kgramCount(leftEntry);
+    this.rightTotal = FrozenIndex.kgramCount(rightEntry);
+    this.similarity = Pair.computeSimilarity(leftEntry, rightEntry, this);
+  }
+
+  /**
+   * The similarity of the pair of the given entries with the given metrics,
+   * without constructing the Pair: the share of their (non-ignored) kgrams
+   * that is covered by the other file.
+   */
+  public static computeSimilarity(
+    leftEntry: FileEntry,
+    rightEntry: FileEntry,
+    { leftCovered, rightCovered }: PairMetrics
+  ): number {
+    const denominator = FrozenIndex.kgramCount(leftEntry) + FrozenIndex.kgramCount(rightEntry)
+      - leftEntry.ignored.size - rightEntry.ignored.size;
+    return denominator > 0 ? (leftCovered + rightCovered) / denominator : 0;
+  }
+
+  /**
+   * The fingerprints shared by both files, by intersecting the fingerprints
+   * of both entries. This is skipped when the metrics of the pair are given,
+   * until its fragments are built.
+   */
+  private sharedFingerprints(): Array<SharedFingerprint> {
+    if (this.shared === null) {
+      let small, large;
+      if (this.leftEntry.shared.size < this.rightEntry.shared.size) {
+        small = this.leftEntry;
+        large = this.rightEntry;
+      } else {
+        small = this.rightEntry;
+        large = this.leftEntry;
+      }
+
+      this.shared = [];
+      for (const fingeprint of small.shared) {
+        if (large.shared.has(fingeprint)) {
+          this.shared.push(fingeprint);
+        }
       }
     }
+    return this.shared;
+  }
 
+  private computeMetrics(): PairMetrics {
     const left: Kgram[] = [];
     const right: Kgram[] = [];
-    for (const fingerprint of this.shared) {
-      for (const occurrence of fingerprint.occurrencesOf(this.leftFile)) {
-        left.push({ hash: fingerprint.hash, index: occurrence.side.index });
+    for (const fingerprint of this.sharedFingerprints()) {
+      for (const index of fingerprint.kgramIndicesOf(this.leftFile)) {
+        left.push({ hash: fingerprint.hash, index });
       }
-      for (const occurrence of fingerprint.occurrencesOf(this.rightFile)) {
-        right.push({ hash: fingerprint.hash, index: occurrence.side.index });
+      for (const index of fingerprint.kgramIndicesOf(this.rightFile)) {
+        right.push({ hash: fingerprint.hash, index });
       }
     }
     left.sort((a, b) => a.index - b.index);
     right.sort((a, b) => a.index - b.index);
 
-    this.longest = this.longestCommonSubstring(left, right);
-
-    this.leftCovered = left.length;
-    this.rightCovered = right.length;
-    this.leftIgnored = leftEntry.ignored.size;
-    this.rightIgnored = rightEntry.ignored.size;
-    this.leftTotal = leftEntry.kgrams.length;
-    this.rightTotal = rightEntry.kgrams.length;
-    const denominator = this.leftTotal + this.rightTotal - this.leftIgnored - this.rightIgnored;
-    if (denominator > 0) {
-      this.similarity = (this.leftCovered + this.rightCovered) / denominator;
-    } else {
-      this.similarity = 0;
-    }
+    return {
+      leftCovered: left.length,
+      rightCovered: right.length,
+      longest: Pair.longestCommonSubstring(left, right),
+    };
   }
 
-  private longestCommonSubstring(l: Kgram[], r: Kgram[]): number {
+  /**
+   * Returns the length of the longest run of kgrams matching in both lists.
+   *
+   * Both lists should be sorted by kgram index. A match on kgram `q` of the
+   * shorter list extends the run ending at kgram `q - 1` that matched the
+   * previous element of the longer list.
+   *
+   * Instead of comparing every element of one list to every element of the
+   * other, the kgrams of the shorter list are grouped by their hash so only
+   * actual matches are visited. Runs are stored per kgram index together
+   * with the position in the longer list they were computed for.
+   */
+  public static longestCommonSubstring(l: Kgram[], r: Kgram[]): number {
     let short, long;
     if (l.length < r.length) {
       short = l;
@@ -95,20 +159,40 @@ export class Pair extends Identifiable {
       long = l;
     }
 
+    if (short.length === 0) {
+      return 0;
+    }
+
+    // The kgram indices of the shorter list, by hash in descending order, so
+    // the run at q - 1 is read before it is overwritten for the same element
+    const byHash: Map<number, number[]> = new Map();
+    for (let i = short.length - 1; i >= 0; i--) {
+      const indices = byHash.get(short[i].hash);
+      if (indices) {
+        indices.push(short[i].index);
+      } else {
+        byHash.set(short[i].hash, [short[i].index]);
+      }
+    }
+
+    const size = short[short.length - 1].index + 1;
+    const runs = new Uint32Array(size);
+    const computedAt = new Int32Array(size).fill(-1);
+
     let longest = 0;
-    let prev: Array<number> = [];
-    let curr: Array<number> = [];
-    for (const l of long) {
-      for (const s of short) {
-        if (l.hash == s.hash) {
-          curr[s.index] = (prev[s.index - 1] || 0) + 1;
-          longest = curr[s.index] > longest ? curr[s.index] : longest;
+    for (let p = 0; p < long.length; p++) {
+      const indices = byHash.get(long[p].hash);
+      if (indices === undefined) {
+        continue;
+      }
+      for (const q of indices) {
+        const previous = q > 0 && computedAt[q - 1] === p - 1 ? runs[q - 1] : 0;
+        runs[q] = previous + 1;
+        computedAt[q] = p;
+        if (runs[q] > longest) {
+          longest = runs[q];
         }
       }
-      const tmp = prev;
-      tmp.length = 0;
-      prev = curr;
-      curr = tmp;
     }
 
     return longest;
@@ -126,153 +210,179 @@ export class Pair extends Identifiable {
     return this.leftCovered + this.rightCovered;
   }
 
-  public buildFragments(minimumOccurrences = 1): Array<Fragment> {
-    const fragmentStart: Map<LeftRight, Fragment> = new Map();
-    const fragmentEnd: Map<LeftRight, Fragment> = new Map();
-
-    for (const fingerprint of this.shared) {
-      const left = Array.from(fingerprint.occurrencesOf(this.leftFile).values());
-      const right = Array.from(fingerprint.occurrencesOf(this.rightFile).values());
-      for (let i = 0; i < left.length; i++) {
-        const leftOcc: Occurrence = left[i];
-        for (let j = 0; j < right.length; j++) {
-          const rightOcc: Occurrence = right[j];
-          const occ = new PairedOccurrence(leftOcc.side, rightOcc.side, fingerprint);
-          this.addPair(fragmentStart, fragmentEnd, occ);
-        }
-      }
-    }
-    this.squash(fragmentStart, fragmentEnd);
-
-    for (const fragment of fragmentStart.values()) {
-      if (fragment.pairs.length < minimumOccurrences) {
-        this.removefragment(fragmentStart, fragmentEnd, fragment);
-      }
-    }
-
-    return Array.from(fragmentStart.values())
-      .sort((a , b) => Range.compare(a.leftkgrams, b.leftkgrams));
-  }
-
   /**
-   * Add a new paired occurrence to the pair.
+   * Builds the fragments between the two files: maximal runs of paired
+   * occurrences along a diagonal (each next kgram directly follows the previous
+   * one in both files). Fragments that are fully contained in another fragment
+   * and fragments with less than `minimumOccurrences` kgrams are discarded.
    *
-   * Tries to extend existing fragments, or creates a new fragment.
+   * A fingerprint occurring `a` times in the left file and `b` times in the
+   * right file results in `a * b` paired occurrences. If the total amount of
+   * paired occurrences would exceed `maxPairedOccurrences`, the fingerprints
+   * with the largest cross products (the most repetitive code) are skipped
+   * until it fits within this bound.
    */
-  private addPair(
-    fragmentStart: Map<LeftRight, Fragment>,
-    fragmentEnd: Map<LeftRight, Fragment>,
-    newPair: PairedOccurrence
-  ): Fragment {
-    const start = this.key(newPair.left.index, newPair.right.index);
-    const end = this.key(newPair.left.index + 1, newPair.right.index + 1);
-
-    let fragment = fragmentEnd.get(start);
-    if (fragment) {
-
-      // extend fragment at starting position
-      fragmentEnd.delete(start);
-      fragment.extendWith(newPair);
-
-    } else {
-
-      // no fragment on our starting position, create a new one
-      fragment = new Fragment(newPair);
-      fragmentStart.set(start, fragment);
-      fragmentEnd.set(end, fragment);
+  public buildFragments(
+    minimumOccurrences = 1,
+    maxPairedOccurrences = Pair.maxPairedOccurrences
+  ): Array<Fragment> {
+    const fingerprints: Array<SharedFingerprint> = [];
+    const lefts: Array<Array<Occurrence>> = [];
+    const rights: Array<Array<Occurrence>> = [];
+    let total = 0;
+    for (const fingerprint of this.sharedFingerprints()) {
+      const left = fingerprint.occurrencesOf(this.leftFile);
+      const right = fingerprint.occurrencesOf(this.rightFile);
+      fingerprints.push(fingerprint);
+      lefts.push(left);
+      rights.push(right);
+      total += left.length * right.length;
     }
 
-    const nextfragment = fragmentStart.get(end);
+    const skipped = new Uint8Array(fingerprints.length);
+    if (total > maxPairedOccurrences) {
+      const order = fingerprints.map((_, i) => i)
+        .sort((a, b) => lefts[b].length * rights[b].length - lefts[a].length * rights[a].length);
+      for (let o = 0; o < order.length && total > maxPairedOccurrences; o++) {
+        skipped[order[o]] = 1;
+        total -= lefts[order[o]].length * rights[order[o]].length;
+      }
+    }
 
-    if (nextfragment) {
-      // there is a fragment directly after us we can extend
+    // The sides of the kgrams by their index, to materialize the fragments
+    const leftSides: Array<ASTRegion> = [];
+    const rightSides: Array<ASTRegion> = [];
+    const fingerprintOf: Array<SharedFingerprint> = [];
+    let maxLeft = 0;
+    let maxRight = 0;
+    for (let f = 0; f < fingerprints.length; f++) {
+      if (skipped[f]) {
+        continue;
+      }
+      for (const { side } of lefts[f]) {
+        leftSides[side.index] = side;
+        fingerprintOf[side.index] = fingerprints[f];
+        maxLeft = Math.max(maxLeft, side.index);
+      }
+      for (const { side } of rights[f]) {
+        rightSides[side.index] = side;
+        maxRight = Math.max(maxRight, side.index);
+      }
+    }
 
-      // remove next fragment's start position
-      fragmentStart.delete(end);
+    // Each paired occurrence (l, r) is encoded as a single number, ordered by
+    // its diagonal (l - r) and then by l. Consecutive kgrams on the same
+    // diagonal have consecutive keys, the extra column of width prevents the
+    // last kgram of a diagonal from running into the first of the next one.
+    const width = maxLeft + 2;
+    const keys = new Float64Array(total);
+    let k = 0;
+    for (let f = 0; f < fingerprints.length; f++) {
+      if (skipped[f]) {
+        continue;
+      }
+      for (const { side: left } of lefts[f]) {
+        for (const { side: right } of rights[f]) {
+          keys[k++] = (left.index - right.index + maxRight) * width + left.index;
+        }
+      }
+    }
+    keys.sort();
+
+    // Sweep along the diagonals to find the runs of consecutive keys
+    const runLeft: Array<number> = [];
+    const runRight: Array<number> = [];
+    const runLength: Array<number> = [];
+    for (let i = 0; i < keys.length; i++) {
+      if (i > 0 && keys[i] === keys[i - 1] + 1) {
+        runLength[runLength.length - 1] += 1;
+      } else {
+        const left = keys[i] % width;
+        runLeft.push(left);
+        runRight.push(left - (Math.floor(keys[i] / width) - maxRight));
+        runLength.push(1);
+      }
+    }
 
-      // extend ourselves
-      fragment.extendWithFragment(nextfragment);
+    // The runs, sorted by the start and by the end of their left range
+    const runs = runLeft.map((_, i) => i);
+    const sortedByStart = runs.sort((a, b) =>
+      runLeft[a] - runLeft[b] || runLength[a] - runLength[b] || runRight[a] - runRight[b]
+    );
+    const sortedByEnd = Array.from(sortedByStart).sort((a, b) =>
+      runLeft[a] + runLength[a] - runLeft[b] - runLength[b] || runLeft[a] - runLeft[b] || runRight[a] - runRight[b]
+    );
+    const removed = Pair.squash(runLeft, runRight, runLength, sortedByStart, sortedByEnd);
 
-      // overwrite the end position of the next fragment with ours
-      fragmentEnd.set(
-        this.key(nextfragment.leftkgrams.to, nextfragment.rightkgrams.to),
-        fragment
+    const fragments: Array<Fragment> = [];
+    for (const run of sortedByStart) {
+      if (removed[run] || runLength[run] < minimumOccurrences) {
+        continue;
+      }
+      const [left, right] = [runLeft[run], runRight[run]];
+      const fragment = new Fragment(
+        new PairedOccurrence(leftSides[left], rightSides[right], fingerprintOf[left])
       );
-    } else {
-
-      // no fragment after us, just set our end position
-      fragmentEnd.set(end, fragment);
+      for (let i = 1; i < runLength[run]; i++) {
+        fragment.extendWith(
+          new PairedOccurrence(leftSides[left + i], rightSides[right + i], fingerprintOf[left + i])
+        );
+      }
+      fragments.push(fragment);
     }
-    return fragment;
+    return fragments;
   }
 
   /**
-   * Remove each Fragment that is contained in a bigger Fragment.
+   * Marks each run that is contained in a bigger run, on both sides.
    */
-  private squash(fragmentStart: Map<LeftRight, Fragment>, fragmentEnd: Map<LeftRight, Fragment>): void {
-    // This algorithm only looks to the `leftkgrams` range of an fragment.
-    // If a fragment is contained within another on the left side, we check if
-    // this is also the case on the right side, before removing the fragment.
+  private static squash(
+    runLeft: Array<number>,
+    runRight: Array<number>,
+    runLength: Array<number>,
+    sortedByStart: Array<number>,
+    sortedByEnd: Array<number>,
+  ): Uint8Array {
+    // This algorithm only looks to the left range of a run. If a run is
+    // contained within another on the left side, we check if this is also the
+    // case on the right side, before removing the run.
 
     // By sorting, and then doing a linear comparison, we can perform this
-    // method in O(n log n) time, whereas checking all pairs of fragments would
+    // method in O(n log n) time, whereas checking all pairs of runs would
     // be O(n²).
-
-    // A list with the fragments sorted by the start of their range interval
-    const sortedByStart = Array.from(fragmentStart.values())
-      .sort((a , b) => Range.compare(a.leftkgrams, b.leftkgrams));
-
-    // A list with the fragments sorted by the end of their range interval
-    const sortedByEnd = Array.from(sortedByStart);
-    sortedByEnd.sort((a: Fragment, b: Fragment) => Range.compareEnds(a.leftkgrams, b.leftkgrams));
-
+    const removed = new Uint8Array(runLeft.length);
+    const seen = new Uint8Array(runLeft.length);
     let j = 0;
-    const seen = new Set<Fragment>();
 
-    // Iterate over the fragments as would encounter them by the start of their range
-    for(const started of sortedByStart) {
+    // Iterate over the runs as would encounter them by the start of their range
+    for (const started of sortedByStart) {
 
-      // If we have already seen this fragment, that means it is contained
-      // within a larger fragment. We have already handled this fragment, so
+      // If we have already seen this run, that means it is contained
+      // within a larger run. We have already handled this run, so
       // we can skip it.
-      if (seen.has(started)) {
+      if (seen[started]) {
         continue;
       }
 
-      // We walk trough the fragments sorted by the end of its range. If we
-      // encounter fragments other than the current fragment, that means it
-      // starts and stops before our current fragments stops, so we possibly
-      // fully enclose that fragment.
+      // We walk trough the runs sorted by the end of its range. If we
+      // encounter runs other than the current run, that means it starts and
+      // stops before our current run stops, so we possibly fully enclose
+      // that run.
       while (started !== sortedByEnd[j]) {
         const candidate = sortedByEnd[j];
-        seen.add(candidate);
-        // We possibly contain the left side, so check if the full fragment is
+        seen[candidate] = 1;
+        // We possibly contain the left side, so check if the full run is
         // contained.
-        if (started.leftkgrams.contains(candidate.leftkgrams) &&
-          started.rightkgrams.contains(candidate.rightkgrams)) {
-          // If this is the case, remove the contained fragment.
-          this.removefragment(fragmentStart, fragmentEnd, candidate);
+        if (runLeft[started] <= runLeft[candidate] &&
+          runLeft[candidate] + runLength[candidate] <= runLeft[started] + runLength[started] &&
+          runRight[started] <= runRight[candidate] &&
+          runRight[candidate] + runLength[candidate] <= runRight[started] + runLength[started]) {
+          removed[candidate] = 1;
         }
         j += 1;
       }
       j += 1;
     }
-  }
-
-  private removefragment(
-    fragmentStart: Map<LeftRight, Fragment>,
-    fragmentEnd: Map<LeftRight, Fragment>,
-    fragment: Fragment
-  ): void {
-    fragmentStart.delete(
-      this.key(fragment.leftkgrams.from, fragment.rightkgrams.from)
-    );
-    fragmentEnd.delete(
-      this.key(fragment.leftkgrams.to, fragment.rightkgrams.to)
-    );
-  }
-
-  private key(left: number, right: number): LeftRight {
-    return `${left}|${right}`;
+    return removed;
   }
 }
@@ -1,6 +1,8 @@
 import { Occurrence } from "./fingerprintIndex.js";
 import { TokenizedFile } from "../file/tokenizedFile.js";
 import { Identifiable } from "../util/identifiable.js";
+import { assert } from "../util/utils.js";
+import { FrozenIndex } from "./frozenIndex.js";
 
 export class SharedFingerprint extends Identifiable {
 
@@ -9,12 +11,43 @@ export class SharedFingerprint extends Identifiable {
 
   private partMap: Map<TokenizedFile, Array<Occurrence>> = new Map();
 
+  // Once frozen, the occurrences are read from the posting list in this slot
+  private frozen: FrozenIndex | null = null;
+  private slot: number = -1;
+
   constructor(
     public readonly hash: number,
     public readonly kgram: Array<string> | null,
   ) { super(); }
 
+  /**
+   * Drops the occurrence objects of this fingerprint, further occurrences
+   * will be read from (and materialized by) the given frozen index.
+   *
+   * Occurrences in files that are not part of the frozen index (e.g. files
+   * added to the index after it has been frozen) are still stored as objects.
+   */
+  public freeze(frozen: FrozenIndex, slot: number): void {
+    assert(frozen.hash(slot) === this.hash, `Fingerprint ${this.hash} does not belong in slot ${slot}`);
+    this.frozen = frozen;
+    this.slot = slot;
+    this.partMap = new Map();
+  }
+
+  public isFrozen(): boolean {
+    return this.frozen !== null;
+  }
+
+  /**
+   * Whether the occurrences of this fingerprint in the given file are stored
+   * in the frozen index.
+   */
+  private isFrozenIn(file: TokenizedFile): boolean {
+    return this.frozen !== null && this.frozen.position(file) !== undefined;
+  }
+
   public add(part: Occurrence): void {
+    assert(!this.isFrozenIn(part.file), "Cannot add occurrences to a frozen file");
     const parts = this.partMap.get(part.file) || [];
     if (parts.length === 0) {
       this.partMap.set(part.file, parts);
@@ -27,24 +60,61 @@ export class SharedFingerprint extends Identifiable {
   }
 
   public occurrencesOf(file: TokenizedFile): Array<Occurrence> {
+    if (this.isFrozenIn(file)) {
+      return this.frozen!.occurrences(this.slot, file);
+    }
     return this.partMap.get(file) || [];
   }
 
+  /**
+   * The amount of times this fingerprint occurs in the given file.
+   */
+  public occurrenceCount(file: TokenizedFile): number {
+    if (this.isFrozenIn(file)) {
+      return this.frozen!.occurrenceCount(this.slot, file);
+    }
+    return this.partMap.get(file)?.length ?? 0;
+  }
+
+  /**
+   * The kgram indices at which this fingerprint occurs in the given file.
+   */
+  public kgramIndicesOf(file: TokenizedFile): Array<number> {
+    if (this.isFrozenIn(file)) {
+      return this.frozen!.kgramIndices(this.slot, file);
+    }
+    return (this.partMap.get(file) || []).map(o => o.side.index);
+  }
+
   public parts(): Array<Occurrence> {
-    return Array.from(this.partMap.values())
+    const parts = Array.from(this.partMap.values())
       .map(set => Array.from(set))
       .flat();
+    if (this.frozen) {
+      return this.frozen.occurrences(this.slot).concat(parts);
+    }
+    return parts;
   }
 
   public files(): Array<TokenizedFile> {
-    return Array.from(this.partMap.keys());
+    const files = Array.from(this.partMap.keys());
+    if (this.frozen) {
+      return this.frozen.filesOf(this.slot).concat(files);
+    }
+    return files;
   }
 
   public fileCount(): number {
+    if (this.frozen) {
+      return this.frozen.fileCount(this.slot) + this.partMap.size;
+    }
     return this.partMap.size;
   }
 
   public includesFile(file: TokenizedFile): boolean {
+    if (this.isFrozenIn(file)) {
+      return this.frozen!.occurrenceCount(this.slot, file) > 0;
+    }
     return this.partMap.has(file);
   }
 }
@@ -17,14 +17,17 @@ export interface ExtraInfo {
 /**
  * Contains the content of a file, does not need to be backed by an actual file
  * (so it can be used to stub files in the tests).
+ *
+ * The content is kept as a single string. The offsets of the lines in the
+ * content are only computed when they are first needed, the lines themselves
+ * are sliced from the content on request.
  */
 export class File extends Identifiable {
 
-  public readonly charCount: number;
-  public readonly lineCount: number;
-  public readonly lines: Array<string>;
   public readonly extra?: ExtraInfo;
 
+  private offsets: Uint32Array | null = null;
+
   public static compare(a: File, b: File): number {
     if (a.path < b.path) {
       return -1;
@@ -37,19 +40,62 @@ export class File extends Identifiable {
 
   constructor(
     public readonly path: string,
-    content: string,
+    public readonly content: string,
     extra?: ExtraInfo,
     id?: number
   ) {
     super(id);
-    this.charCount = content.length;
-    this.lines = content.split("\n");
-    this.lineCount = this.lines.length;
     this.extra = extra;
   }
 
-  get content(): string {
-    return this.lines.join("\n");
+  get charCount(): number {
+    return this.content.length;
+  }
+
+  /**
+   * The offset in the content of the first character of each line, followed
+   * by the length of the content plus one (the offset of the line after the
+   * last line).
+   */
+  get lineOffsets(): Uint32Array {
+    if (this.offsets === null) {
+      let count = 1;
+      for (let i = this.content.indexOf("\n"); i >= 0; i = this.content.indexOf("\n", i + 1)) {
+        count += 1;
+      }
+      const offsets = new Uint32Array(count + 1);
+      let line = 1;
+      for (let i = this.content.indexOf("\n"); i >= 0; i = this.content.indexOf("\n", i + 1)) {
+        offsets[line++] = i + 1;
+      }
+      offsets[count] = this.content.length + 1;
+      this.offsets = offsets;
+    }
+    return this.offsets;
+  }
+
+  get lineCount(): number {
+    return this.lineOffsets.length - 1;
+  }
+
+  /**
+   * The line with the given (zero-based) number, without its newline.
+   */
+  public line(index: number): string {
+    const offsets = this.lineOffsets;
+    return this.content.substring(offsets[index], offsets[index + 1] - 1);
+  }
+
+  /**
+   * The lines of the content. They are sliced from the content on every
+   * access: use `line` when only some of the lines are needed.
+   */
+  get lines(): Array<string> {
+    const lines = new Array<string>(this.lineCount);
+    for (let i = 0; i < lines.length; i++) {
+      lines[i] = this.line(i);
+    }
+    return lines;
   }
 
   get extension(): string {
@@ -0,0 +1,145 @@
+/**
+ * Compact text encoding of the tokens and the mapping of a file, used for the
+ * `ast` and `mapping` columns of the files in a report.
+ *
+ * Both are stored as a version prefix followed by the base64 encoding of a
+ * sequence of unsigned LEB128 varints:
+ *
+ * - tokens are stored as their index in the vocabulary of the report, which is
+ *   stored once for all files;
+ * - regions are stored as the difference of each of their four numbers
+ *   (startRow, startCol, endRow, endCol) with the previous region, zigzag
+ *   encoded so small negative differences are small numbers as well.
+ *   Consecutive tokens mostly have equal or nearby regions, so most regions
+ *   only take four bytes.
+ *
+ * The previous encoding (JSON arrays) does not start with the prefix, so both
+ * encodings can be distinguished.
+ */
+export class TokenEncoding {
+
+  public static readonly prefix = "c1:";
+
+  /**
+   * Whether the given text is in this encoding (instead of JSON).
+   */
+  public static isCompact(text: string): boolean {
+    return text.startsWith(TokenEncoding.prefix);
+  }
+
+  /**
+   * Encodes the given indices of tokens in the vocabulary of a report.
+   */
+  public static encodeTokens(indices: ArrayLike<number>): string {
+    const writer = new VarintWriter(indices.length);
+    for (let i = 0; i < indices.length; i++) {
+      writer.write(indices[i]);
+    }
+    return TokenEncoding.prefix + writer.toBase64();
+  }
+
+  public static decodeTokens(text: string, vocabulary: Array<string>): Array<string> {
+    const indices = TokenEncoding.decodeVarints(text);
+    const tokens = new Array<string>(indices.length);
+    for (let i = 0; i < indices.length; i++) {
+      tokens[i] = vocabulary[indices[i]];
+      if (tokens[i] === undefined) {
+        throw new Error(`Token ${indices[i]} is not in the vocabulary of the report`);
+      }
+    }
+    return tokens;
+  }
+
+  /**
+   * Encodes a mapping packed as four numbers (startRow, startCol, endRow,
+   * endCol) per token.
+   */
+  public static encodeMapping(packed: ArrayLike<number>): string {
+    const writer = new VarintWriter(packed.length);
+    for (let i = 0; i < packed.length; i++) {
+      const delta = i < 4 ? packed[i] : packed[i] - packed[i - 4];
+      // zigzag: 0, -1, 1, -2, 2, ... becomes 0, 1, 2, 3, 4, ...
+      writer.write(delta < 0 ? -2 * delta - 1 : 2 * delta);
+    }
+    return TokenEncoding.prefix + writer.toBase64();
+  }
+
+  /**
+   * Decodes a mapping, packed as four numbers per token.
+   */
+  public static decodeMapping(text: string): Uint32Array {
+    const values = TokenEncoding.decodeVarints(text);
+    if (values.length % 4 !== 0) {
+      throw new Error("A mapping should contain four numbers per token");
+    }
+    const packed = new Uint32Array(values.length);
+    for (let i = 0; i < values.length; i++) {
+      const value = values[i];
+      const delta = value % 2 === 0 ? value / 2 : -(value + 1) / 2;
+      packed[i] = i < 4 ? delta : packed[i - 4] + delta;
+    }
+    return packed;
+  }
+
+  private static decodeVarints(text: string): Float64Array {
+    if (!TokenEncoding.isCompact(text)) {
+      throw new Error("Unknown encoding of tokens");
+    }
+    const binary = atob(text.substring(TokenEncoding.prefix.length));
+    // There are at most as many values as bytes
+    const values = new Float64Array(binary.length);
+    let count = 0;
+    let value = 0;
+    let shift = 0;
+    for (let i = 0; i < binary.length; i++) {
+      const byte = binary.charCodeAt(i);
+      value += (byte & 0x7f) * 2 ** shift;
+      if (byte & 0x80) {
+        shift += 7;
+      } else {
+        values[count++] = value;
+        value = 0;
+        shift = 0;
+      }
+    }
+    if (shift !== 0) {
+      throw new Error("Truncated encoding of tokens");
+    }
+    return values.slice(0, count);
+  }
+}
+
+/**
+ * Writes unsigned LEB128 varints to a growing byte array.
+ */
+class VarintWriter {
+  private bytes: Uint8Array;
+  private length = 0;
+
+  constructor(expectedCount: number) {
+    this.bytes = new Uint8Array(Math.max(16, expectedCount + 8));
+  }
+
+  public write(value: number): void {
+    if (this.length + 5 > this.bytes.length) {
+      const bytes = new Uint8Array(2 * this.bytes.length);
+      bytes.set(this.bytes);
+      this.bytes = bytes;
+    }
+    while (value >= 0x80) {
+      this.bytes[this.length++] = (value & 0x7f) | 0x80;
+      value = Math.floor(value / 0x80);
+    }
+    this.bytes[this.length++] = value;
+  }
+
+  public toBase64(): string {
+    // Convert in chunks, the amount of arguments of a function call is limited
+    const chunks: Array<string> = [];
+    for (let i = 0; i < this.length; i += 0x8000) {
+      const chunk = this.bytes.subarray(i, Math.min(i + 0x8000, this.length));
+      chunks.push(String.fromCharCode.apply(null, chunk as unknown as Array<number>));
+    }
+    return btoa(chunks.join(""));
+  }
+}
@@ -1,14 +1,183 @@
 import { File } from "./file.js";
 import { Region } from "../util/region.js";
+import { TokenTable } from "../hashing/tokenTable.js";
+import { assert } from "../util/utils.js";
+
+/**
+ * Stores the tokens of a file outside of memory (e.g. in a temporary file),
+ * see TokenizedFile.offload.
+ */
+export interface TokenStore {
+  /**
+   * Reads the ids of the tokens from `start` up to `end` (exclusive).
+   */
+  readIds(start: number, end: number): Uint32Array;
+
+  /**
+   * Reads the packed regions of the tokens from `start` up to `end`
+   * (exclusive).
+   */
+  readMapping(start: number, end: number): Uint32Array;
+}
 
 export class TokenizedFile extends File {
 
+  private tokenStrings: Array<string> | null = null;
+  private ids: Uint32Array | null = null;
+  private regions: Array<Region> | null = null;
+  private packed: Uint32Array | null = null;
+  private store: TokenStore | null = null;
+  private readonly count: number;
+
+  /**
+   * Creates a tokenized file from its tokens, either as strings or as the
+   * ids of the tokens in the given table.
+   *
+   * The mapping is the region of each token, either as Region objects or
+   * packed as four consecutive numbers (startRow, startCol, endRow, endCol)
+   * per token. Packed regions are only converted to objects when the mapping
+   * is accessed.
+   */
   constructor(
     public file: File,
-    public readonly tokens: Array<string>,
-    public readonly mapping: Array<Region>
+    tokens: Array<string> | Uint32Array,
+    mapping: Array<Region> | Uint32Array,
+    public readonly table: TokenTable | null = null
   ) {
+    // The content string is shared with the original file, not copied
     super(file.path, file.content, file.extra, file.id);
+    if (tokens instanceof Uint32Array) {
+      assert(table !== null, "A token table is required to create a file from token ids");
+      this.ids = tokens;
+    } else {
+      this.tokenStrings = tokens;
+    }
+    this.count = tokens.length;
+    if (mapping instanceof Uint32Array) {
+      assert(mapping.length === 4 * this.tokenCount, "A packed mapping needs four numbers per token");
+      this.packed = mapping;
+    } else {
+      this.regions = mapping;
+    }
   }
 
+  /**
+   * Moves the tokens and mapping of this file (which should be created from
+   * token ids) to the given store, which should already contain them. They
+   * are read from the store again on every access, so only access them when
+   * needed, and preferably through `tokenSlice`, `token` and `region`.
+   */
+  public offload(store: TokenStore): void {
+    assert(this.ids !== null, "Only files created from token ids can be offloaded");
+    this.store = store;
+    this.ids = null;
+    this.packed = null;
+    this.regions = null;
+  }
+
+  get isOffloaded(): boolean {
+    return this.store !== null;
+  }
+
+  /**
+   * The line offsets of the original file, so they are only computed once.
+   */
+  get lineOffsets(): Uint32Array {
+    return this.file.lineOffsets;
+  }
+
+  /**
+   * The ids of the tokens in `table`, if this file was created from token ids.
+   * The ids of an offloaded file are read from its store on every access.
+   */
+  get tokenIds(): Uint32Array | null {
+    return this.store ? this.store.readIds(0, this.count) : this.ids;
+  }
+
+  /**
+   * The mapping packed as four numbers (startRow, startCol, endRow, endCol)
+   * per token, without creating Region objects if the file was created from a
+   * packed mapping.
+   */
+  get packedMapping(): Uint32Array {
+    if (this.store !== null) {
+      return this.store.readMapping(0, this.count);
+    } else if (this.packed !== null) {
+      return this.packed;
+    }
+    const packed = new Uint32Array(4 * this.regions!.length);
+    for (let i = 0; i < this.regions!.length; i++) {
+      const region = this.regions![i];
+      packed[4 * i] = region.startRow;
+      packed[4 * i + 1] = region.startCol;
+      packed[4 * i + 2] = region.endRow;
+      packed[4 * i + 3] = region.endCol;
+    }
+    return packed;
+  }
+
+  /**
+   * The region in the file of each token.
+   */
+  get mapping(): Array<Region> {
+    if (this.regions !== null) {
+      return this.regions;
+    }
+    const packed = this.packedMapping;
+    const regions = new Array<Region>(packed.length / 4);
+    for (let i = 0; i < regions.length; i++) {
+      regions[i] = new Region(packed[4 * i], packed[4 * i + 1], packed[4 * i + 2], packed[4 * i + 3]);
+    }
+    // Offloaded regions are not kept in memory
+    if (this.store === null) {
+      this.regions = regions;
+    }
+    return regions;
+  }
+
+  /**
+   * The region of the token with the given index, without converting the
+   * whole mapping to Region objects.
+   */
+  public region(index: number): Region {
+    if (this.regions !== null) {
+      return this.regions[index];
+    }
+    const packed = this.store ? this.store.readMapping(index, index + 1) : this.packed!.subarray(4 * index);
+    return new Region(packed[0], packed[1], packed[2], packed[3]);
+  }
+
+  /**
+   * Returns the tokens of this file. If the file was created from token ids,
+   * a new array of strings is created on every call: use `tokenSlice`,
+   * `token` or `tokenIds` when only a part of the tokens is needed.
+   */
+  public decodeTokens(): Array<string> {
+    return this.tokenStrings ?? this.table!.decode(this.tokenIds!);
+  }
+
+  get tokenCount(): number {
+    return this.count;
+  }
+
+  /**
+   * The tokens from `start` up to `end` (exclusive), like `tokens.slice`.
+   */
+  public tokenSlice(start: number, end: number): Array<string> {
+    if (this.tokenStrings) {
+      return this.tokenStrings.slice(start, end);
+    }
+    const ids = this.store ?
+      this.store.readIds(start, Math.min(end, this.count)) :
+      this.ids!.subarray(start, end);
+    return this.table!.decode(ids);
+  }
+
+  public token(index: number): string {
+    if (this.tokenStrings) {
+      return this.tokenStrings[index];
+    }
+    const id = this.store ? this.store.readIds(index, index + 1)[0] : this.ids![index];
+    return this.table!.token(id);
+  }
 }
@@ -0,0 +1,175 @@
+import { RollingHash } from "./rollingHash.js";
+import { TokenHash } from "./tokenHash.js";
+
+/**
+ * Hashes a single token to a 32-bit unsigned integer.
+ */
+export interface TokenHasher {
+  hashToken(token: string): number;
+}
+
+/**
+ * Hashes a sliding window of token hashes.
+ */
+export interface RollingHasher {
+  nextHash(token: number): number;
+}
+
+/**
+ * A combination of a token hash and a rolling hash, used to compute the
+ * fingerprints of the kgrams of a file.
+ *
+ * The engine determines the fingerprint hashes in a report, so the same
+ * engine should be used to (re)compute fingerprints of a report.
+ */
+export abstract class HashEngine {
+
+  constructor(public readonly name: string) {}
+
+  public abstract createTokenHash(): TokenHasher;
+
+  public abstract createRollingHash(k: number): RollingHasher;
+
+  /**
+   * The available engines, the first one is the default.
+   */
+  public static engines: Array<HashEngine>;
+
+  public static get default(): HashEngine {
+    return HashEngine.engines[0];
+  }
+
+  public static names(): Array<string> {
+    return HashEngine.engines.map(e => e.name);
+  }
+
+  /**
+   * Returns the engine with the given name, throws an error if it does not
+   * exist.
+   */
+  public static byName(name: string): HashEngine {
+    const engine = HashEngine.engines.find(e => e.name === name);
+    if (engine === undefined) {
+      throw new Error(
+        `Unknown hash engine '${name}', options are: ${HashEngine.names().join(", ")}`
+      );
+    }
+    return engine;
+  }
+}
+
+/**
+ * The original engine: Rabin-Karp hashes modulo 33554393, computed with
+ * floating-point arithmetic.
+ */
+export class DefaultHashEngine extends HashEngine {
+  constructor() {
+    super("default");
+  }
+
+  public createTokenHash(): TokenHasher {
+    return new TokenHash();
+  }
+
+  public createRollingHash(k: number): RollingHasher {
+    return new RollingHash(k);
+  }
+}
+
+/**
+ * FNV-1a hash of a token, computed with 32-bit integer multiplications.
+ */
+export class ImulTokenHash implements TokenHasher {
+  public hashToken(token: string): number {
+    let hash = 0x811c9dc5;
+    for (let i = 0; i < token.length; i++) {
+      hash = Math.imul(hash ^ token.charCodeAt(i), 0x01000193);
+    }
+    return hash >>> 0;
+  }
+}
+
+/**
+ * Rabin-Karp rolling hash modulo 2^32. Multiplications are done with
+ * Math.imul, so no floating-point modulo is needed.
+ */
+export class ImulRollingHash implements RollingHasher {
+  // An odd base (the golden ratio multiplier), so it is invertible modulo 2^32
+  readonly base = 0x9e3779b1;
+  // base^k modulo 2^32, the factor of the token leaving the window
+  private readonly power: number;
+  private readonly memory: Uint32Array;
+  private i = 0;
+  private hash = 0;
+
+  constructor(readonly k: number) {
+    let power = 1;
+    for (let i = 0; i < k; i++) {
+      power = Math.imul(power, this.base);
+    }
+    this.power = power;
+    this.memory = new Uint32Array(k);
+  }
+
+  public nextHash(token: number): number {
+    this.hash = (Math.imul(this.hash, this.base) + token - Math.imul(this.power, this.memory[this.i])) >>> 0;
+    this.memory[this.i] = token;
+    this.i = (this.i + 1) % this.k;
+    return this.hash;
+  }
+}
+
+export class Imul32HashEngine extends HashEngine {
+  constructor() {
+    super("imul32");
+  }
+
+  public createTokenHash(): TokenHasher {
+    return new ImulTokenHash();
+  }
+
+  public createRollingHash(k: number): RollingHasher {
+    return new ImulRollingHash(k);
+  }
+}
+
+/**
+ * Two independent Rabin-Karp rolling hashes modulo different 26-bit primes,
+ * combined into a single hash of 52 bits (which fits in the 53-bit precision
+ * of a double).
+ */
+export class DualRollingHash implements RollingHasher {
+  private readonly first: RollingHash;
+  private readonly second: RollingHash;
+
+  constructor(k: number) {
+    this.first = new RollingHash(k, 67108859, 4194301);
+    this.second = new RollingHash(k, 67108837, 4194287);
+  }
+
+  public nextHash(token: number): number {
+    const first = this.first.nextHash(token % this.first.mod);
+    const second = this.second.nextHash(token % this.second.mod);
+    return first * this.second.mod + second;
+  }
+}
+
+export class Dual52HashEngine extends HashEngine {
+  constructor() {
+    super("dual52");
+  }
+
+  public createTokenHash(): TokenHasher {
+    return new ImulTokenHash();
+  }
+
+  public createRollingHash(k: number): RollingHasher {
+    return new DualRollingHash(k);
+  }
+}
+
+HashEngine.engines = [
+  new DefaultHashEngine(),
+  new Imul32HashEngine(),
+  new Dual52HashEngine(),
+];
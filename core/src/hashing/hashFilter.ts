@@ -1,4 +1,5 @@
-import { TokenHash } from "./tokenHash.js";
+import { TokenTable } from "./tokenTable.js";
+import { HashEngine, TokenHasher } from "./hashEngine.js";
 
 export interface Fingerprint {
   data: Array<string> | null;
@@ -7,13 +8,19 @@ export interface Fingerprint {
   stop: number;
 }
 
+/**
+ * Receives the hash and the token range (stop inclusive) of a selected kgram.
+ */
+export type FingerprintCallback = (hash: number, start: number, stop: number) => void;
+
 export abstract class HashFilter {
 
-  protected hasher: TokenHash = new TokenHash();
+  protected readonly hasher: TokenHasher;
   protected readonly kgramData: boolean;
 
-  protected constructor(kgramData = false) {
+  protected constructor(kgramData = false, protected readonly engine: HashEngine = HashEngine.default) {
     this.kgramData = kgramData;
+    this.hasher = engine.createTokenHash();
   }
 
 
@@ -25,5 +32,58 @@ export abstract class HashFilter {
     return hashes;
   }
 
-  public abstract fingerprints(tokens: string[]): Array<Fingerprint>;
+  /**
+   * Returns the hash of each token in a typed array.
+   */
+  public hashTokenArray(tokens: string[]): Uint32Array {
+    const hashes = new Uint32Array(tokens.length);
+    for (let i = 0; i < tokens.length; i++) {
+      hashes[i] = this.hasher.hashToken(tokens[i]);
+    }
+    return hashes;
+  }
+
+  /**
+   * Returns the hash of each token id in a typed array. The hash of each
+   * token is only computed once per table.
+   *
+   * @param ids The ids of the tokens.
+   * @param table The table the ids belong to.
+   */
+  public hashTokenIds(ids: Uint32Array, table: TokenTable): Uint32Array {
+    const tokenHashes = table.hashesFor(this.hasher);
+    const hashes = new Uint32Array(ids.length);
+    for (let i = 0; i < ids.length; i++) {
+      hashes[i] = tokenHashes[ids[i]];
+    }
+    return hashes;
+  }
+
+  /**
+   * Calls `emit` for each fingerprint selected from the given token hashes,
+   * in order, without collecting them.
+   *
+   * @param hashes The hash of each token (see `hashTokenArray`).
+   * @param emit Called with the hash, start and stop of each fingerprint.
+   */
+  public abstract streamFingerprints(hashes: Uint32Array, emit: FingerprintCallback): void;
+
+  /**
+   * Returns the fingerprints of the given tokens, including the tokens of
+   * each kgram if `kgramData` is set.
+   *
+   * @param tokens The list of tokens to process.
+   */
+  public fingerprints(tokens: string[]): Array<Fingerprint> {
+    const fingerprints: Array<Fingerprint> = [];
+    this.streamFingerprints(this.hashTokenArray(tokens), (hash, start, stop) => {
+      fingerprints.push({
+        data: this.kgramData ? tokens.slice(start, stop + 1) : null,
+        hash,
+        start,
+        stop,
+      });
+    });
+    return fingerprints;
+  }
 }
@@ -14,9 +14,9 @@ export class RollingHash {
    * available amount of bits of precision.
    *
    * Javascript has 53-bit precision numbers (doubles) so we pick the largest
-   * prime number with 26 bits.
+   * prime number with 26 bits by default.
    */
-  readonly mod: number = 33554393;
+  readonly mod: number;
 
   /**
    * The base (or radix) used in the hash calculation.
@@ -24,9 +24,9 @@ export class RollingHash {
    * The hashes/numbers generated by TokenHash should already use as much
    * bits as possible because they share the same modulus.
    *
-   * We have chosen for the largest prime with 22 bits.
+   * We have chosen for the largest prime with 22 bits by default.
    */
-  readonly base: number = 4194301;
+  readonly base: number;
 
   /**
    * The size of the window/length of this rolling hash.
@@ -42,9 +42,13 @@ export class RollingHash {
    * Creates and initializes a new RollingHash instance.
    *
    * @param k The size of the window/length of which the hashes are calculated.
+   * @param mod The modulus, token values should be smaller than it.
+   * @param base The base, base * mod should not exceed 2^53.
    */
-  constructor(k: number) {
+  constructor(k: number, mod = 33554393, base = 4194301) {
     this.k = k;
+    this.mod = mod;
+    this.base = base;
     this.maxBase = this.mod - this.modPow(this.base, this.k, this.mod);
     this.memory = new Array(this.k).fill(0);
   }
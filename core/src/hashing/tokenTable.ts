@@ -0,0 +1,75 @@
+import { TokenHasher } from "./hashEngine.js";
+
+/**
+ * A symbol table of tokens, mapping each distinct token to a dense integer id.
+ *
+ * The token streams of a tree-sitter grammar only contain a small vocabulary
+ * (parentheses and the node types of the grammar), so files can store their
+ * tokens as a Uint32Array of ids instead of an array of strings. The hash of
+ * each token is computed once per TokenHasher and looked up by its id.
+ */
+export class TokenTable {
+
+  private readonly ids: Map<string, number> = new Map();
+  private readonly tokens: Array<string> = [];
+  // The hashes of the tokens by id, for each hasher they were requested for.
+  // Tables are shared by all analyses of a language, so the hashers of
+  // previous analyses should not be kept alive.
+  private readonly hashes: WeakMap<TokenHasher, Array<number>> = new WeakMap();
+
+  get size(): number {
+    return this.tokens.length;
+  }
+
+  /**
+   * Returns the id of the given token, adding it to the table if needed.
+   */
+  public intern(token: string): number {
+    let id = this.ids.get(token);
+    if (id === undefined) {
+      id = this.tokens.length;
+      this.ids.set(token, id);
+      this.tokens.push(token);
+    }
+    return id;
+  }
+
+  /**
+   * Returns the id of the given token, or undefined if it is not in the table.
+   */
+  public idOf(token: string): number | undefined {
+    return this.ids.get(token);
+  }
+
+  public token(id: number): string {
+    return this.tokens[id];
+  }
+
+  /**
+   * Returns the tokens of the given ids.
+   */
+  public decode(ids: ArrayLike<number>): Array<string> {
+    const tokens = new Array<string>(ids.length);
+    for (let i = 0; i < ids.length; i++) {
+      tokens[i] = this.tokens[ids[i]];
+    }
+    return tokens;
+  }
+
+  /**
+   * Returns the hash of each token in the table by its id, as computed by
+   * the given hasher. Hashes are only computed for tokens that were added
+   * since the last call with the same hasher.
+   */
+  public hashesFor(hasher: TokenHasher): Array<number> {
+    let hashes = this.hashes.get(hasher);
+    if (hashes === undefined) {
+      hashes = [];
+      this.hashes.set(hasher, hashes);
+    }
+    for (let id = hashes.length; id < this.tokens.length; id++) {
+      hashes.push(hasher.hashToken(this.tokens[id]));
+    }
+    return hashes;
+  }
+}
@@ -1,5 +1,5 @@
-import { Fingerprint, HashFilter } from "./hashFilter.js";
-import { RollingHash } from "./rollingHash.js";
+import { FingerprintCallback, HashFilter } from "./hashFilter.js";
+import { HashEngine } from "./hashEngine.js";
 
 export class WinnowFilter extends HashFilter {
   private readonly k: number;
@@ -14,67 +14,62 @@ export class WinnowFilter extends HashFilter {
    * @param k The kgram size of which hashes are calculated
    * @param windowSize The window size
    * @param kgramData Whether to output kgram content in fingerprints.
+   * @param engine The hash engine used to hash tokens and kgrams.
    */
-  constructor(k: number, windowSize: number, kgramData = false) {
-    super(kgramData);
+  constructor(k: number, windowSize: number, kgramData = false, engine = HashEngine.default) {
+    super(kgramData, engine);
     this.k = k;
     this.windowSize = windowSize;
   }
 
   /**
-   * Returns an async iterator that yields fingerprints containing a hashing and its
-   * corresponding kgram position. Can be called successively on multiple files.
+   * Calls `emit` with each fingerprint (a hashing and its corresponding kgram
+   * position) selected from the given token hashes. Can be called successively
+   * on multiple files.
+   *
+   * Only a buffer of `windowSize` kgram hashes is kept, nothing is allocated
+   * per token.
    *
    * Code based on pseudocode from
    * http://theory.stanford.edu/~aiken/publications/papers/sigmod03.pdf
    *
-   * @param tokens The list of tokens to process.
+   * @param hashes The hash of each token to process.
+   * @param emit Called with the hash, start and stop of each fingerprint.
    */
-  public fingerprints(tokens: string[]): Array<Fingerprint> {
-    const hash = new RollingHash(this.k);
-    let window: string[] = [];
-    let filePos: number = -1 * this.k;
+  public streamFingerprints(hashes: Uint32Array, emit: FingerprintCallback): void {
+    const hash = this.engine.createRollingHash(this.k);
     let bufferPos = 0;
     let minPos = 0;
-    const buffer: number[] = new Array(this.windowSize).fill(Number.MAX_SAFE_INTEGER);
-    const fingerprints: Array<Fingerprint> = [];
+    const buffer = new Float64Array(this.windowSize).fill(Number.MAX_SAFE_INTEGER);
 
     // At the end of each iteration, minPos holds the position of the rightmost
     // minimal hashing in the current window.
-    // yield([x,pos]) is called only the first time an instance of x is selected
-    for (const [hashedToken, token] of this.hashTokens(tokens)) {
-      filePos++;
-      window = window.slice(-this.k + 1);
-      window.push(token);
+    // emit(x, pos) is called only the first time an instance of x is selected
+    for (let i = 0; i < hashes.length; i++) {
+      // the start of the kgram ending at this token
+      const filePos = i - this.k + 1;
       if (filePos < 0) {
-        hash.nextHash(hashedToken);
+        hash.nextHash(hashes[i]);
         continue;
       }
       bufferPos = (bufferPos + 1) % this.windowSize;
-      buffer[bufferPos] = hash.nextHash(hashedToken);
+      buffer[bufferPos] = hash.nextHash(hashes[i]);
       if (minPos === bufferPos) {
         // The previous minimum is no longer in this window.
         // Scan buffer starting from bufferPos for the rightmost minimal hashing.
         // Note minPos starts with the index of the rightmost hashing.
         for (
-          let i = (bufferPos + 1) % this.windowSize;
-          i !== bufferPos;
-          i = (i + 1) % this.windowSize
+          let j = (bufferPos + 1) % this.windowSize;
+          j !== bufferPos;
+          j = (j + 1) % this.windowSize
         ) {
-          if (buffer[i] <= buffer[minPos]) {
-            minPos = i;
+          if (buffer[j] <= buffer[minPos]) {
+            minPos = j;
           }
         }
 
-        const offset = (minPos - bufferPos - this.windowSize) % this.windowSize;
-        const start = filePos + offset;
-
-        fingerprints.push({
-          data: this.kgramData ? tokens.slice(start, start + this.k) : null,
-          hash: buffer[minPos],
-          start,
-          stop: start + this.k - 1,
-        });
+        const start = filePos + ((minPos - bufferPos - this.windowSize) % this.windowSize);
+        emit(buffer[minPos], start, start + this.k - 1);
 
       } else {
         // Otherwise, the previous minimum is still in this window. Compare
@@ -82,16 +77,9 @@ export class WinnowFilter extends HashFilter {
         if (buffer[bufferPos] <= buffer[minPos]) {
           minPos = bufferPos;
           const start = filePos + ((minPos - bufferPos - this.windowSize) % this.windowSize);
-
-          fingerprints.push({
-            data: this.kgramData ? tokens.slice(start, start + this.k) : null,
-            hash: buffer[minPos],
-            start,
-            stop: start + this.k - 1,
-          });
+          emit(buffer[minPos], start, start + this.k - 1);
         }
       }
     }
-    return fingerprints;
   }
 }
@@ -1,14 +1,20 @@
 export * from "./algorithm/fingerprintIndex.js";
 export * from "./algorithm/fragment.js";
+export * from "./algorithm/frozenIndex.js";
+export * from "./algorithm/indexSnapshot.js";
 export * from "./algorithm/pair.js";
 export * from "./algorithm/pairedOccurrence.js";
 export * from "./algorithm/sharedFingerprint.js";
 export * from "./file/file.js";
+export * from "./file/tokenEncoding.js";
 export * from "./file/tokenizedFile.js";
+export * from "./hashing/hashEngine.js";
 export * from "./hashing/hashFilter.js";
 export * from "./hashing/rollingHash.js";
 export * from "./hashing/tokenHash.js";
+export * from "./hashing/tokenTable.js";
 export * from "./hashing/winnowFilter.js";
+export * from "./util/boundedHeap.js";
 export * from "./util/identifiable.js";
 export * from "./util/range.js";
 export * from "./util/result.js";
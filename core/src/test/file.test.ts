@@ -0,0 +1,23 @@
+import test from "ava";
+import { File } from "../file/file.js";
+import { TokenizedFile } from "../file/tokenizedFile.js";
+import { Region } from "../util/region.js";
+
+test("file lines are sliced from the content", t => {
+  for (const content of ["", "one line", "first\nsecond\n\nfourth", "trailing newline\n"]) {
+    const file = new File("file.js", content);
+    t.deepEqual(file.lines, content.split("\n"));
+    t.is(file.lineCount, content.split("\n").length);
+    t.is(file.charCount, content.length);
+    t.is(file.line(file.lineCount - 1), content.substring(content.lastIndexOf("\n") + 1));
+  }
+});
+
+test("tokenized file shares the content and lines of its file", t => {
+  const file = new File("file.js", "a\nb");
+  const tokenized = new TokenizedFile(file, ["a", "b"], [new Region(0, 0, 0, 1), new Region(1, 0, 1, 1)]);
+  t.is(tokenized.content, file.content);
+  t.is(tokenized.lineOffsets, file.lineOffsets);
+  t.deepEqual(tokenized.lines, ["a", "b"]);
+  t.is(tokenized.extension, ".js");
+});
@@ -0,0 +1,128 @@
+import test from "ava";
+import { FingerprintIndex } from "../algorithm/fingerprintIndex.js";
+import { createTokenizedFile } from "./helpers/files.js";
+
+const contents = {
+  original: "the quick brown fox jumps over the lazy dog",
+  copy: "the quick brown fox jumps over the lazy dog",
+  partial: "a slow white cat jumps over the lazy dog",
+  unrelated: "0123456789+-*/=<>!?%$#@&",
+};
+
+test("candidate pairs only contain files sharing fingerprints", t => {
+  const index = new FingerprintIndex(5, 3);
+  const files = Object.entries(contents).map(([name, content]) => createTokenizedFile(name, content));
+  index.addFiles(files);
+
+  const candidates = index.candidatePairs().map(([l, r]) => [l.file.path, r.file.path]);
+  t.deepEqual(candidates, [
+    ["original", "copy"],
+    ["original", "partial"],
+    ["copy", "partial"],
+  ]);
+
+  const pairs = index.allPairs();
+  t.is(pairs.length, 3);
+  t.true(pairs.every(p => p.overlap > 0));
+
+  const everyPair = index.allPairs(undefined, 0);
+  t.is(everyPair.length, 6);
+  for (const pair of pairs) {
+    const same = everyPair.find(p => p.leftFile === pair.leftFile && p.rightFile === pair.rightFile);
+    t.is(same?.similarity, pair.similarity);
+    t.is(same?.longest, pair.longest);
+  }
+});
+
+test("candidate pairs respect the minimum amount of shared fingerprints", t => {
+  const index = new FingerprintIndex(5, 3);
+  const files = Object.entries(contents).map(([name, content]) => createTokenizedFile(name, content));
+  index.addFiles(files);
+
+  const shared = index.getPair(files[0], files[2]).totalCoverLeft();
+  const total = index.getPair(files[0], files[1]).totalCoverLeft();
+  t.true(shared < total);
+
+  const candidates = index.candidatePairs(shared + 1).map(([l, r]) => [l.file.path, r.file.path]);
+  t.deepEqual(candidates, [["original", "copy"]]);
+});
+
+test("ignored fingerprints do not create candidate pairs", t => {
+  const index = new FingerprintIndex(5, 3);
+  const files = [
+    createTokenizedFile("partial", contents.partial),
+    createTokenizedFile("original", contents.original),
+  ];
+  index.addFiles(files);
+  t.is(index.candidatePairs().length, 1);
+
+  index.addIgnoredFile(createTokenizedFile("template", contents.partial));
+  t.is(index.candidatePairs().length, 0);
+  t.is(index.allPairs().length, 0);
+});
+
+test("top pairs are the first pairs of the sorted list of all pairs", t => {
+  const index = new FingerprintIndex(3, 2);
+  const base = contents.original;
+  const files = [];
+  for (let i = 0; i < 12; i++) {
+    // every file drops a different part of the base text
+    const content = base.substring(0, i * 3) + base.substring(i * 3 + i + 1) + contents.unrelated.substring(0, i);
+    files.push(createTokenizedFile(`file${i}`, content));
+  }
+  index.addFiles(files);
+
+  for (const sortBy of ["similarity", "total overlap", "longest fragment"]) {
+    const expected = index.allPairs(sortBy);
+    for (const k of [0, 1, 5, expected.length, expected.length + 10]) {
+      const top = index.topPairs(k, sortBy);
+      t.deepEqual(
+        top.map(p => [p.leftFile.path, p.rightFile.path]),
+        expected.slice(0, k).map(p => [p.leftFile.path, p.rightFile.path]),
+        `top ${k} pairs sorted by ${sortBy}`
+      );
+    }
+  }
+});
+
+test("pairs above a similarity threshold", t => {
+  const index = new FingerprintIndex(5, 3);
+  const files = Object.entries(contents).map(([name, content]) => createTokenizedFile(name, content));
+  index.addFiles(files);
+
+  const above = Array.from(index.pairsAbove(0.5));
+  t.deepEqual(
+    above.map(p => [p.leftFile.path, p.rightFile.path]),
+    index.allPairs().filter(p => p.similarity >= 0.5).map(p => [p.leftFile.path, p.rightFile.path])
+  );
+  t.true(above.length > 0);
+  t.is(index.topPairs(10, "similarity", 1).length, 1);
+  t.is(index.allPairs(undefined, 1, 0.5).length, above.length);
+});
+
+test("top pairs of a file are its best pairs with all other files", t => {
+  const index = new FingerprintIndex(3, 2);
+  const base = contents.original;
+  const files = [];
+  for (let i = 0; i < 12; i++) {
+    const content = base.substring(0, i * 3) + base.substring(i * 3 + i + 1) + contents.unrelated.substring(0, i);
+    files.push(createTokenizedFile(`file${i}`, content));
+  }
+  index.addFiles(files);
+  const query = createTokenizedFile("query", base.substring(5));
+  index.addFiles([query]);
+
+  for (const sortBy of ["similarity", "total overlap", "longest fragment"]) {
+    const expected = index.allPairs(sortBy)
+      .filter(p => p.leftFile === query || p.rightFile === query)
+      .map(p => [p.leftFile === query ? p.rightFile.path : p.leftFile.path, p.similarity, p.longest]);
+    const top = index.topPairsOf(query, 5, sortBy);
+    t.true(top.every(p => p.leftFile === query));
+    t.deepEqual(
+      top.map(p => [p.rightFile.path, p.similarity, p.longest]),
+      expected.slice(0, 5),
+      `top pairs of query sorted by ${sortBy}`
+    );
+  }
+  t.deepEqual(index.topPairsOf(files[11], 20, "similarity", 0, 100), []);
+});
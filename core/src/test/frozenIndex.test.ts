@@ -0,0 +1,119 @@
+import test from "ava";
+import { FingerprintIndex } from "../algorithm/fingerprintIndex.js";
+import { FrozenIndex } from "../algorithm/frozenIndex.js";
+import { Fragment } from "../algorithm/fragment.js";
+import { Pair } from "../algorithm/pair.js";
+import { createTokenizedFile } from "./helpers/files.js";
+
+const contents = [
+  "the quick brown fox jumps over the lazy dog",
+  "a quick brown fox jumps over a lazy dog, the quick brown fox",
+  "a slow white cat jumps over the lazy dog",
+  "0123456789+-*/=<>!?%$#@&",
+];
+
+function createIndexes(): [FingerprintIndex, FingerprintIndex] {
+  const index = new FingerprintIndex(4, 3, true);
+  index.addFiles(contents.map((c, i) => createTokenizedFile(`file${i}`, c)));
+  const frozen = new FingerprintIndex(4, 3, true);
+  frozen.addFiles(contents.map((c, i) => createTokenizedFile(`file${i}`, c)));
+  frozen.freeze();
+  return [index, frozen];
+}
+
+function describeFragment(fragment: Fragment): unknown {
+  return {
+    left: fragment.leftkgrams,
+    right: fragment.rightkgrams,
+    leftSelection: fragment.leftSelection,
+    rightSelection: fragment.rightSelection,
+    pairs: fragment.pairs.map(p => [p.left, p.right, p.fingerprint.hash]),
+    data: fragment.mergedData,
+  };
+}
+
+test("frozen index stores every kgram and occurrence", t => {
+  const [index, frozenIndex] = createIndexes();
+  const frozen = frozenIndex.freeze();
+  t.true(frozenIndex.isFrozen());
+  t.is(frozenIndex.freeze(), frozen);
+
+  const entries = index.entries();
+  const frozenEntries = frozenIndex.entries();
+  for (let i = 0; i < entries.length; i++) {
+    t.is(frozenEntries[i].kgrams, null);
+    t.is(FrozenIndex.kgramCount(frozenEntries[i]), FrozenIndex.kgramCount(entries[i]));
+    t.deepEqual(FrozenIndex.kgrams(frozenEntries[i]), FrozenIndex.kgrams(entries[i]));
+  }
+
+  const fingerprints = index.sharedFingerprints();
+  const frozenFingerprints = frozenIndex.sharedFingerprints();
+  t.is(frozen.hashes.length, fingerprints.length);
+  for (let i = 0; i < fingerprints.length; i++) {
+    t.true(frozenFingerprints[i].isFrozen());
+    t.is(frozenFingerprints[i].fileCount(), fingerprints[i].fileCount());
+    t.deepEqual(
+      frozenFingerprints[i].files().map(f => f.path),
+      fingerprints[i].files().map(f => f.path)
+    );
+    t.deepEqual(
+      frozenFingerprints[i].parts().map(o => [o.file.path, o.side]),
+      fingerprints[i].parts().map(o => [o.file.path, o.side])
+    );
+  }
+});
+
+test("frozen index results in the same pairs and fragments", t => {
+  const [index, frozenIndex] = createIndexes();
+
+  const pairs = index.allPairs("similarity");
+  const frozenPairs = frozenIndex.allPairs("similarity");
+  t.is(frozenPairs.length, pairs.length);
+  for (let i = 0; i < pairs.length; i++) {
+    t.is(frozenPairs[i].leftFile.path, pairs[i].leftFile.path);
+    t.is(frozenPairs[i].rightFile.path, pairs[i].rightFile.path);
+    t.is(frozenPairs[i].similarity, pairs[i].similarity);
+    t.is(frozenPairs[i].longest, pairs[i].longest);
+    t.is(frozenPairs[i].leftTotal, pairs[i].leftTotal);
+    t.deepEqual(
+      frozenPairs[i].buildFragments().map(describeFragment),
+      pairs[i].buildFragments().map(describeFragment)
+    );
+  }
+});
+
+test("frozen index can still ignore fingerprints but not add ignored files", t => {
+  const [index, frozenIndex] = createIndexes();
+  const hashes = index.sharedFingerprints().slice(0, 10).map(f => f.hash);
+  index.addIgnoredHashes(hashes);
+  frozenIndex.addIgnoredHashes(hashes);
+
+  t.deepEqual(
+    frozenIndex.allPairs().map(p => p.similarity),
+    index.allPairs().map(p => p.similarity)
+  );
+
+  t.throws(() => frozenIndex.addIgnoredFile(createTokenizedFile("template", contents[0])));
+});
+
+test("files added to a frozen index are compared with the frozen files", t => {
+  const [index, frozenIndex] = createIndexes();
+  const extra = "the lazy dog jumps over a quick brown fox";
+  index.addFiles([createTokenizedFile("extra", extra)]);
+  frozenIndex.addFiles([createTokenizedFile("extra", extra)]);
+
+  const describePairs = (pairs: Array<Pair>): unknown => pairs.map(p => ({
+    left: p.leftFile.path,
+    right: p.rightFile.path,
+    similarity: p.similarity,
+    fragments: p.buildFragments().map(describeFragment),
+  }));
+  const expected = describePairs(index.allPairs("similarity"));
+  t.deepEqual(describePairs(frozenIndex.allPairs("similarity")), expected);
+
+  // Freezing again includes the added file
+  const frozen = frozenIndex.freeze();
+  t.is(frozen.files.length, contents.length + 1);
+  t.true(frozenIndex.entries().every(e => e.frozen === frozen));
+  t.deepEqual(describePairs(frozenIndex.allPairs("similarity")), expected);
+});
@@ -0,0 +1,47 @@
+import test from "ava";
+import { HashEngine } from "../hashing/hashEngine.js";
+import { FingerprintIndex } from "../algorithm/fingerprintIndex.js";
+import { createTokenizedFile } from "./helpers/files.js";
+
+test("hash engines can be found by name", t => {
+  t.deepEqual(HashEngine.names(), ["default", "imul32", "dual52"]);
+  t.is(HashEngine.default.name, "default");
+  t.is(HashEngine.byName("dual52").name, "dual52");
+  t.throws(() => HashEngine.byName("md5"));
+});
+
+for (const engine of HashEngine.engines) {
+  test(`rolling hash of ${engine.name} engine only depends on the last k tokens`, t => {
+    const k = 4;
+    const tokenHash = engine.createTokenHash();
+    const postfix = "The Quick Brown Fox Jumps Over The Lazy Dog".split("").map(c => tokenHash.hashToken(c));
+
+    const hashes = ["Jived fox nymph", "Pack my box with five"].map(prefix => {
+      const hasher = engine.createRollingHash(k);
+      for (const c of prefix) {
+        hasher.nextHash(tokenHash.hashToken(c));
+      }
+      return postfix.map(h => hasher.nextHash(h));
+    });
+
+    t.notDeepEqual(hashes[0].slice(0, k - 1), hashes[1].slice(0, k - 1));
+    t.deepEqual(hashes[0].slice(k - 1), hashes[1].slice(k - 1));
+    t.true(hashes[0].every(h => Number.isSafeInteger(h) && h >= 0));
+  });
+
+  test(`fingerprint index with ${engine.name} engine matches equal kgrams`, t => {
+    const index = new FingerprintIndex(5, 3, true, undefined, engine);
+    index.addFiles([
+      createTokenizedFile("a", "the quick brown fox jumps over the lazy dog"),
+      createTokenizedFile("b", "a slow white cat jumps over the lazy dog"),
+    ]);
+
+    const [pair] = index.allPairs();
+    t.true(pair.longest > 0);
+    for (const fingerprint of index.sharedFingerprints()) {
+      for (const { side } of fingerprint.parts()) {
+        t.deepEqual(side.data, fingerprint.kgram);
+      }
+    }
+  });
+}
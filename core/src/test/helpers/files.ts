@@ -0,0 +1,13 @@
+import { ExtraInfo, File } from "../../file/file.js";
+import { TokenizedFile } from "../../file/tokenizedFile.js";
+import { Region } from "../../util/region.js";
+
+/**
+ * Creates a tokenized file with a token for every character of the content,
+ * each spanning its own column on the first line.
+ */
+export function createTokenizedFile(name: string, content: string, extra?: ExtraInfo): TokenizedFile {
+  const tokens = content.split("");
+  const mapping = tokens.map((_, i) => new Region(0, i, 0, i + 1));
+  return new TokenizedFile(new File(name, content, extra), tokens, mapping);
+}
@@ -0,0 +1,126 @@
+import test from "ava";
+import { FingerprintIndex } from "../algorithm/fingerprintIndex.js";
+import { FrozenIndex } from "../algorithm/frozenIndex.js";
+import { Fragment } from "../algorithm/fragment.js";
+import { ExtraInfo } from "../file/file.js";
+import { HashEngine } from "../hashing/hashEngine.js";
+import { createTokenizedFile } from "./helpers/files.js";
+
+const contents = [
+  "the quick brown fox jumps over the lazy dog",
+  "a quick brown fox jumps over a lazy dog, the quick brown fox",
+  "a slow white cat jumps over the lazy dog",
+  "0123456789+-*/=<>!?%$#@&",
+];
+
+function createIndex(): FingerprintIndex {
+  const index = new FingerprintIndex(4, 3, true, undefined, HashEngine.byName("imul32"));
+  index.addFiles(contents.map((c, i) => createTokenizedFile(`file${i}`, c)));
+  index.addIgnoredFile(createTokenizedFile("template", "over the lazy"));
+  index.addIgnoredHashes([index.sharedFingerprints()[0].hash]);
+  return index;
+}
+
+function describeFragment(fragment: Fragment): unknown {
+  return {
+    left: fragment.leftkgrams,
+    right: fragment.rightkgrams,
+    leftSelection: fragment.leftSelection,
+    rightSelection: fragment.rightSelection,
+    pairs: fragment.pairs.map(p => [p.left, p.right, p.fingerprint.hash]),
+    data: fragment.mergedData,
+  };
+}
+
+test("restored index has the same files and fingerprints", t => {
+  const index = createIndex();
+  const restored = FingerprintIndex.restore(index.snapshot());
+  t.true(restored.isFrozen());
+
+  t.deepEqual(
+    restored.entries().map(e => [e.file.path, e.file.content, e.file.decodeTokens(), e.file.mapping, FrozenIndex.kgrams(e)]),
+    index.entries().map(e => [e.file.path, e.file.content, e.file.decodeTokens(), e.file.mapping, FrozenIndex.kgrams(e)])
+  );
+  t.deepEqual(
+    restored.ignoredEntries().map(e => [e.file.path, e.isIgnored]),
+    index.ignoredEntries().map(e => [e.file.path, e.isIgnored])
+  );
+  t.deepEqual(
+    restored.sharedFingerprints().map(f => [f.hash, f.kgram, f.ignored, f.fileCount()]),
+    index.sharedFingerprints().map(f => [f.hash, f.kgram, f.ignored, f.fileCount()])
+  );
+  const entries = index.entries();
+  const restoredEntries = restored.entries();
+  for (let i = 0; i < entries.length; i++) {
+    t.deepEqual(
+      Array.from(restoredEntries[i].shared, f => f.hash).sort(),
+      Array.from(entries[i].shared, f => f.hash).sort()
+    );
+    t.deepEqual(
+      Array.from(restoredEntries[i].ignored, f => f.hash).sort(),
+      Array.from(entries[i].ignored, f => f.hash).sort()
+    );
+  }
+});
+
+test("restored index results in the same pairs and fragments", t => {
+  const index = createIndex();
+  const restored = FingerprintIndex.restore(index.snapshot());
+
+  const pairs = index.allPairs("similarity");
+  const restoredPairs = restored.allPairs("similarity");
+  t.true(pairs.length > 0);
+  t.is(restoredPairs.length, pairs.length);
+  for (let i = 0; i < pairs.length; i++) {
+    t.is(restoredPairs[i].leftFile.path, pairs[i].leftFile.path);
+    t.is(restoredPairs[i].rightFile.path, pairs[i].rightFile.path);
+    t.is(restoredPairs[i].similarity, pairs[i].similarity);
+    t.deepEqual(
+      restoredPairs[i].buildFragments().map(describeFragment),
+      pairs[i].buildFragments().map(describeFragment)
+    );
+  }
+});
+
+test("restored index keeps the extra info of the files", t => {
+  const info = {
+    filename: "file.txt",
+    fullName: "Some Author",
+    id: "1",
+    status: "correct",
+    submissionID: "2",
+    nameEN: "Exercise",
+    nameNL: "Oefening",
+    exerciseID: "3",
+    labels: "",
+    ignored: "false",
+  };
+  const created = new Date("2024-01-02T03:04:05.000Z");
+  const index = new FingerprintIndex(4, 3, true, undefined, HashEngine.byName("imul32"));
+  index.addFiles([
+    createTokenizedFile("dated", contents[0], { ...info, createdAt: created }),
+    createTokenizedFile("invalid", contents[1], { ...info, createdAt: new Date("not a date") }),
+    createTokenizedFile("missing", contents[2], info as ExtraInfo),
+    createTokenizedFile("none", contents[3]),
+  ]);
+
+  const [dated, invalid, missing, none] = FingerprintIndex.restore(index.snapshot()).entries().map(e => e.file.extra);
+  t.deepEqual(dated, { ...info, createdAt: created });
+  t.true(invalid!.createdAt instanceof Date);
+  t.true(isNaN(invalid!.createdAt.getTime()));
+  t.false("createdAt" in missing!);
+  t.is(none, undefined);
+});
+
+test("restoring a corrupted snapshot throws an error", t => {
+  const snapshot = createIndex().snapshot();
+
+  const corrupted = snapshot.slice();
+  corrupted[corrupted.length - 1] ^= 1;
+  t.throws(() => FingerprintIndex.restore(corrupted), { message: /checksum/ });
+  t.throws(() => FingerprintIndex.restore(snapshot.subarray(0, snapshot.length - 8)), { message: /truncated/ });
+
+  const otherVersion = snapshot.slice();
+  otherVersion[4] += 1;
+  t.throws(() => FingerprintIndex.restore(otherVersion), { message: /version/ });
+});
@@ -5,7 +5,8 @@ import { Pair } from "../algorithm/pair.js";
 import { Region } from "../util/region.js";
 import { Range } from "../util/range.js";
 import { SharedFingerprint } from "../algorithm/sharedFingerprint.js";
-import { FileEntry, Occurrence } from "../algorithm/fingerprintIndex.js";
+import { FileEntry, FingerprintIndex, Occurrence } from "../algorithm/fingerprintIndex.js";
+import { createTokenizedFile } from "./helpers/files.js";
 function createFakeFile(name: string): TokenizedFile {
   return new TokenizedFile(
     new File(name, "content"),
@@ -135,3 +136,97 @@ test("paired occurrence merging & squashing", t => {
 
 
 
+
+test("longest common substring equals the quadratic dynamic programming solution", t => {
+  type Kgram = { hash: number, index: number };
+
+  // the straightforward O(L * R) implementation
+  const reference = (l: Kgram[], r: Kgram[]): number => {
+    const [short, long] = l.length < r.length ? [l, r] : [r, l];
+    let longest = 0;
+    let prev: Array<number> = [];
+    let curr: Array<number> = [];
+    for (const a of long) {
+      for (const b of short) {
+        if (a.hash == b.hash) {
+          curr[b.index] = (prev[b.index - 1] || 0) + 1;
+          longest = Math.max(longest, curr[b.index]);
+        }
+      }
+      const tmp = prev;
+      tmp.length = 0;
+      prev = curr;
+      curr = tmp;
+    }
+    return longest;
+  };
+
+  // deterministic pseudo-random numbers
+  let seed = 42;
+  const random = (max: number): number => {
+    seed = (seed * 1103515245 + 12345) % 2147483648;
+    return seed % max;
+  };
+
+  const kgrams = (length: number, alphabet: number): Kgram[] => {
+    const list: Kgram[] = [];
+    let index = 0;
+    for (let i = 0; i < length; i++) {
+      // leave gaps, as not every kgram is shared
+      index += 1 + random(3);
+      list.push({ hash: random(alphabet), index });
+    }
+    return list;
+  };
+
+  t.is(Pair.longestCommonSubstring([], kgrams(10, 3)), 0);
+  for (let i = 0; i < 200; i++) {
+    const alphabet = 1 + random(8);
+    const left = kgrams(random(60), alphabet);
+    const right = kgrams(random(60), alphabet);
+    t.is(Pair.longestCommonSubstring(left, right), reference(left, right));
+  }
+});
+
+test("fragments of repetitive code are bounded", t => {
+  const unique = "the quick brown fox jumps over the lazy dog";
+  const left = createTokenizedFile("left", "abc".repeat(20) + unique);
+  const right = createTokenizedFile("right", unique + "abc".repeat(30));
+
+  const index = new FingerprintIndex(5, 2, true);
+  index.addFiles([left, right]);
+  const pair = index.getPair(left, right);
+
+  const fragments = pair.buildFragments();
+  t.true(fragments.length > 1);
+  for (const fragment of fragments) {
+    const first = fragment.pairs[0].left;
+    const last = fragment.pairs[fragment.pairs.length - 1].left;
+    t.is(fragment.mergedData?.join(""), left.content.slice(first.start, last.stop + 1));
+  }
+
+  // Only the fingerprints of the unique sentence remain within the bound
+  const bounded = pair.buildFragments(1, 50);
+  t.is(bounded.length, 1);
+  const data = bounded[0].mergedData?.join("") || "";
+  t.true(data.length > unique.length / 2);
+  t.true(unique.includes(data));
+});
+
+test("pair with given metrics builds the same fragments", t => {
+  const content = "the quick brown fox jumps over the lazy dog";
+  const left = createTokenizedFile("left", content);
+  const right = createTokenizedFile("right", content.slice(10) + content.slice(0, 10));
+
+  const index = new FingerprintIndex(5, 2, true);
+  index.addFiles([left, right]);
+  const pair = index.getPair(left, right);
+  const { leftCovered, rightCovered, longest } = pair;
+  const given = new Pair(pair.leftEntry, pair.rightEntry, { leftCovered, rightCovered, longest });
+
+  t.is(given.similarity, pair.similarity);
+  t.deepEqual(
+    given.buildFragments().map(f => [f.leftkgrams, f.rightkgrams]),
+    pair.buildFragments().map(f => [f.leftkgrams, f.rightkgrams])
+  );
+});
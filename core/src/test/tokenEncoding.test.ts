@@ -0,0 +1,30 @@
+import test from "ava";
+import { TokenEncoding } from "../file/tokenEncoding.js";
+
+test("tokens survive a round trip through the compact encoding", t => {
+  const vocabulary = ["(", ")", "program", "identifier"];
+  const indices = [0, 2, 0, 3, 1, 1];
+  const encoded = TokenEncoding.encodeTokens(indices);
+  t.true(TokenEncoding.isCompact(encoded));
+  t.false(TokenEncoding.isCompact(JSON.stringify(indices)));
+  t.deepEqual(TokenEncoding.decodeTokens(encoded, vocabulary), indices.map(i => vocabulary[i]));
+  t.deepEqual(TokenEncoding.decodeTokens(TokenEncoding.encodeTokens([]), vocabulary), []);
+  t.throws(() => TokenEncoding.decodeTokens(TokenEncoding.encodeTokens([4]), vocabulary), { message: /vocabulary/ });
+});
+
+test("mappings survive a round trip through the compact encoding", t => {
+  const packed = new Uint32Array([
+    0, 0, 0, 0,
+    0, 0, 12, 3,
+    3, 150, 3, 151,
+    2, 4, 2, 5,
+    100000, 7, 2 ** 32 - 1, 0,
+    0, 0, 0, 0,
+  ]);
+  const encoded = TokenEncoding.encodeMapping(packed);
+  t.deepEqual(TokenEncoding.decodeMapping(encoded), packed);
+  // Equal consecutive regions only take one byte per number
+  const repeated = new Uint32Array(4000).fill(7);
+  t.true(TokenEncoding.encodeMapping(repeated).length < 4000 * 1.4);
+  t.throws(() => TokenEncoding.decodeMapping(encoded.substring(0, 8)), { message: /Truncated|four numbers/ });
+});
@@ -0,0 +1,52 @@
+import test from "ava";
+import { File } from "../file/file.js";
+import { TokenizedFile } from "../file/tokenizedFile.js";
+import { FingerprintIndex } from "../algorithm/fingerprintIndex.js";
+import { TokenHash } from "../hashing/tokenHash.js";
+import { TokenTable } from "../hashing/tokenTable.js";
+import { Region } from "../util/region.js";
+
+test("token table assigns dense ids", t => {
+  const table = new TokenTable();
+  const ids = ["(", "program", "(", "identifier", ")", ")"].map(token => table.intern(token));
+  t.deepEqual(ids, [0, 1, 0, 2, 3, 3]);
+  t.is(table.size, 4);
+  t.is(table.idOf("identifier"), 2);
+  t.is(table.idOf("unknown"), undefined);
+  t.deepEqual(table.decode([1, 2]), ["program", "identifier"]);
+
+  const hasher = new TokenHash();
+  t.deepEqual(table.hashesFor(hasher), ["(", "program", "identifier", ")"].map(token => hasher.hashToken(token)));
+  table.intern("string");
+  t.is(table.hashesFor(hasher)[4], hasher.hashToken("string"));
+});
+
+test("files with token ids are indexed like files with token strings", t => {
+  const table = new TokenTable();
+  const contents = [
+    "the quick brown fox jumps over the lazy dog",
+    "a slow white cat jumps over the lazy dog",
+  ];
+
+  const fromStrings = new FingerprintIndex(5, 3, true);
+  const fromIds = new FingerprintIndex(5, 3, true);
+  for (const [i, content] of contents.entries()) {
+    const tokens = content.split("");
+    const mapping = tokens.map((_, j) => new Region(0, j, 0, j + 1));
+    const file = new File(`file${i}.txt`, content);
+    const ids = Uint32Array.from(tokens, token => table.intern(token));
+    const withIds = new TokenizedFile(file, ids, mapping, table);
+    t.deepEqual(withIds.decodeTokens(), tokens);
+    t.deepEqual(withIds.tokenSlice(4, 9), tokens.slice(4, 9));
+    t.is(withIds.tokenCount, tokens.length);
+
+    fromStrings.addFiles([new TokenizedFile(file, tokens, mapping)]);
+    fromIds.addFiles([withIds]);
+  }
+
+  const describe = (index: FingerprintIndex): unknown =>
+    index.sharedFingerprints().map(f => [f.hash, f.kgram, f.files().map(file => file.path)]);
+  t.deepEqual(describe(fromIds), describe(fromStrings));
+  const [pair] = fromIds.allPairs();
+  t.is(pair.similarity, fromStrings.allPairs()[0].similarity);
+});
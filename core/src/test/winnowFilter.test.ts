@@ -59,3 +59,20 @@ test("maximum gap between hashing positions is window size", t => {
     previousPos = start;
   }
 });
+
+test("streamed fingerprints equal the collected fingerprints", t => {
+  const text = "This is a slightly longer text to test multiple hashing values.".split("");
+  const filter = new WinnowFilter(5, 3, true);
+  const streamed: Array<[number, number, number]> = [];
+
+  filter.streamFingerprints(filter.hashTokenArray(text), (hash, start, stop) => {
+    streamed.push([hash, start, stop]);
+  });
+
+  const fingerprints = filter.fingerprints(text);
+  t.true(fingerprints.length > 0);
+  t.deepEqual(streamed, fingerprints.map(({ hash, start, stop }) => [hash, start, stop]));
+  for (const { start, stop, data } of fingerprints) {
+    t.deepEqual(data, text.slice(start, stop + 1));
+  }
+});
@@ -0,0 +1,86 @@
+/**
+ * A binary heap that keeps the `capacity` best items pushed into it and
+ * discards all others, using only O(capacity) memory.
+ *
+ * Items are ranked with the given comparator, which should return a positive
+ * number if the first item is better than the second one.
+ */
+export class BoundedHeap<T> {
+
+  // Min-heap: the worst item that is still kept is at the root
+  private readonly items: Array<T> = [];
+
+  constructor(
+    public readonly capacity: number,
+    private readonly compare: (a: T, b: T) => number
+  ) {}
+
+  get size(): number {
+    return this.items.length;
+  }
+
+  /**
+   * Whether the given item would be kept if it was pushed now.
+   */
+  public accepts(item: T): boolean {
+    return this.items.length < this.capacity ||
+      (this.capacity > 0 && this.compare(item, this.items[0]) > 0);
+  }
+
+  /**
+   * Adds the item to the heap if it is better than the worst item kept.
+   *
+   * @returns whether the item has been kept
+   */
+  public push(item: T): boolean {
+    if (this.items.length < this.capacity) {
+      this.items.push(item);
+      this.siftUp(this.items.length - 1);
+      return true;
+    } else if (this.accepts(item)) {
+      this.items[0] = item;
+      this.siftDown(0);
+      return true;
+    }
+    return false;
+  }
+
+  /**
+   * Returns the kept items, sorted from best to worst.
+   */
+  public toSortedArray(): Array<T> {
+    return Array.from(this.items).sort((a, b) => this.compare(b, a));
+  }
+
+  private siftUp(i: number): void {
+    const items = this.items;
+    while (i > 0) {
+      const parent = (i - 1) >> 1;
+      if (this.compare(items[parent], items[i]) <= 0) {
+        break;
+      }
+      [items[parent], items[i]] = [items[i], items[parent]];
+      i = parent;
+    }
+  }
+
+  private siftDown(i: number): void {
+    const items = this.items;
+    for (;;) {
+      const left = 2 * i + 1;
+      const right = left + 1;
+      let worst = i;
+      if (left < items.length && this.compare(items[left], items[worst]) < 0) {
+        worst = left;
+      }
+      if (right < items.length && this.compare(items[right], items[worst]) < 0) {
+        worst = right;
+      }
+      if (worst === i) {
+        break;
+      }
+      [items[worst], items[i]] = [items[i], items[worst]];
+      i = worst;
+    }
+  }
+}
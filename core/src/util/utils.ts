@@ -90,3 +90,27 @@ export function deserializeMapC<K, V, R>(map: Array<[K, V]>, internalMapper: (a:
 export function deserializeMap<K, V>(map: Array<[K, V]>): Map<K, V> {
   return deserializeMapC(map, v => v);
 }
+
+let crcTable: Uint32Array | null = null;
+
+/**
+ * Computes the CRC-32 checksum (as used by zip and gzip) of the given bytes.
+ * Pass the checksum of the preceding bytes as `crc` to continue a checksum.
+ */
+export function crc32(bytes: Uint8Array, crc = 0): number {
+  if (crcTable === null) {
+    crcTable = new Uint32Array(256);
+    for (let n = 0; n < 256; n++) {
+      let c = n;
+      for (let k = 0; k < 8; k++) {
+        c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+      }
+      crcTable[n] = c;
+    }
+  }
+  crc = ~crc;
+  for (let i = 0; i < bytes.length; i++) {
+    crc = crcTable[(crc ^ bytes[i]) & 0xff] ^ (crc >>> 8);
+  }
+  return ~crc >>> 0;
+}
@@ -0,0 +1,178 @@
+import { File } from "@dodona/dolos-core";
+
+/**
+ * The syntax the generator needs to mutate source files of a language.
+ */
+export interface CorpusSyntax {
+  extension: string;
+  // Patterns of which the first group is the name of a definition
+  definitions: Array<RegExp>;
+  // A statement assigning a value to a new variable
+  statement: (name: string, value: number) => string;
+}
+
+export const corpusSyntax: Record<string, CorpusSyntax> = {
+  python: {
+    extension: ".py",
+    definitions: [/\b(?:def|class)\s+([A-Za-z_]\w*)/g, /^\s*([A-Za-z_]\w*)\s*=[^=]/gm],
+    statement: (name, value) => `${name} = ${value}`,
+  },
+  javascript: {
+    extension: ".js",
+    definitions: [/\b(?:function|class)\s+([A-Za-z_$][\w$]*)/g, /\b(?:let|const|var)\s+([A-Za-z_$][\w$]*)/g],
+    statement: (name, value) => `let ${name} = ${value};`,
+  },
+};
+
+/**
+ * Generates a deterministic corpus of files by mutating the given source
+ * files, mimicking a set of submissions in which some students copied from
+ * each other.
+ *
+ * The corpus consists of families. The first file of a family is an
+ * original: a random selection of the top-level blocks (functions, classes,
+ * ...) of the source files, with unrelated statements inserted between its
+ * lines, so originals are mostly different from each other. The other files
+ * of a family are plagiarized from the original by renaming definitions,
+ * moving blocks around, copying it entirely or copying a part of it.
+ *
+ * The same sources, syntax, count and seed always result in the same corpus.
+ */
+export class CorpusGenerator {
+
+  public static readonly mutations = ["copy", "rename", "move", "partial"] as const;
+
+  private readonly blocks: Array<string>;
+  private seed: number;
+
+  constructor(
+    sources: Array<string>,
+    private readonly syntax: CorpusSyntax,
+    seed = 42,
+    private readonly maxFamilySize = 4
+  ) {
+    this.blocks = sources.flatMap(source => CorpusGenerator.splitBlocks(source));
+    if (this.blocks.length === 0) {
+      throw new Error("At least one non-empty source file is needed to generate a corpus");
+    }
+    // xorshift32 pseudo-random numbers, the seed should not be 0
+    this.seed = seed || 1;
+  }
+
+  /**
+   * Splits a source file in its top-level blocks: a block starts at every
+   * line that is not indented, except for lines closing a bracket.
+   */
+  public static splitBlocks(source: string): Array<string> {
+    const blocks: Array<string> = [];
+    let current: Array<string> = [];
+    for (const line of source.split("\n")) {
+      if (/^[^\s)\]}]/.test(line) && current.some(l => l.trim() !== "")) {
+        blocks.push(current.join("\n"));
+        current = [];
+      }
+      current.push(line);
+    }
+    if (current.some(l => l.trim() !== "")) {
+      blocks.push(current.join("\n"));
+    }
+    return blocks;
+  }
+
+  /**
+   * Whether a statement can be inserted before the given line, without
+   * breaking an expression spanning multiple lines or an if-else.
+   */
+  private static startsStatement(line: string, previous = ""): boolean {
+    return line.trim() !== "" &&
+      !/^\s*(else|elif|except|finally|catch|[)\]}.,?:+\-*/%&|@])/.test(line) &&
+      !/[([{,\\+\-*/%&|=]\s*$/.test(previous);
+  }
+
+  private random(max: number): number {
+    this.seed ^= this.seed << 13;
+    this.seed ^= this.seed >>> 17;
+    this.seed ^= this.seed << 5;
+    return (this.seed >>> 0) % max;
+  }
+
+  private shuffle<T>(items: Array<T>): Array<T> {
+    for (let i = items.length - 1; i > 0; i--) {
+      const j = this.random(i + 1);
+      [items[i], items[j]] = [items[j], items[i]];
+    }
+    return items;
+  }
+
+  /**
+   * Generates `count` files, in directories per family.
+   */
+  public generate(count: number): Array<File> {
+    const files: Array<File> = [];
+    let family = 0;
+    while (files.length < count) {
+      const size = Math.min(1 + this.random(this.maxFamilySize), count - files.length);
+      const original = this.original(family);
+      const directory = `family_${family}`;
+      files.push(new File(`${directory}/original${this.syntax.extension}`, original));
+      for (let i = 1; i < size; i++) {
+        const mutation = CorpusGenerator.mutations[this.random(CorpusGenerator.mutations.length)];
+        const content = this.mutate(original, mutation, `${family}_${i}`);
+        files.push(new File(`${directory}/${mutation}_${i}${this.syntax.extension}`, content));
+      }
+      family += 1;
+    }
+    return files;
+  }
+
+  private original(family: number): string {
+    const blockCount = 1 + this.random(Math.min(this.blocks.length, 8));
+    const blocks = this.shuffle(this.blocks.slice()).slice(0, blockCount);
+    let counter = 0;
+    return blocks.map(block => block.split("\n").map((line, i, lines) => {
+      if (!CorpusGenerator.startsStatement(line, lines[i - 1]) || this.random(3) !== 0) {
+        return line;
+      }
+      // Insert a statement with the same indentation before the line
+      const indentation = line.match(/^\s*/)![0];
+      const statement = this.syntax.statement(`generated_${family}_${counter++}`, this.random(1000));
+      return `${indentation}${statement}\n${line}`;
+    }).join("\n")).join("\n\n");
+  }
+
+  public mutate(content: string, mutation: typeof CorpusGenerator.mutations[number], suffix: string): string {
+    switch (mutation) {
+    case "copy":
+      return content;
+    case "rename":
+      return this.rename(content, suffix);
+    case "move":
+      return this.shuffle(CorpusGenerator.splitBlocks(content)).join("\n\n");
+    case "partial": {
+      const lines = content.split("\n");
+      const start = this.random(Math.ceil(lines.length / 2));
+      return lines.slice(start, start + Math.ceil(lines.length / 2)).join("\n");
+    }
+    }
+  }
+
+  /**
+   * Renames about half of the definitions in the given content.
+   */
+  private rename(content: string, suffix: string): string {
+    const names = new Set<string>();
+    for (const pattern of this.syntax.definitions) {
+      for (const match of content.matchAll(pattern)) {
+        names.add(match[1]);
+      }
+    }
+    const renamed = Array.from(names).sort().filter(() => this.random(2) === 0);
+    if (renamed.length === 0) {
+      return content;
+    }
+    const replacements = new Map(renamed.map(name => [name, `${name}_${suffix}`]));
+    const alternatives = renamed.map(name => name.replace(/\$/g, "\\$")).join("|");
+    const pattern = new RegExp(`(?<![\\w$])(${alternatives})(?![\\w$])`, "g");
+    return content.replace(pattern, name => replacements.get(name)!);
+  }
+}
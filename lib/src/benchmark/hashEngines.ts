@@ -0,0 +1,91 @@
+/**
+ * Benchmark of the hash engines: the throughput of hashing all kgrams of a
+ * token stream, and the amount of hash collisions on synthetic corpora.
+ *
+ * Run with `npm run benchmark:hash` in the lib directory.
+ */
+import { HashEngine } from "@dodona/dolos-core";
+import { Options } from "../lib/options.js";
+import { measure, printMeasurements } from "./util.js";
+
+/**
+ * A synthetic token stream drawn from a vocabulary of node type names. With
+ * a large enough vocabulary and kgram length, (almost) all kgrams are
+ * distinct, so equal hashes of different positions are collisions.
+ */
+function syntheticTokens(length: number, vocabulary: number, seed: number): string[] {
+  // xorshift32 pseudo-random numbers, the seed should not be 0
+  const random = (max: number): number => {
+    seed ^= seed << 13;
+    seed ^= seed >>> 17;
+    seed ^= seed << 5;
+    return (seed >>> 0) % max;
+  };
+  const words = Array.from({ length: vocabulary }, (_, i) => `node_type_${i}`);
+  return Array.from({ length }, () => words[random(vocabulary)]);
+}
+
+/**
+ * Hashes every kgram of the given tokens and counts them in `seen`, returns
+ * the amount of kgrams.
+ */
+function hashKgrams(engine: HashEngine, tokens: string[], k: number, seen?: Set<number>): number {
+  const tokenHash = engine.createTokenHash();
+  const rollingHash = engine.createRollingHash(k);
+  let count = 0;
+  for (let i = 0; i < tokens.length; i++) {
+    const hash = rollingHash.nextHash(tokenHash.hashToken(tokens[i]));
+    if (i >= k - 1) {
+      seen?.add(hash);
+      count += 1;
+    }
+  }
+  return count;
+}
+
+/**
+ * The distinct kgrams of the given tokens, by their contents.
+ */
+function distinctKgrams(tokens: string[], k: number): number {
+  const kgrams = new Set<string>();
+  for (let i = 0; i + k <= tokens.length; i++) {
+    kgrams.add(tokens.slice(i, i + k).join(","));
+  }
+  return kgrams.size;
+}
+
+function main(): void {
+  const k = Options.defaultKgramLength;
+
+  const throughputTokens = syntheticTokens(1_000_000, 300, 1);
+  const measurements = HashEngine.engines.map(engine =>
+    measure(engine.name, () => hashKgrams(engine, throughputTokens, k))
+  );
+  printMeasurements(`Throughput (${throughputTokens.length} tokens)`, measurements);
+  for (const measurement of measurements) {
+    const tokensPerSecond = measurement.opsPerSecond * throughputTokens.length;
+    console.log(`${measurement.name}: ${(tokensPerSecond / 1e6).toFixed(2)}M tokens/sec`);
+  }
+
+  for (const length of [100_000, 1_000_000, 4_000_000]) {
+    const tokens = syntheticTokens(length, 300, length);
+    const distinct = distinctKgrams(tokens, k);
+    const rows = HashEngine.engines.map(engine => {
+      const hashes = new Set<number>();
+      const kgrams = hashKgrams(engine, tokens, k, hashes);
+      const collisions = distinct - hashes.size;
+      return {
+        engine: engine.name,
+        kgrams,
+        "distinct kgrams": distinct,
+        "distinct hashes": hashes.size,
+        collisions,
+        "collision rate": Number((collisions / distinct).toExponential(3)),
+      };
+    });
+    console.log(`\nCollisions on a synthetic corpus of ${length} tokens (k = ${k})`);
+    console.table(rows);
+  }
+}
+
+main();
@@ -0,0 +1,120 @@
+/**
+ * Micro-benchmark of the longest common fragment computation of a Pair,
+ * comparing the original quadratic implementation with Pair.longestCommonSubstring.
+ *
+ * Run with `npm run benchmark:longest` in the lib directory.
+ */
+import { Dolos } from "../lib/dolos.js";
+import { assert, FileEntry, Kgram, Pair } from "@dodona/dolos-core";
+import { measure, printMeasurements } from "./util.js";
+
+const upgmaFiles = [
+  "UPGMA_A.py",
+  "UPGMA_A_copy.py",
+  "UPGMA_A_functionsmoved.py",
+  "UPGMA_A_linesmoved.py",
+  "UPGMA_A_variablenames.py",
+  "UPGMA_A_B_combined.py",
+  "UPGMA_B.py",
+].map(f => `../samples/python/benchmark_files/${f}`);
+
+/**
+ * The original O(L * R) implementation, kept as a reference.
+ */
+function quadraticLongest(l: Kgram[], r: Kgram[]): number {
+  const [short, long] = l.length < r.length ? [l, r] : [r, l];
+  let longest = 0;
+  let prev: Array<number> = [];
+  let curr: Array<number> = [];
+  for (const a of long) {
+    for (const b of short) {
+      if (a.hash == b.hash) {
+        curr[b.index] = (prev[b.index - 1] || 0) + 1;
+        longest = curr[b.index] > longest ? curr[b.index] : longest;
+      }
+    }
+    const tmp = prev;
+    tmp.length = 0;
+    prev = curr;
+    curr = tmp;
+  }
+  return longest;
+}
+
+/**
+ * The shared kgrams of both sides of a pair, as they are passed to
+ * longestCommonSubstring in the Pair constructor.
+ */
+function sharedKgrams(left: FileEntry, right: FileEntry): [Kgram[], Kgram[]] {
+  const l: Kgram[] = [];
+  const r: Kgram[] = [];
+  for (const fingerprint of left.shared) {
+    if (right.shared.has(fingerprint)) {
+      for (const index of fingerprint.kgramIndicesOf(left.file)) {
+        l.push({ hash: fingerprint.hash, index });
+      }
+      for (const index of fingerprint.kgramIndicesOf(right.file)) {
+        r.push({ hash: fingerprint.hash, index });
+      }
+    }
+  }
+  l.sort((a, b) => a.index - b.index);
+  r.sort((a, b) => a.index - b.index);
+  return [l, r];
+}
+
+/**
+ * A synthetic file of `length` kgrams and a copy of it in which a fraction
+ * of the kgrams is replaced, blocks are moved and some code is duplicated.
+ */
+function syntheticPair(length: number, alphabet: number, mutations: number): [Kgram[], Kgram[]] {
+  let seed = length;
+  const random = (max: number): number => {
+    seed = (seed * 1103515245 + 12345) % 2147483648;
+    return seed % max;
+  };
+  const hashes = Array.from({ length }, () => random(alphabet));
+  const copy = Array.from(hashes);
+  for (let i = 0; i < mutations * length; i++) {
+    copy[random(length)] = alphabet + random(alphabet);
+  }
+  // move a block to the end and duplicate another one
+  const moved = copy.splice(random(length / 2), length / 10);
+  copy.push(...moved, ...copy.slice(0, length / 20));
+  return [
+    hashes.map((hash, index) => ({ hash, index })),
+    copy.map((hash, index) => ({ hash, index })),
+  ];
+}
+
+async function main(): Promise<void> {
+  const dolos = new Dolos({ language: "python" });
+  const report = await dolos.analyzePaths(upgmaFiles);
+  const entries = report.entries();
+  const upgmaPairs: Array<[Kgram[], Kgram[]]> = [];
+  for (let i = 0; i < entries.length; i++) {
+    for (let j = i + 1; j < entries.length; j++) {
+      upgmaPairs.push(sharedKgrams(entries[i], entries[j]));
+    }
+  }
+
+  const datasets: Array<[string, Array<[Kgram[], Kgram[]]>]> = [
+    [`UPGMA samples (${upgmaPairs.length} pairs)`, upgmaPairs],
+    ["synthetic 1k kgrams, 200 distinct hashes", [syntheticPair(1000, 200, 0.05)]],
+    ["synthetic 5k kgrams, 1000 distinct hashes", [syntheticPair(5000, 1000, 0.05)]],
+    ["synthetic 5k kgrams, 20 distinct hashes (repetitive)", [syntheticPair(5000, 20, 0.05)]],
+    ["synthetic 20k kgrams, 5000 distinct hashes", [syntheticPair(20000, 5000, 0.1)]],
+  ];
+
+  for (const [name, pairs] of datasets) {
+    for (const [l, r] of pairs) {
+      assert(quadraticLongest(l, r) === Pair.longestCommonSubstring(l, r), `Different result on ${name}`);
+    }
+    printMeasurements(name, [
+      measure("quadratic (original)", () => pairs.forEach(([l, r]) => quadraticLongest(l, r))),
+      measure("hash-indexed (Pair)", () => pairs.forEach(([l, r]) => Pair.longestCommonSubstring(l, r))),
+    ]);
+  }
+}
+
+await main();
@@ -0,0 +1,155 @@
+/**
+ * Benchmark suite of the hot paths of an analysis, on deterministic
+ * synthetic corpora generated from the files in the samples directory (see
+ * CorpusGenerator):
+ *
+ * - tokenizing the files (CodeTokenizer.tokenizeFile and generateTokens);
+ * - winnowing their tokens (WinnowFilter.fingerprints);
+ * - indexing them (FingerprintIndex.addFiles);
+ * - listing all pairs (FingerprintIndex.allPairs);
+ * - building the fragments of the most similar pairs (Pair.buildFragments).
+ *
+ * Run with `npm run benchmark:suite` in the lib directory, options are given
+ * after `--`:
+ *
+ * --language <name>    the samples to generate corpora from, python (default)
+ *                      or javascript
+ * --sizes <n,...>      the amount of files of the corpora (default 100,1000,10000)
+ * --time <ms>          the minimum time to measure each benchmark (default 2000)
+ * --save <path>        write the results to this file, to use as a baseline
+ * --baseline <path>    compare the results with a saved baseline, and exit with
+ *                      status 1 if a benchmark regressed
+ * --threshold <ratio>  the relative change that is a regression (default 0.1)
+ */
+import { readdir, readFile, writeFile } from "node:fs/promises";
+import path from "node:path";
+import { parseArgs } from "node:util";
+import { FingerprintIndex, WinnowFilter } from "@dodona/dolos-core";
+import { LanguagePicker } from "../lib/language.js";
+import { Options } from "../lib/options.js";
+import { CorpusGenerator, corpusSyntax } from "./corpus.js";
+import { Measurement, measure, megabytes, printMeasurements } from "./util.js";
+
+interface Baseline {
+  node: string;
+  language: string;
+  measurements: Array<Measurement>;
+}
+
+/**
+ * Compares the measurements with those of the baseline with the same name,
+ * and returns the names of the benchmarks that regressed: those that are
+ * slower or use more heap than the baseline by more than the threshold.
+ */
+function compare(measurements: Array<Measurement>, baseline: Baseline, threshold: number): Array<string> {
+  const regressions: Array<string> = [];
+  const previous = new Map(baseline.measurements.map(m => [m.name, m]));
+  const rows = [];
+  for (const measurement of measurements) {
+    const before = previous.get(measurement.name);
+    if (before === undefined) {
+      continue;
+    }
+    const speed = measurement.opsPerSecond / before.opsPerSecond - 1;
+    const heap = measurement.peakHeap / before.peakHeap - 1;
+    const regressed = speed < -threshold || heap > threshold;
+    if (regressed) {
+      regressions.push(measurement.name);
+    }
+    rows.push({
+      name: measurement.name,
+      "ops/sec": Number(measurement.opsPerSecond.toFixed(2)),
+      "baseline ops/sec": Number(before.opsPerSecond.toFixed(2)),
+      "speed": `${speed >= 0 ? "+" : ""}${(speed * 100).toFixed(1)}%`,
+      "peak heap (MB)": megabytes(measurement.peakHeap),
+      "baseline peak heap (MB)": megabytes(before.peakHeap),
+      "heap": `${heap >= 0 ? "+" : ""}${(heap * 100).toFixed(1)}%`,
+      "": regressed ? "REGRESSION" : "",
+    });
+  }
+  console.log(`\nComparison with the baseline (Node.js ${baseline.node}, threshold ${threshold * 100}%)`);
+  console.table(rows);
+  return regressions;
+}
+
+async function main(): Promise<void> {
+  const { values } = parseArgs({
+    options: {
+      language: { type: "string", default: "python" },
+      sizes: { type: "string", default: "100,1000,10000" },
+      time: { type: "string", default: "2000" },
+      save: { type: "string" },
+      baseline: { type: "string" },
+      threshold: { type: "string", default: "0.1" },
+    }
+  });
+  const syntax = corpusSyntax[values.language];
+  if (syntax === undefined) {
+    throw new Error(`Cannot generate corpora for ${values.language}, ` +
+      `use one of ${Object.keys(corpusSyntax).join(", ")}`);
+  }
+  const sizes = values.sizes.split(",").map(size => parseInt(size));
+  const minTime = parseInt(values.time);
+
+  const directory = path.join("../samples", values.language);
+  const names = (await readdir(directory, { recursive: true }))
+    .filter(name => name.endsWith(syntax.extension))
+    .sort();
+  const sources = await Promise.all(names.map(name => readFile(path.join(directory, name), "utf-8")));
+
+  const language = await new LanguagePicker().findLanguage(values.language);
+  const tokenizer = await language.createTokenizer();
+  const k = Options.defaultKgramLength;
+  const w = Options.defaultKgramsInWindow;
+
+  const measurements: Array<Measurement> = [];
+  for (const size of sizes) {
+    const files = new CorpusGenerator(sources, syntax).generate(size);
+    const tokenized = files.map(file => tokenizer.tokenizeFile(file));
+    const tokens = tokenized.map(file => file.decodeTokens());
+    const tokenCount = tokens.reduce((sum, t) => sum + t.length, 0);
+    const filter = new WinnowFilter(k, w);
+
+    const createIndex = (): FingerprintIndex => {
+      const index = new FingerprintIndex(k, w);
+      index.addFiles(tokenized);
+      return index;
+    };
+    const index = createIndex();
+    const topPairs = index.allPairs("similarity").slice(0, 100);
+
+    global.gc?.();
+    const results = [
+      measure(`${size} files: tokenizeFile`, () => files.map(file => tokenizer.tokenizeFile(file)), minTime),
+      measure(`${size} files: generateTokens`,
+        () => files.map(file => tokenizer.generateTokens(file.content)), minTime),
+      measure(`${size} files: fingerprints`, () => tokens.map(t => filter.fingerprints(t)), minTime),
+      measure(`${size} files: addFiles`, createIndex, minTime),
+      measure(`${size} files: allPairs`, () => index.allPairs(), minTime),
+      measure(`${size} files: buildFragments (top ${topPairs.length} pairs)`,
+        () => topPairs.map(pair => pair.buildFragments()), minTime),
+    ];
+    printMeasurements(`${size} files (${tokenCount} tokens, ${index.allPairs().length} pairs)`, results);
+    measurements.push(...results);
+  }
+
+  if (values.save) {
+    const baseline: Baseline = { node: process.versions.node, language: values.language, measurements };
+    await writeFile(values.save, JSON.stringify(baseline, null, 2));
+    console.log(`\nResults written to ${values.save}`);
+  }
+
+  if (values.baseline) {
+    const baseline = JSON.parse(await readFile(values.baseline, "utf-8")) as Baseline;
+    if (baseline.language !== values.language) {
+      throw new Error(`The baseline was measured on ${baseline.language} instead of ${values.language}`);
+    }
+    const regressions = compare(measurements, baseline, parseFloat(values.threshold));
+    if (regressions.length > 0) {
+      console.error(`\n${regressions.length} benchmark(s) regressed: ${regressions.join(", ")}`);
+      process.exitCode = 1;
+    }
+  }
+}
+
+await main();
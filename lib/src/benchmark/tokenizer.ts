@@ -0,0 +1,100 @@
+/**
+ * Benchmark of the tokenizers of the languages with a tree-sitter grammar:
+ * the iterative TreeCursor walk of CodeTokenizer compared with the original
+ * recursive walk over the named children of each node, on the files in the
+ * samples directory.
+ *
+ * Run with `npm run benchmark:tokenizer` in the lib directory.
+ */
+import { readdir, readFile } from "node:fs/promises";
+import path from "node:path";
+import { default as Parser, SyntaxNode } from "tree-sitter";
+import { assert, Region } from "@dodona/dolos-core";
+import { LanguagePicker, ProgrammingLanguage } from "../lib/language.js";
+import { Token } from "../lib/tokenizer/tokenizer.js";
+import { measure, printMeasurements } from "./util.js";
+
+/**
+ * The original implementation, which creates a Region and a token object per
+ * node and recurses over the named children, kept as a reference.
+ */
+function originalTokenizeNode(node: SyntaxNode, tokens: Token[]): [number, number] {
+  const location = new Region(
+    node.startPosition.row,
+    node.startPosition.column,
+    node.endPosition.row,
+    node.endPosition.column
+  );
+  const includeToken = !node.type.includes("comment");
+  if (includeToken) {
+    tokens.push({ token: "(", location });
+    tokens.push({ token: node.type, location });
+  }
+  for (const child of node.namedChildren) {
+    const [childStartRow, childStartCol] = originalTokenizeNode(child, tokens);
+    if ((childStartRow < location.endRow) || (childStartRow === location.endRow && childStartCol < location.endCol)) {
+      location.endRow = childStartRow;
+      location.endCol = childStartCol;
+    }
+  }
+  if (includeToken) {
+    tokens.push({ token: ")", location });
+  }
+  return [location.startRow, location.startCol];
+}
+
+async function main(): Promise<void> {
+  const samples = "../samples";
+  const rows = [];
+  for (const language of LanguagePicker.languages) {
+    if (!(language instanceof ProgrammingLanguage)) {
+      continue;
+    }
+    const directory = path.join(samples, language.name);
+    const names = (await readdir(directory, { recursive: true }))
+      .filter(name => language.extensionMatches(name));
+    const contents = await Promise.all(names.map(name => readFile(path.join(directory, name), "utf-8")));
+    if (contents.length === 0) {
+      continue;
+    }
+
+    const tokenizer = await language.createTokenizer();
+    const parser = new Parser();
+    parser.setLanguage(language.getLanguageModule());
+    const original = (): Token[][] => contents.map(content => {
+      const tree = parser.parse(content, undefined, { bufferSize: Math.max(32 * 1024, content.length * 2) });
+      const tokens: Token[] = [];
+      originalTokenizeNode(tree.rootNode, tokens);
+      return tokens;
+    });
+    const cursor = (): Array<[Uint32Array, Uint32Array]> => contents.map(content => tokenizer.tokenizePacked(content));
+
+    // Both implementations should result in the same tokens and mapping
+    const expected = original();
+    for (let i = 0; i < contents.length; i++) {
+      assert(
+        JSON.stringify(tokenizer.generateTokens(contents[i])) === JSON.stringify(expected[i]),
+        `The tokens of ${names[i]} (${language.name}) differ`
+      );
+    }
+
+    const measurements = [
+      measure("recursive", original, 500),
+      measure("cursor", cursor, 500),
+    ];
+    printMeasurements(`${language.name} (${contents.length} files)`, measurements);
+    const tokenCount = expected.reduce((sum, tokens) => sum + tokens.length, 0);
+    rows.push({
+      language: language.name,
+      files: contents.length,
+      tokens: tokenCount,
+      "recursive (Mtokens/sec)": Number((measurements[0].opsPerSecond * tokenCount / 1e6).toFixed(2)),
+      "cursor (Mtokens/sec)": Number((measurements[1].opsPerSecond * tokenCount / 1e6).toFixed(2)),
+      speedup: Number((measurements[1].opsPerSecond / measurements[0].opsPerSecond).toFixed(2)),
+    });
+  }
+  console.log("\nSummary");
+  console.table(rows);
+}
+
+await main();
@@ -0,0 +1,69 @@
+import { performance } from "node:perf_hooks";
+
+export interface Measurement {
+  name: string;
+  iterations: number;
+  opsPerSecond: number;
+  meanMs: number;
+  // The highest resident set size and used heap (in bytes) seen while measuring
+  peakRss: number;
+  peakHeap: number;
+}
+
+/**
+ * Runs the given function repeatedly for at least `minTime` milliseconds
+ * (after a short warmup) and reports how many times per second it ran.
+ *
+ * The memory usage of the process is sampled at most every 10 milliseconds
+ * between runs, so the peaks are an approximation for fast functions.
+ */
+export function measure(name: string, fn: () => unknown, minTime = 1000): Measurement {
+  // warmup, so the JIT compiler has seen the code
+  const warmupEnd = performance.now() + Math.min(200, minTime / 5);
+  while (performance.now() < warmupEnd) {
+    fn();
+  }
+
+  let peakRss = 0;
+  let peakHeap = 0;
+  let lastSample = -Infinity;
+  let iterations = 0;
+  const start = performance.now();
+  let elapsed = 0;
+  while (elapsed < minTime) {
+    fn();
+    iterations += 1;
+    elapsed = performance.now() - start;
+    if (elapsed - lastSample >= 10) {
+      const { rss, heapUsed } = process.memoryUsage();
+      peakRss = Math.max(peakRss, rss);
+      peakHeap = Math.max(peakHeap, heapUsed);
+      lastSample = elapsed;
+    }
+  }
+
+  return {
+    name,
+    iterations,
+    opsPerSecond: iterations / (elapsed / 1000),
+    meanMs: elapsed / iterations,
+    peakRss,
+    peakHeap,
+  };
+}
+
+export function megabytes(bytes: number): number {
+  return Number((bytes / 1024 / 1024).toFixed(1));
+}
+
+export function printMeasurements(title: string, measurements: Measurement[]): void {
+  console.log(`\n${title}`);
+  console.table(measurements.map(m => ({
+    name: m.name,
+    "ops/sec": Number(m.opsPerSecond.toFixed(2)),
+    "mean (ms)": Number(m.meanMs.toFixed(4)),
+    iterations: m.iterations,
+    "peak RSS (MB)": megabytes(m.peakRss),
+    "peak heap (MB)": megabytes(m.peakHeap),
+  })));
+}
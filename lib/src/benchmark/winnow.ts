@@ -0,0 +1,113 @@
+/**
+ * Micro-benchmark of winnowing, comparing the original array based
+ * WinnowFilter.fingerprints with streaming the fingerprints over a typed
+ * array of token hashes, as FingerprintIndex does.
+ *
+ * Run with `npm run benchmark:winnow` in the lib directory.
+ */
+import { Dolos } from "../lib/dolos.js";
+import { Options } from "../lib/options.js";
+import { assert, Fingerprint, RollingHash, TokenHash, WinnowFilter } from "@dodona/dolos-core";
+import { measure, printMeasurements } from "./util.js";
+
+const upgmaFiles = [
+  "UPGMA_A.py",
+  "UPGMA_A_copy.py",
+  "UPGMA_A_functionsmoved.py",
+  "UPGMA_A_linesmoved.py",
+  "UPGMA_A_variablenames.py",
+  "UPGMA_A_B_combined.py",
+  "UPGMA_B.py",
+].map(f => `../samples/python/benchmark_files/${f}`);
+
+/**
+ * The original implementation, which builds a tuple per token and slices a
+ * window of tokens for every token, kept as a reference.
+ */
+function originalFingerprints(tokens: string[], k: number, windowSize: number): Array<Fingerprint> {
+  const hasher = new TokenHash();
+  const hashedTokens: Array<[number, string]> = tokens.map(token => [hasher.hashToken(token), token]);
+  const hash = new RollingHash(k);
+  let window: string[] = [];
+  let filePos: number = -1 * k;
+  let bufferPos = 0;
+  let minPos = 0;
+  const buffer: number[] = new Array(windowSize).fill(Number.MAX_SAFE_INTEGER);
+  const fingerprints: Array<Fingerprint> = [];
+
+  for (const [hashedToken, token] of hashedTokens) {
+    filePos++;
+    window = window.slice(-k + 1);
+    window.push(token);
+    if (filePos < 0) {
+      hash.nextHash(hashedToken);
+      continue;
+    }
+    bufferPos = (bufferPos + 1) % windowSize;
+    buffer[bufferPos] = hash.nextHash(hashedToken);
+    if (minPos === bufferPos) {
+      for (let i = (bufferPos + 1) % windowSize; i !== bufferPos; i = (i + 1) % windowSize) {
+        if (buffer[i] <= buffer[minPos]) {
+          minPos = i;
+        }
+      }
+      const start = filePos + (minPos - bufferPos - windowSize) % windowSize;
+      fingerprints.push({ data: null, hash: buffer[minPos], start, stop: start + k - 1 });
+    } else if (buffer[bufferPos] <= buffer[minPos]) {
+      minPos = bufferPos;
+      const start = filePos + ((minPos - bufferPos - windowSize) % windowSize);
+      fingerprints.push({ data: null, hash: buffer[minPos], start, stop: start + k - 1 });
+    }
+  }
+  return fingerprints;
+}
+
+function syntheticTokens(length: number, vocabulary: number): string[] {
+  let seed = length;
+  const random = (max: number): number => {
+    seed = (seed * 1103515245 + 12345) % 2147483648;
+    return seed % max;
+  };
+  const words = Array.from({ length: vocabulary }, (_, i) => `node_type_${i}`);
+  return Array.from({ length }, () => words[random(vocabulary)]);
+}
+
+async function main(): Promise<void> {
+  const k = Options.defaultKgramLength;
+  const w = Options.defaultKgramsInWindow;
+
+  const dolos = new Dolos({ language: "python" });
+  const report = await dolos.analyzePaths(upgmaFiles);
+  const upgmaTokens = report.files.flatMap(f => f.decodeTokens());
+
+  const datasets: Array<[string, string[]]> = [
+    ["UPGMA samples", upgmaTokens],
+    ["synthetic, 200 distinct tokens", syntheticTokens(1_000_000, 200)],
+  ];
+
+  for (const [name, tokens] of datasets) {
+    const filter = new WinnowFilter(k, w);
+    const streamed: number[] = [];
+    filter.streamFingerprints(filter.hashTokenArray(tokens), hash => streamed.push(hash));
+    assert(
+      originalFingerprints(tokens, k, w).every((f, i) => f.hash === streamed[i]),
+      `Different result on ${name}`
+    );
+
+    const measurements = [
+      measure("array (original)", () => originalFingerprints(tokens, k, w)),
+      measure("fingerprints()", () => filter.fingerprints(tokens)),
+      measure("streamFingerprints()", () => {
+        let count = 0;
+        filter.streamFingerprints(filter.hashTokenArray(tokens), () => count++);
+        return count;
+      }),
+    ];
+    printMeasurements(`${name} (${tokens.length} tokens)`, measurements);
+    for (const measurement of measurements) {
+      console.log(`${measurement.name}: ${(measurement.opsPerSecond * tokens.length / 1e6).toFixed(2)}M tokens/sec`);
+    }
+  }
+}
+
+await main();
@@ -1,10 +1,16 @@
 export * from "@dodona/dolos-core";
 
 export * from "./lib/dolos.js";
+export * from "./lib/indexFile.js";
 export * from "./lib/language.js";
 export * from "./lib/options.js";
+export * from "./lib/profile.js";
+export * from "./lib/progress.js";
 export * from "./lib/report.js";
 export * from "./lib/reader.js";
+export * from "./lib/tokenSpill.js";
 export * from "./lib/tokenizer/charTokenizer.js";
 export * from "./lib/tokenizer/codeTokenizer.js";
+export * from "./lib/tokenizer/tokenCache.js";
 export * from "./lib/tokenizer/tokenizer.js";
+export * from "./lib/tokenizer/tokenizerPool.js";
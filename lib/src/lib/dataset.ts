@@ -1,39 +1,119 @@
-import { readFiles, readPath } from "./reader.js";
+import { mapLimit, maxOpenFiles, readFiles, readPath } from "./reader.js";
 
 import { ExtraInfo, File, Result } from "@dodona/dolos-core";
 import { csvParse, DSVRowString } from "d3-dsv";
 
-import { constants } from "node:fs";
 import fs from "node:fs/promises";
 import path from "node:path";
-import { spawnSync as spawn } from "node:child_process";
-import { tmpdir } from "node:os";
+import { ZipReader } from "./zipReader.js";
+import { GlobFilter } from "./glob.js";
+import { LanguagePicker } from "./language.js";
+
+/**
+ * Options to select the files of a dataset.
+ */
+export interface DatasetOptions {
+  // The extensions of the language of the files
+  extensions?: string[];
+  // The maximum size in bytes of a file in a directory
+  maxFileSize?: number;
+  // Glob patterns of files and directories to skip in a directory
+  exclude?: string[];
+}
 
 export class Dataset {
   constructor(
       public name: string,
       public files: File[],
-      public ignore?: File) {
+      public ignore?: File,
+      public warnings: string[] = []) {
   }
 
-  private static async fromDirectory(dirPath: string): Promise<Result<File[]>> {
-    const dirs = [dirPath];
-    const files = [];
+  /**
+   * Reads the files in the given directory and its subdirectories.
+   *
+   * Files and directories matching the `exclude` patterns are skipped. Files
+   * without one of the `extensions` (or an extension of a known language if
+   * none are given), larger than `maxFileSize` or containing binary data are
+   * skipped as well, with a warning. At most `maxOpenFiles` files are read at
+   * the same time.
+   */
+  private static async fromDirectory(
+    dirPath: string,
+    options: DatasetOptions,
+    warnings: string[]
+  ): Promise<File[]> {
+    const exclude = new GlobFilter(options.exclude ?? []);
+    const extensions = options.extensions?.length ?
+      options.extensions :
+      LanguagePicker.languages.flatMap(l => l.extensions);
 
+    // Directories to walk, relative to dirPath with forward slashes
+    const dirs = [""];
+    const candidates: string[] = [];
+    const wrongExtension: string[] = [];
     let i = 0;
-
-    while(i < dirs.length) {
-      for (const entry of await fs.readdir(dirs[i], { withFileTypes: true })) {
+    while (i < dirs.length) {
+      for (const entry of await fs.readdir(path.join(dirPath, dirs[i]), { withFileTypes: true })) {
+        const relative = dirs[i] ? `${dirs[i]}/${entry.name}` : entry.name;
+        if (exclude.excludes(relative)) {
+          continue;
+        }
         if (entry.isDirectory()) {
-          dirs.push(path.join(dirs[i], entry.name));
+          dirs.push(relative);
         } else if (entry.isFile()) {
-          files.push(readPath(path.join(dirs[i], entry.name)));
+          if (Dataset.matchesExtension(relative, extensions)) {
+            candidates.push(relative);
+          } else {
+            wrongExtension.push(relative);
+          }
         }
       }
       i += 1;
     }
 
-    return await Result.all(files);
+    candidates.sort();
+    const tooLarge: string[] = [];
+    const binary: string[] = [];
+    const maxFileSize = options.maxFileSize ?? Infinity;
+    const files = await mapLimit(candidates, maxOpenFiles, async relative => {
+      const location = path.join(dirPath, relative);
+      if ((await fs.stat(location)).size > maxFileSize) {
+        tooLarge.push(relative);
+        return null;
+      }
+      const content = await fs.readFile(location);
+      // Like git, consider files with a null byte near the start binary
+      if (content.subarray(0, 8000).includes(0)) {
+        binary.push(relative);
+        return null;
+      }
+      return new File(location, content.toString());
+    });
+
+    if (wrongExtension.length > 0) {
+      const language = options.extensions?.length ? "the language" : "a known language";
+      warnings.push(Dataset.skipped(
+        `${dirPath} that do not have the extension of ${language}`,
+        wrongExtension
+      ));
+    }
+    if (tooLarge.length > 0) {
+      warnings.push(Dataset.skipped(`${dirPath} larger than ${maxFileSize / 1024} KB`, tooLarge));
+    }
+    if (binary.length > 0) {
+      warnings.push(Dataset.skipped(`${dirPath} with binary content`, binary));
+    }
+    return files.filter(f => f !== null);
+  }
+
+  /**
+   * A warning that the given files were skipped, listing the first few.
+   */
+  private static skipped(reason: string, files: string[]): string {
+    const shown = files.slice(0, 5).join(", ");
+    const more = files.length > 5 ? ` and ${files.length - 5} more` : "";
+    return `Skipped ${files.length} file(s) in ${reason}: ${shown}${more}.`;
   }
 
   private static async setIgnoredFile(resolvedFiles: File[], ignore?: string): Promise<File | undefined> {
@@ -50,51 +130,79 @@ export class Dataset {
     return ignoredFiles.length === 1 ? ignoredFiles[0] : undefined;
   }
 
-  private static runCommand(
-    command: string,
-    args: string[]
-  ): void {
-    const result = spawn(command, args);
-    if (result.error) {
-      throw result.error;
-    }
-    if (result.status !== 0) {
-      throw new Error(
-        `The ${command} command failed with exit status ${result.status}, stderr:\n${result.stderr}`
-      );
-    }
+  /**
+   * Whether the given path has one of the given extensions, or true if no
+   * extensions are given.
+   */
+  private static matchesExtension(filePath: string, extensions?: string[]): boolean {
+    return extensions === undefined || extensions.length === 0 ||
+      extensions.some(ext => filePath.toLowerCase().endsWith(ext.toLowerCase()));
   }
 
+  /**
+   * Reads the files in a ZIP archive without extracting it.
+   *
+   * If the archive contains a top level info.csv file, the files listed in it
+   * are read. Otherwise all files in the archive are read. Entries that do not
+   * have one of the given extensions are skipped without decompressing them.
+   */
   private static async fromZIP(
     zipPath: string,
-    ignore?: string
+    ignore?: string,
+    extensions?: string[]
   ): Promise<Dataset> {
-    const tmpDir = await fs.mkdtemp(path.join(tmpdir(), "dolos-unzip-"));
+    const zip = await ZipReader.open(zipPath);
+    const nameCandidate = path.basename(zipPath, ".zip");
     try {
-      this.runCommand("unzip", [zipPath, "-d", tmpDir]);
-      this.runCommand("chmod", ["-R", "u+rwx", tmpDir]);
-
-      const infoPath = path.join(tmpDir, "info.csv");
-      if (await fs.access(infoPath, constants.R_OK).then(() => true).catch(() => false)) {
-        const dataset = await Dataset.fromCSV(infoPath, ignore);
-        if (dataset) {
-          dataset.name = path.basename(zipPath, ".zip");
-          return dataset;
-        }
-        else {
-          throw new Error("Failed to process files");
+      const info = zip.entry("info.csv");
+      if (info) {
+        const rows = Dataset.parseInfo((await zip.read(info)).toString())
+          .filter(row => Dataset.matchesExtension(row.filename, extensions));
+        const resolvedFiles = [];
+        for (const row of rows) {
+          const entry = zip.entry(path.posix.normalize(row.filename));
+          if (entry === undefined) {
+            throw new Error(`The file ${row.filename} in info.csv was not found in ${zipPath}`);
+          }
+          resolvedFiles.push(new File(entry.name, (await zip.read(entry)).toString(), row));
         }
+        const ignoredFile = await this.setIgnoredFile(resolvedFiles, ignore);
+        const files = resolvedFiles.filter(file => file.extra?.ignored !== "true");
+        return new Dataset(nameCandidate, files, ignoredFile);
       } else {
-        const files = (await this.fromDirectory(tmpDir)).ok();
+        const files = [];
+        for (const entry of zip.entries) {
+          if (!entry.isDirectory && Dataset.matchesExtension(entry.name, extensions)) {
+            files.push(new File(entry.name, (await zip.read(entry)).toString()));
+          }
+        }
         const ignoredFile = await this.setIgnoredFile(files, ignore);
-        const nameCandidate = path.basename(zipPath, ".zip");
         return new Dataset(nameCandidate, files, ignoredFile);
       }
     } finally {
-      await fs.rm(tmpDir, { recursive: true });
+      await zip.close();
     }
   }
 
+  /**
+   * Parses the rows of an info.csv file, as exported by Dodona.
+   */
+  private static parseInfo(content: string): Array<ExtraInfo> {
+    return csvParse(content)
+      .map((row:  DSVRowString) => ({
+        filename: row.filename as string,
+        fullName: row.full_name as string,
+        id: row.id as string,
+        status: row.status as string,
+        submissionID: row.submission_id as string,
+        nameEN: row.name_en as string,
+        nameNL: row.name_nl as string,
+        exerciseID: row.exercise_id as string,
+        createdAt: new Date(row.created_at as string),
+        labels: row.label as string || row.labels as string,
+        ignored: row.ignored as string
+      }));
+  }
 
   private static async fromCSV(
     infoPath: string,
@@ -102,22 +210,13 @@ export class Dataset {
   ): Promise<Dataset> {
     const dirname = path.dirname(infoPath);
     try {
-      const csv_files = csvParse((await fs.readFile(infoPath)).toString())
-        .map((row:  DSVRowString) => ({
-          filename: row.filename as string,
-          fullName: row.full_name as string,
-          id: row.id as string,
-          status: row.status as string,
-          submissionID: row.submission_id as string,
-          nameEN: row.name_en as string,
-          nameNL: row.name_nl as string,
-          exerciseID: row.exercise_id as string,
-          createdAt: new Date(row.created_at as string),
-          labels: row.label as string || row.labels as string,
-          ignored: row.ignored as string
-        }))
-        .map((row: ExtraInfo) => readPath(path.join(dirname, row.filename), row));
-      const resolvedFiles = await Result.all(csv_files);
+      const rows = Dataset.parseInfo((await fs.readFile(infoPath)).toString());
+      const csv_files = await mapLimit(
+        rows,
+        maxOpenFiles,
+        (row: ExtraInfo) => readPath(path.join(dirname, row.filename), row)
+      );
+      const resolvedFiles = await Result.all(csv_files.map(file => Promise.resolve(file)));
       const ignoredFile = await this.setIgnoredFile(resolvedFiles.ok(), ignore);
       const files = resolvedFiles.ok().filter(file => file.extra?.ignored !== "true");
       const nameCandidate = path.dirname(infoPath).split(path.sep).pop() || "undefined";
@@ -128,21 +227,42 @@ export class Dataset {
   }
 
 
-  public static async create(paths: string[], ignore?: string): Promise<Dataset> {
-    if (paths.length == 1) {
+  /**
+   * Creates a dataset from a list of files and directories, a CSV file or a
+   * ZIP archive.
+   *
+   * @param paths The files and directories, or a single CSV file or ZIP
+   * archive.
+   * @param ignore The path of a template file, whose code is ignored.
+   * @param options Which files of directories and ZIP archives to read, files
+   * in a ZIP archive with another extension than `extensions` are skipped.
+   */
+  public static async create(paths: string[], ignore?: string, options: DatasetOptions = {}): Promise<Dataset> {
+    const isDirectory = await Promise.all(
+      paths.map(p => fs.stat(p).then(stats => stats.isDirectory()).catch(() => false))
+    );
+    if (paths.length == 1 && !isDirectory[0]) {
       const inputFile = paths[0];
       if (inputFile.toLowerCase().endsWith(".zip")) {
-        return Dataset.fromZIP(inputFile, ignore);
+        return Dataset.fromZIP(inputFile, ignore, options.extensions);
       } else if (inputFile.toLowerCase().endsWith(".csv")) {
         return Dataset.fromCSV(inputFile, ignore);
       } else {
-        throw new Error("You gave one input file, but it is not a CSV file or a ZIP archive.");
+        throw new Error("You gave one input file, but it is not a CSV file, a ZIP archive or a directory.");
       }
     } else {
-      const resolvedFiles = (await readFiles(paths)).ok();
+      const warnings: string[] = [];
+      const resolvedFiles = (await readFiles(paths.filter((_, i) => !isDirectory[i]))).ok();
+      for (let i = 0; i < paths.length; i++) {
+        if (isDirectory[i]) {
+          resolvedFiles.push(...await Dataset.fromDirectory(paths[i], options, warnings));
+        }
+      }
       const resolvedIgnoredFile = await this.setIgnoredFile(resolvedFiles, ignore);
-      const nameCandidate = path.basename(paths[0]) + " & " + path.basename(paths[1]);
-      return new Dataset(nameCandidate, resolvedFiles, resolvedIgnoredFile);
+      const nameCandidate = paths.length == 1 ?
+        path.basename(path.resolve(paths[0])) :
+        path.basename(paths[0]) + " & " + path.basename(paths[1]);
+      return new Dataset(nameCandidate, resolvedFiles, resolvedIgnoredFile, warnings);
     }
   }
 }
@@ -1,47 +1,196 @@
 import { Report } from "./report.js";
 import { CustomOptions, Options } from "./options.js";
 import { Tokenizer } from "./tokenizer/tokenizer.js";
+import { TokenizerPool } from "./tokenizer/tokenizerPool.js";
+import { TokenCache } from "./tokenizer/tokenCache.js";
 import { Language, LanguagePicker } from "./language.js";
 import { Dataset } from "./dataset.js";
+import { loadIndex } from "./indexFile.js";
+import { TokenSpill } from "./tokenSpill.js";
+import { Profile, ProfileHooks } from "./profile.js";
+import { ProgressStream } from "./progress.js";
 
-import { FingerprintIndex, File } from "@dodona/dolos-core";
+import { FingerprintIndex, File, FrozenIndex, HashEngine, TokenizedFile } from "@dodona/dolos-core";
 
 export class Dolos {
+  // The amount of files that are tokenized at once in low-memory mode
+  public static readonly lowMemoryBatchSize = 512;
+  // The amount of files that are tokenized or indexed on the main thread
+  // between two progress events
+  public static readonly progressBatchSize = 64;
+
   readonly options: Options;
 
   private languageDetected = false;
   private language: Language | null = null;
   private tokenizer: Tokenizer | null = null;
+  private cache: TokenCache | null = null;
   private index: FingerprintIndex | null = null;
+  private spill: TokenSpill | null = null;
+  // The tokenizer threads of the running analysis, if it uses them
+  private pool: TokenizerPool | null = null;
+  private readonly streams = new Set<ProgressStream>();
 
   private readonly languagePicker = new LanguagePicker();
 
-  constructor(customOptions?: CustomOptions) {
+  /**
+   * @param hooks Callbacks that are called when a phase of an analysis starts
+   * and ends, and with its progress, see Profile. The profile of an analysis is
+   * also included in the metadata of its report.
+   */
+  constructor(customOptions?: CustomOptions, private readonly hooks: ProfileHooks = {}) {
     this.options = new Options(customOptions);
   }
 
-  public async analyzePaths(paths: string[], ignore?: string): Promise<Report> {
-    const dataset = await Dataset.create(paths, ignore);
-    return this.analyze(dataset.files, dataset.name, dataset.ignore);
+  /**
+   * Returns the progress events of the next (or currently running) analysis
+   * as an async iterator, which ends when that analysis is done or failed.
+   */
+  public progress(): ProgressStream {
+    const stream = new ProgressStream();
+    this.streams.add(stream);
+    return stream;
+  }
+
+  /**
+   * Removes the temporary file of the tokens offloaded in low-memory mode.
+   * The offloaded files of the reports of this instance can no longer be
+   * read afterwards (e.g. to build fragments or write a report), so only
+   * close it once the reports are no longer needed.
+   */
+  public close(): void {
+    this.spill?.close();
+    this.spill = null;
   }
 
+  /**
+   * Analyzes the files at the given paths (see Dataset).
+   *
+   * @param signal Stops the analysis when aborted, the returned promise is
+   * then rejected with the reason of the signal.
+   */
+  public async analyzePaths(paths: string[], ignore?: string, signal?: AbortSignal): Promise<Report> {
+    return await this.track(async () => {
+      const profile = this.createProfile();
+      const dataset = await profile.time("read", async () => {
+        // Files in a ZIP archive or directory that do not match the requested language are skipped
+        const extensions = this.options.language ?
+          (await this.languagePicker.findLanguage(this.options.language)).extensions :
+          undefined;
+        return await Dataset.create(paths, ignore, {
+          extensions,
+          maxFileSize: this.options.maxFileSize * 1024,
+          exclude: this.options.exclude,
+        });
+      });
+      signal?.throwIfAborted();
+      profile.progress("read", dataset.files.length, dataset.files.length);
+      return await this.analyzeFiles(dataset.files, dataset.name, dataset.ignore, dataset.warnings, profile, signal);
+    });
+  }
+
+  /**
+   * Analyzes the given files.
+   *
+   * @param profile Records the phases and progress of the analysis. Progress
+   * events are only sent to the streams of `progress()` when the default
+   * profile is used.
+   * @param signal Stops the analysis when aborted, the returned promise is
+   * then rejected with the reason of the signal.
+   */
   public async analyze(
     files: Array<File>,
     nameCandidate?: string,
-    ignoredFile?: File
+    ignoredFile?: File,
+    warnings: string[] = [],
+    profile = this.createProfile(),
+    signal?: AbortSignal
   ): Promise<Report> {
+    return await this.track(() => this.analyzeFiles(files, nameCandidate, ignoredFile, warnings, profile, signal));
+  }
+
+  /**
+   * A profile that also sends its progress events to the streams of
+   * `progress()`.
+   */
+  private createProfile(): Profile {
+    return new Profile({
+      ...this.hooks,
+      progress: event => {
+        this.hooks.progress?.(event);
+        for (const stream of this.streams) {
+          stream.push(event);
+        }
+      },
+    });
+  }
+
+  /**
+   * Runs an analysis and ends the progress streams when it is done.
+   */
+  private async track(analysis: () => Promise<Report>): Promise<Report> {
+    try {
+      return await analysis();
+    } finally {
+      for (const stream of this.streams) {
+        stream.end();
+      }
+      this.streams.clear();
+    }
+  }
+
+  /**
+   * Lets the event loop run (e.g. the timer of `AbortSignal.timeout`) and
+   * throws if the signal was aborted.
+   */
+  private static async checkpoint(signal?: AbortSignal): Promise<void> {
+    if (signal) {
+      await new Promise(resolve => setImmediate(resolve));
+      signal.throwIfAborted();
+    }
+  }
+
+  private async analyzeFiles(
+    files: Array<File>,
+    nameCandidate: string | undefined,
+    ignoredFile: File | undefined,
+    warnings: string[],
+    profile: Profile,
+    signal?: AbortSignal
+  ): Promise<Report> {
+    signal?.throwIfAborted();
 
     if (this.index == null) {
-      if (this.options.language) {
-        this.language = await this.languagePicker.findLanguage(this.options.language);
-      } else {
-        this.language = this.languagePicker.detectLanguage(files);
+      const language = await profile.time("detectLanguage", async () => {
+        if (this.options.language) {
+          return await this.languagePicker.findLanguage(this.options.language);
+        }
         this.languageDetected = true;
+        return this.languagePicker.detectLanguage(files);
+      });
+      this.language = language;
+      this.tokenizer = await profile.time(
+        "tokenize",
+        () => language.createTokenizer({ includeComments: this.options.includeComments })
+      );
+      if (this.options.cacheDir) {
+        this.cache = new TokenCache(this.options.cacheDir, this.tokenizer, this.options.cacheMaxSize * 1024 * 1024);
+      }
+      if (this.options.against) {
+        const against = this.options.against;
+        this.index = await profile.time("read", () => loadIndex(against, language.tokenTable));
+        this.checkIndexOptions(this.index);
+      } else {
+        this.index = new FingerprintIndex(
+          this.options.kgramLength,
+          this.options.kgramsInWindow,
+          this.options.kgramData,
+          undefined,
+          HashEngine.byName(this.options.hashEngine)
+        );
       }
-      this.tokenizer = await this.language.createTokenizer({ includeComments: this.options.includeComments });
-      this.index = new FingerprintIndex(this.options.kgramLength, this.options.kgramsInWindow, this.options.kgramData);
     }
-    const warnings = [];
+    warnings = [...warnings];
     let filteredFiles;
     if (this.languageDetected) {
       filteredFiles = files.filter(file => this.language?.extensionMatches(file.path));
@@ -56,10 +205,18 @@ export class Dolos {
     } else {
       filteredFiles = files;
     }
+    if (this.options.parallelScoring && this.options.against) {
+      warnings.push(
+        "Pairs are not scored in parallel when comparing against an index, " +
+        "only the pairs of the new files are computed."
+      );
+    }
 
-    if (filteredFiles.length < 2) {
+    // Files that were added before (or are part of the index to compare against) count as well
+    const fileCount = this.index.entries().length + filteredFiles.length;
+    if (fileCount < 2) {
       throw new Error("You need to supply at least two files");
-    } else if (filteredFiles.length == 2 && this.options.maxFingerprintPercentage !== null) {
+    } else if (fileCount == 2 && this.options.maxFingerprintPercentage !== null) {
       throw new Error("You have given a maximum hash percentage but your are " +
         "comparing two files. Each matching hash will thus " +
         "be present in 100% of the files. This option does only" +
@@ -76,20 +233,166 @@ export class Dolos {
 
     this.index.updateMaxFingerprintFileCount(maxFingerprintFileCount);
 
-    const tokenizedFiles = filteredFiles.map(f => this.tokenizer!.tokenizeFile(f));
-    this.index.addFiles(tokenizedFiles);
-    if (ignoredFile) {
-      const tokenizedTemplate = this.tokenizer!.tokenizeFile(ignoredFile);
-      this.index.addIgnoredFile(tokenizedTemplate);
+    const index = this.index;
+    // The same tokenizer threads are used for all batches of files
+    if (this.options.workers > 1 && TokenizerPool.supports(this.language!)) {
+      this.pool = new TokenizerPool(
+        this.language!,
+        { includeComments: this.options.includeComments },
+        this.options.workers
+      );
+    }
+    let tokenizedFiles;
+    try {
+      tokenizedFiles = await this.indexFiles(filteredFiles, profile, signal);
+      if (ignoredFile) {
+        const [tokenizedTemplate] = await profile.time("tokenize", () => this.tokenizeFiles([ignoredFile]));
+        profile.timeSync("index", () => index.addIgnoredFile(tokenizedTemplate));
+        this.spill?.offload(tokenizedTemplate);
+      }
+    } finally {
+      await this.pool?.terminate();
+      this.pool = null;
     }
+    if (this.options.freezeIndex) {
+      profile.timeSync("index", () => index.freeze());
+    }
+    this.countFiles(tokenizedFiles, profile);
 
-    return new Report(
+    const report = new Report(
       this.options,
       this.language,
       tokenizedFiles,
       this.index,
       nameCandidate,
-      warnings
+      warnings,
+      profile
     );
+    if (this.options.parallelScoring && !this.options.against) {
+      await report.scorePairs(undefined, signal);
+    }
+    return report;
+  }
+
+  /**
+   * Throws an error if the given index (restored from a snapshot) was not
+   * built with the same kgram and hash options.
+   */
+  private checkIndexOptions(index: FingerprintIndex): void {
+    const mismatches = [];
+    if (index.kgramLength !== this.options.kgramLength) {
+      mismatches.push(`kgramLength is ${index.kgramLength}`);
+    }
+    if (index.kgramsInWindow !== this.options.kgramsInWindow) {
+      mismatches.push(`kgramsInWindow is ${index.kgramsInWindow}`);
+    }
+    if (index.hashEngine.name !== this.options.hashEngine) {
+      mismatches.push(`hashEngine is ${index.hashEngine.name}`);
+    }
+    if (mismatches.length > 0) {
+      throw new Error(
+        `The index ${this.options.against} was built with different options ` +
+        `(${mismatches.join(", ")}), use the same options to compare files against it.`
+      );
+    }
+  }
+
+  /**
+   * Sets the counters of the profile to the amount of given files, and their
+   * tokens and kgrams, and the fingerprints in the index.
+   */
+  private countFiles(files: Array<TokenizedFile>, profile: Profile): void {
+    const ids = new Set(files.map(f => f.id));
+    const fingerprints = this.index!.sharedFingerprints();
+    profile.counters.files = files.length;
+    profile.counters.tokens = files.reduce((sum, f) => sum + f.tokenCount, 0);
+    profile.counters.kgrams = this.index!.entries()
+      .filter(e => ids.has(e.file.id))
+      .reduce((sum, e) => sum + FrozenIndex.kgramCount(e), 0);
+    profile.counters.fingerprints = fingerprints.length;
+    profile.counters.ignoredFingerprints = fingerprints.filter(f => f.ignored).length;
+  }
+
+  /**
+   * Tokenizes the given files and adds them to the index. In low-memory mode,
+   * the files are tokenized in batches and the tokens of each batch are
+   * offloaded to a temporary file once they are added to the index, so the
+   * tokens of all files are never in memory at the same time.
+   */
+  private async indexFiles(files: Array<File>, profile: Profile, signal?: AbortSignal): Promise<Array<TokenizedFile>> {
+    const index = this.index!;
+    if (this.options.lowMemory) {
+      this.spill ??= new TokenSpill();
+    }
+    const spill = this.spill;
+    const batchSize = this.options.lowMemory ? Dolos.lowMemoryBatchSize : files.length;
+    const tokenizedFiles = [];
+    profile.progress("tokenize", 0, files.length);
+    for (let start = 0; start < files.length; start += batchSize) {
+      const batch = await profile.time("tokenize", () => this.tokenizeFiles(
+        files.slice(start, start + batchSize),
+        count => profile.progress("tokenize", start + count, files.length),
+        signal
+      ));
+      // Index in smaller parts, to report the progress and check the signal in between
+      for (let i = 0; i < batch.length; i += Dolos.progressBatchSize) {
+        await Dolos.checkpoint(signal);
+        const part = batch.slice(i, i + Dolos.progressBatchSize);
+        profile.timeSync("index", () => {
+          index.addFiles(part);
+          for (const file of part) {
+            spill?.offload(file);
+          }
+        });
+        profile.progress("index", start + i + part.length, files.length);
+      }
+      tokenizedFiles.push(...batch);
+    }
+    return tokenizedFiles;
+  }
+
+  /**
+   * Tokenizes the given files, reusing the tokens in the cache directory if
+   * one is configured.
+   *
+   * @param onTokenized Called with the amount of files that are tokenized so
+   * far.
+   */
+  private async tokenizeFiles(
+    files: Array<File>,
+    onTokenized?: (count: number) => void,
+    signal?: AbortSignal
+  ): Promise<Array<TokenizedFile>> {
+    if (this.cache) {
+      const tokenized = await this.cache.tokenizeFiles(files, missing => this.parseFiles(missing, onTokenized, signal));
+      onTokenized?.(files.length);
+      return tokenized;
+    }
+    return await this.parseFiles(files, onTokenized, signal);
+  }
+
+  /**
+   * Parses the given files, in parallel using the tokenizer threads of the
+   * analysis if more than one worker is configured and the language can be
+   * loaded in a worker.
+   */
+  private async parseFiles(
+    files: Array<File>,
+    onTokenized?: (count: number) => void,
+    signal?: AbortSignal
+  ): Promise<Array<TokenizedFile>> {
+    if (this.pool !== null && files.length > 1) {
+      return await this.pool.tokenizeFiles(files, onTokenized, signal);
+    }
+    const tokenized = [];
+    for (const file of files) {
+      tokenized.push(this.tokenizer!.tokenizeFile(file));
+      if (tokenized.length % Dolos.progressBatchSize === 0) {
+        onTokenized?.(tokenized.length);
+        await Dolos.checkpoint(signal);
+      }
+    }
+    onTokenized?.(tokenized.length);
+    return tokenized;
   }
 }
@@ -0,0 +1,71 @@
+/**
+ * Converts a glob pattern to a regular expression matching a path with
+ * forward slashes.
+ *
+ * `**` matches any amount of directories, `*` matches any characters except
+ * a slash, `?` matches a single character except a slash and `[...]` matches
+ * one of the characters in the brackets (`[!...]` negates the class).
+ */
+export function globToRegExp(glob: string): RegExp {
+  let source = "";
+  for (let i = 0; i < glob.length; i++) {
+    const char = glob[i];
+    if (char === "*" && glob[i + 1] === "*") {
+      if (glob[i + 2] === "/") {
+        source += "(?:.*/)?";
+        i += 2;
+      } else {
+        source += ".*";
+        i += 1;
+      }
+    } else if (char === "*") {
+      source += "[^/]*";
+    } else if (char === "?") {
+      source += "[^/]";
+    } else if (char === "[" && glob.indexOf("]", i + 1) > i + 1) {
+      const end = glob.indexOf("]", i + 1);
+      let chars = glob.substring(i + 1, end).replace(/\\/g, "\\\\");
+      if (chars.startsWith("!")) {
+        chars = "^" + chars.substring(1);
+      }
+      source += `[${chars}]`;
+      i = end;
+    } else {
+      source += char.replace(/[.+^${}()|[\]\\]/g, "\\$&");
+    }
+  }
+  return new RegExp(`^${source}$`);
+}
+
+/**
+ * A list of glob patterns to exclude files and directories, like a
+ * .gitignore file.
+ *
+ * A pattern without a slash is matched against the name of each file or
+ * directory (e.g. `node_modules` or `*.min.js`), a pattern with a slash is
+ * matched against the path relative to the root (e.g. `build/**`).
+ */
+export class GlobFilter {
+
+  private readonly names: Array<RegExp> = [];
+  private readonly paths: Array<RegExp> = [];
+
+  constructor(patterns: Array<string>) {
+    for (const pattern of patterns) {
+      if (pattern.includes("/")) {
+        this.paths.push(globToRegExp(pattern.replace(/^\/+|\/+$/g, "")));
+      } else {
+        this.names.push(globToRegExp(pattern));
+      }
+    }
+  }
+
+  /**
+   * Whether the file or directory with the given path (relative to the root,
+   * with forward slashes) is excluded.
+   */
+  public excludes(relativePath: string): boolean {
+    const name = relativePath.substring(relativePath.lastIndexOf("/") + 1);
+    return this.names.some(r => r.test(name)) || this.paths.some(r => r.test(relativePath));
+  }
+}
@@ -0,0 +1,22 @@
+import { FingerprintIndex, TokenTable } from "@dodona/dolos-core";
+import fs from "fs/promises";
+
+/**
+ * Writes a snapshot of the given index to a file (see
+ * FingerprintIndex.snapshot), this freezes the index.
+ */
+export async function saveIndex(index: FingerprintIndex, location: string): Promise<void> {
+  await fs.writeFile(location, index.snapshot());
+}
+
+/**
+ * Restores an index from a snapshot file written by `saveIndex`.
+ *
+ * @param location The path of the snapshot.
+ * @param table The token table to store the tokens of the files in, e.g. the
+ * token table of the language of the index.
+ */
+export async function loadIndex(location: string, table?: TokenTable): Promise<FingerprintIndex> {
+  const bytes = await fs.readFile(location);
+  return FingerprintIndex.restore(bytes, table);
+}
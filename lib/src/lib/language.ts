@@ -1,11 +1,17 @@
 /* eslint-disable @typescript-eslint/ban-ts-comment */
 import { Tokenizer, TokenizerOptions } from "./tokenizer/tokenizer.js";
-import { File } from "@dodona/dolos-core";
+import { File, TokenTable } from "@dodona/dolos-core";
 
 // eslint-disable-next-line @typescript-eslint/no-explicit-any
 type TreeSitterLanguage = any;
 
 export abstract class Language {
+
+  /**
+   * The distinct tokens produced by the tokenizers of this language.
+   */
+  public readonly tokenTable = new TokenTable();
+
   constructor(
     readonly name: string,
     readonly extensions: string[],
@@ -1,3 +1,6 @@
+import { availableParallelism } from "node:os";
+import { HashEngine } from "@dodona/dolos-core";
+
 export interface DolosOptions {
   reportName?: string | undefined;
   kgramLength: number;
@@ -8,10 +11,21 @@ export interface DolosOptions {
   maxFingerprintPercentage: number | null;
   minFragmentLength: number;
   minSimilarity: number;
+  minSharedFingerprints: number;
   sortBy: string | null;
   fragmentSortBy: string | null;
   kgramData: boolean;
   includeComments: boolean;
+  freezeIndex: boolean;
+  workers: number;
+  parallelScoring: boolean;
+  hashEngine: string;
+  cacheDir: string | null;
+  cacheMaxSize: number;
+  against: string | null;
+  maxFileSize: number;
+  exclude: string[];
+  lowMemory: boolean;
 }
 
 export type CustomOptions = Partial<DolosOptions>;
@@ -38,6 +52,17 @@ function validatePositiveInteger(
   return null;
 }
 
+function validateHashEngine(
+  prop: string,
+  value: string
+): string | null {
+
+  if (!HashEngine.names().includes(value)) {
+    return `${prop} must be one of ${HashEngine.names().join(", ")}, but was ${value}`;
+  }
+  return null;
+}
+
 function definedOrNull<T>(arg: T | undefined | null): T | null {
   return arg == null ? null : arg;
 }
@@ -52,8 +77,14 @@ export class Options implements DolosOptions {
   public static defaultKgramsInWindow = 17;
   public static defaultMinFragmentLength = 0;
   public static defaultMinSimilarity = 0;
+  public static defaultMinSharedFingerprints = 1;
   public static defaultSortBy = "total";
   public static defaultFragmentSortBy = "none";
+  public static defaultWorkers = availableParallelism();
+  public static defaultHashEngine = HashEngine.default.name;
+  public static defaultCacheMaxSize = 512;
+  public static defaultMaxFileSize = 1024;
+  public static defaultExclude = [".*", "node_modules"];
 
   private custom: CustomOptions = {};
 
@@ -68,8 +99,13 @@ export class Options implements DolosOptions {
       validatePositiveInteger("minFragmentLength", this.minFragmentLength),
       validatePositiveInteger("maxFingerprintCount", this.maxFingerprintCount),
       validatePositiveInteger("limitResults", this.limitResults),
+      validatePositiveInteger("minSharedFingerprints", this.minSharedFingerprints),
       validatePositiveInteger("kgramLength", this.kgramLength),
       validatePositiveInteger("kgramsInWindow", this.kgramsInWindow),
+      validatePositiveInteger("workers", this.workers),
+      validatePositiveInteger("cacheMaxSize", this.cacheMaxSize),
+      validatePositiveInteger("maxFileSize", this.maxFileSize),
+      validateHashEngine("hashEngine", this.hashEngine),
     ].filter(err => err !== null);
 
     if (errors.length > 0) {
@@ -92,6 +128,64 @@ export class Options implements DolosOptions {
     return this.custom.includeComments === true;
   }
 
+  get freezeIndex(): boolean {
+    return this.custom.freezeIndex === true;
+  }
+
+  get hashEngine(): string {
+    return definedOrDefault(this.custom.hashEngine, Options.defaultHashEngine);
+  }
+
+  get cacheDir(): string | null {
+    return definedOrNull(this.custom.cacheDir);
+  }
+
+  /**
+   * The maximum size of the tokenization cache in megabytes.
+   */
+  get cacheMaxSize(): number {
+    return definedOrDefault(this.custom.cacheMaxSize, Options.defaultCacheMaxSize);
+  }
+
+  /**
+   * The path of an index snapshot (see saveIndex) to compare the analyzed
+   * files against.
+   */
+  get against(): string | null {
+    return definedOrNull(this.custom.against);
+  }
+
+  /**
+   * The maximum size in kilobytes of the files read from a directory.
+   */
+  get maxFileSize(): number {
+    return definedOrDefault(this.custom.maxFileSize, Options.defaultMaxFileSize);
+  }
+
+  /**
+   * Glob patterns of the files and directories to skip when reading a
+   * directory.
+   */
+  get exclude(): string[] {
+    return definedOrDefault(this.custom.exclude, Options.defaultExclude);
+  }
+
+  /**
+   * Whether the tokens of the files are moved to a temporary file once they
+   * are added to the index, instead of keeping them in memory.
+   */
+  get lowMemory(): boolean {
+    return this.custom.lowMemory === true;
+  }
+
+  get parallelScoring(): boolean {
+    return this.custom.parallelScoring === true;
+  }
+
+  get workers(): number {
+    return definedOrDefault(this.custom.workers, Options.defaultWorkers);
+  }
+
   get limitResults(): number | null {
     return definedOrNull(this.custom.limitResults);
   }
@@ -137,6 +231,13 @@ export class Options implements DolosOptions {
     );
   }
 
+  get minSharedFingerprints(): number {
+    return definedOrDefault(
+      this.custom.minSharedFingerprints,
+      Options.defaultMinSharedFingerprints
+    );
+  }
+
   get sortBy(): string {
     return definedOrDefault(this.custom.sortBy, Options.defaultSortBy);
   }
@@ -156,10 +257,21 @@ export class Options implements DolosOptions {
       minFragmentLength: this.minFragmentLength,
       limitResults: this.limitResults,
       minSimilarity: this.minSimilarity,
+      minSharedFingerprints: this.minSharedFingerprints,
       sortBy: this.sortBy,
       fragmentSortBy: this.fragmentSortBy,
       kgramData: this.kgramData,
       includeComments: this.includeComments,
+      freezeIndex: this.freezeIndex,
+      workers: this.workers,
+      parallelScoring: this.parallelScoring,
+      hashEngine: this.hashEngine,
+      cacheDir: this.cacheDir,
+      cacheMaxSize: this.cacheMaxSize,
+      against: this.against,
+      maxFileSize: this.maxFileSize,
+      exclude: this.exclude,
+      lowMemory: this.lowMemory,
     };
   }
 
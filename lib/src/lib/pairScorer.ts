@@ -0,0 +1,156 @@
+import { Worker } from "node:worker_threads";
+import { assert, FileEntry, FingerprintIndex, Pair, PairMetrics } from "@dodona/dolos-core";
+import { raceAbort } from "./progress.js";
+
+/**
+ * The data shared with each worker of a PairScorer. All typed arrays are
+ * backed by a SharedArrayBuffer, so they are not copied to the workers.
+ */
+export interface PairScorerWorkerData {
+  // The kgrams of the file at position p are at kgramOffsets[p] up to kgramOffsets[p + 1]
+  kgramOffsets: Uint32Array;
+  // The slot of the fingerprint of each kgram
+  kgramSlots: Int32Array;
+  // Whether the fingerprint in each slot is ignored
+  ignored: Uint8Array;
+  // The file positions of the pairs to score, two per pair
+  pairs: Uint32Array;
+  // The shard of pairs to score: from (inclusive) up to to (exclusive)
+  from: number;
+  to: number;
+}
+
+/**
+ * A batch of scored pairs sent back by a worker, each pair is stored as four
+ * numbers: its index in the list of pairs, leftCovered, rightCovered and
+ * longest.
+ */
+export interface PairScorerRecords {
+  records: Uint32Array;
+}
+
+/**
+ * Scores pairs of files in parallel using worker threads.
+ *
+ * The fingerprint index is frozen and the fingerprint slot of each kgram is
+ * shared with the workers through a SharedArrayBuffer. Each worker computes
+ * the coverage and longest fragment of a shard of the pairs and streams back
+ * compact records, from which the Pairs are constructed on the main thread.
+ */
+export class PairScorer {
+
+  public static recordSize = 4;
+
+  private static shared<T extends Uint8Array | Uint32Array | Int32Array>(
+    Type: { new(buffer: SharedArrayBuffer): T, BYTES_PER_ELEMENT: number },
+    source: ArrayLike<number>
+  ): T {
+    const array = new Type(new SharedArrayBuffer(Type.BYTES_PER_ELEMENT * source.length));
+    array.set(source);
+    return array;
+  }
+
+  constructor(
+    private readonly index: FingerprintIndex,
+    private readonly size: number
+  ) {}
+
+  /**
+   * Returns a Pair for each given pair of entries, in the same order, with
+   * metrics identical to constructing them on the main thread. The workers
+   * are stopped as soon as the signal is aborted.
+   *
+   * @param onScored Called with the amount of pairs that are scored so far,
+   * every time a batch of pairs is received from a worker.
+   */
+  public async scorePairs(
+    candidates: Array<[FileEntry, FileEntry]>,
+    onScored?: (count: number) => void,
+    signal?: AbortSignal
+  ): Promise<Array<Pair>> {
+    const pairs = new Array<Pair>(candidates.length);
+    await this.scoreMetrics(
+      candidates,
+      (c, metrics) => pairs[c] = new Pair(candidates[c][0], candidates[c][1], metrics),
+      onScored,
+      signal
+    );
+    return pairs;
+  }
+
+  /**
+   * Computes the metrics of each given pair of entries, without constructing
+   * a Pair for them. The metrics are passed to `onMetrics` with the index of
+   * their pair as they are received from the workers, in no particular order.
+   *
+   * @param onScored Called with the amount of pairs that are scored so far,
+   * every time a batch of pairs is received from a worker.
+   */
+  public async scoreMetrics(
+    candidates: Array<[FileEntry, FileEntry]>,
+    onMetrics: (index: number, metrics: PairMetrics) => void,
+    onScored?: (count: number) => void,
+    signal?: AbortSignal
+  ): Promise<void> {
+    signal?.throwIfAborted();
+    const frozen = this.index.freeze();
+    const fingerprints = this.index.sharedFingerprints();
+    const ignored = new Uint8Array(fingerprints.length);
+    for (let slot = 0; slot < fingerprints.length; slot++) {
+      assert(frozen.hash(slot) === fingerprints[slot].hash, "Fingerprints do not match the frozen index");
+      ignored[slot] = fingerprints[slot].ignored ? 1 : 0;
+    }
+
+    const positions = new Uint32Array(2 * candidates.length);
+    for (let c = 0; c < candidates.length; c++) {
+      positions[2 * c] = frozen.position(candidates[c][0].file)!;
+      positions[2 * c + 1] = frozen.position(candidates[c][1].file)!;
+    }
+
+    const data = {
+      kgramOffsets: PairScorer.shared(Uint32Array, frozen.kgramOffsets),
+      kgramSlots: PairScorer.shared(Int32Array, frozen.kgramSlots),
+      ignored: PairScorer.shared(Uint8Array, ignored),
+      pairs: PairScorer.shared(Uint32Array, positions),
+    };
+
+    let scored = 0;
+    const workerCount = Math.max(1, Math.min(this.size, candidates.length));
+    const shardSize = Math.ceil(candidates.length / workerCount);
+    const workers: Array<Worker> = [];
+    const run = (from: number, to: number): Promise<void> => new Promise((resolve, reject) => {
+      const workerData: PairScorerWorkerData = { ...data, from, to };
+      const worker = new Worker(new URL("./pairScorerWorker.js", import.meta.url), { workerData });
+      workers.push(worker);
+      worker.on("message", ({ records }: PairScorerRecords) => {
+        for (let r = 0; r < records.length; r += PairScorer.recordSize) {
+          onMetrics(records[r], {
+            leftCovered: records[r + 1],
+            rightCovered: records[r + 2],
+            longest: records[r + 3],
+          });
+        }
+        scored += records.length / PairScorer.recordSize;
+        onScored?.(scored);
+      });
+      worker.on("error", reject);
+      worker.on("exit", code => {
+        if (code === 0) {
+          resolve();
+        } else {
+          reject(new Error(`Pair scoring worker stopped with exit code ${code}`));
+        }
+      });
+    });
+
+    const shards = [];
+    for (let from = 0; from < candidates.length; from += shardSize) {
+      shards.push(run(from, Math.min(from + shardSize, candidates.length)));
+    }
+    try {
+      await raceAbort(Promise.all(shards), signal);
+    } finally {
+      await Promise.all(workers.map(w => w.terminate()));
+    }
+  }
+}
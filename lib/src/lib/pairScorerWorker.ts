@@ -0,0 +1,60 @@
+import { parentPort, workerData } from "node:worker_threads";
+import { Kgram, Pair } from "@dodona/dolos-core";
+import { PairScorer, PairScorerRecords, PairScorerWorkerData } from "./pairScorer.js";
+
+// Entry point of the worker threads of a PairScorer.
+
+const batchSize = 1024;
+const { kgramOffsets, kgramSlots, ignored, pairs, from, to } = workerData as PairScorerWorkerData;
+
+// The last pair in which each fingerprint slot was seen in the right and left file
+const inRight = new Int32Array(ignored.length).fill(-1);
+const inLeft = new Int32Array(ignored.length).fill(-1);
+
+let records = new Uint32Array(PairScorer.recordSize * batchSize);
+let length = 0;
+const flush = (): void => {
+  const message: PairScorerRecords = { records: records.subarray(0, length) };
+  parentPort?.postMessage(message, [records.buffer]);
+  records = new Uint32Array(PairScorer.recordSize * batchSize);
+  length = 0;
+};
+
+for (let c = from; c < to; c++) {
+  const left = pairs[2 * c];
+  const right = pairs[2 * c + 1];
+
+  for (let k = kgramOffsets[right]; k < kgramOffsets[right + 1]; k++) {
+    if (!ignored[kgramSlots[k]]) {
+      inRight[kgramSlots[k]] = c;
+    }
+  }
+
+  // The kgrams of both files with a fingerprint occurring in the other file
+  const leftKgrams: Kgram[] = [];
+  for (let k = kgramOffsets[left]; k < kgramOffsets[left + 1]; k++) {
+    const slot = kgramSlots[k];
+    if (inRight[slot] === c && !ignored[slot]) {
+      leftKgrams.push({ hash: slot, index: k - kgramOffsets[left] });
+      inLeft[slot] = c;
+    }
+  }
+  const rightKgrams: Kgram[] = [];
+  for (let k = kgramOffsets[right]; k < kgramOffsets[right + 1]; k++) {
+    if (inLeft[kgramSlots[k]] === c) {
+      rightKgrams.push({ hash: kgramSlots[k], index: k - kgramOffsets[right] });
+    }
+  }
+
+  records[length] = c;
+  records[length + 1] = leftKgrams.length;
+  records[length + 2] = rightKgrams.length;
+  records[length + 3] = Pair.longestCommonSubstring(leftKgrams, rightKgrams);
+  length += PairScorer.recordSize;
+  if (length === records.length) {
+    flush();
+  }
+}
+if (length > 0) {
+  flush();
+}
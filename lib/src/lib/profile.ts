@@ -0,0 +1,171 @@
+import { performance } from "node:perf_hooks";
+import { ProgressEvent, ProgressStage } from "./progress.js";
+
+export const phases = [
+  "read",
+  "detectLanguage",
+  "tokenize",
+  "index",
+  "scorePairs",
+  "buildFragments",
+  "writeReport",
+] as const;
+
+export type Phase = typeof phases[number];
+
+export interface ProfileCounters {
+  files: number;
+  tokens: number;
+  kgrams: number;
+  fingerprints: number;
+  ignoredFingerprints: number;
+  // The highest used heap (in bytes) while a phase was running
+  peakHeap: number;
+}
+
+/**
+ * The timings (in milliseconds) and counters of a profile, as included in the
+ * metadata of a report. Fragments are only built when pairs are shown in the
+ * terminal, so the time to build them is not included.
+ */
+export interface ProfileData {
+  readTime: number;
+  detectLanguageTime: number;
+  tokenizeTime: number;
+  indexTime: number;
+  scorePairsTime: number;
+  writeReportTime: number;
+  fileCount: number;
+  tokenCount: number;
+  kgramCount: number;
+  fingerprintCount: number;
+  ignoredFingerprintCount: number;
+  peakHeap: number;
+}
+
+/**
+ * Callbacks to collect the profile of an analysis while it runs, see
+ * `new Dolos(options, hooks)`.
+ */
+export interface ProfileHooks {
+  phaseStarted?(phase: Phase): void;
+  // The duration is in milliseconds
+  phaseEnded?(phase: Phase, duration: number, counters: ProfileCounters): void;
+  progress?(event: ProgressEvent): void;
+}
+
+/**
+ * Records how long each phase of an analysis takes, and counters of the
+ * amount of data that was processed. A phase can be timed multiple times
+ * (e.g. when files are tokenized in batches), its durations are summed.
+ * Phases can overlap: pairs are scored lazily, possibly while the report is
+ * being written.
+ *
+ * The used heap is sampled at the start and end of each phase, and every
+ * `heapSampleInterval` milliseconds while a phase is running.
+ */
+export class Profile {
+
+  public static readonly heapSampleInterval = 50;
+
+  public readonly durations: Record<Phase, number> =
+    Object.fromEntries(phases.map(phase => [phase, 0])) as Record<Phase, number>;
+
+  public readonly counters: ProfileCounters = {
+    files: 0,
+    tokens: 0,
+    kgrams: 0,
+    fingerprints: 0,
+    ignoredFingerprints: 0,
+    peakHeap: 0,
+  };
+
+  // The start times of the running phases
+  private readonly started = new Map<Phase, number>();
+  private sampler: ReturnType<typeof setInterval> | null = null;
+
+  constructor(private readonly hooks: ProfileHooks = {}) {}
+
+  public start(phase: Phase): void {
+    this.started.set(phase, performance.now());
+    this.sampleHeap();
+    if (this.sampler === null) {
+      this.sampler = setInterval(() => this.sampleHeap(), Profile.heapSampleInterval);
+      // A phase that is never ended does not keep the process alive
+      this.sampler.unref();
+    }
+    this.hooks.phaseStarted?.(phase);
+  }
+
+  public end(phase: Phase): void {
+    const start = this.started.get(phase);
+    if (start === undefined) {
+      throw new Error(`Phase ${phase} was not started`);
+    }
+    this.started.delete(phase);
+    const duration = performance.now() - start;
+    this.durations[phase] += duration;
+    this.sampleHeap();
+    if (this.started.size === 0 && this.sampler !== null) {
+      clearInterval(this.sampler);
+      this.sampler = null;
+    }
+    this.hooks.phaseEnded?.(phase, duration, this.counters);
+  }
+
+  private sampleHeap(): void {
+    this.counters.peakHeap = Math.max(this.counters.peakHeap, process.memoryUsage().heapUsed);
+  }
+
+  /**
+   * Reports the progress of a stage to the hooks.
+   */
+  public progress(stage: ProgressStage, done: number, total: number): void {
+    this.hooks.progress?.({ stage, done, total });
+  }
+
+  public async time<T>(phase: Phase, run: () => Promise<T>): Promise<T> {
+    this.start(phase);
+    try {
+      return await run();
+    } finally {
+      this.end(phase);
+    }
+  }
+
+  public timeSync<T>(phase: Phase, run: () => T): T {
+    this.start(phase);
+    try {
+      return run();
+    } finally {
+      this.end(phase);
+    }
+  }
+
+  /**
+   * The duration of the given phase so far, including the time since it
+   * started if it is running.
+   */
+  public duration(phase: Phase): number {
+    const start = this.started.get(phase);
+    return this.durations[phase] + (start === undefined ? 0 : performance.now() - start);
+  }
+
+  public asObject(): ProfileData {
+    const time = (phase: Phase): number => Math.round(this.duration(phase) * 1000) / 1000;
+    return {
+      readTime: time("read"),
+      detectLanguageTime: time("detectLanguage"),
+      tokenizeTime: time("tokenize"),
+      indexTime: time("index"),
+      scorePairsTime: time("scorePairs"),
+      writeReportTime: time("writeReport"),
+      fileCount: this.counters.files,
+      tokenCount: this.counters.tokens,
+      kgramCount: this.counters.kgrams,
+      fingerprintCount: this.counters.fingerprints,
+      ignoredFingerprintCount: this.counters.ignoredFingerprints,
+      peakHeap: this.counters.peakHeap,
+    };
+  }
+}
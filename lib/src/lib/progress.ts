@@ -0,0 +1,91 @@
+export type ProgressStage = "read" | "tokenize" | "index" | "score";
+
+/**
+ * The amount of files (or pairs, when scoring) of a stage of an analysis that
+ * are done.
+ */
+export interface ProgressEvent {
+  stage: ProgressStage;
+  done: number;
+  total: number;
+}
+
+/**
+ * An async iterator of the progress events of an analysis, see
+ * `Dolos.progress()`. Events are buffered until they are read, the iterator
+ * ends when the analysis is done (or failed).
+ */
+export class ProgressStream implements AsyncIterableIterator<ProgressEvent> {
+
+  private readonly queue: Array<ProgressEvent> = [];
+  private waiting: ((result: IteratorResult<ProgressEvent>) => void) | null = null;
+  private ended = false;
+
+  public push(event: ProgressEvent): void {
+    if (this.ended) {
+      return;
+    }
+    if (this.waiting) {
+      this.waiting({ done: false, value: event });
+      this.waiting = null;
+    } else {
+      this.queue.push(event);
+    }
+  }
+
+  public end(): void {
+    this.ended = true;
+    if (this.waiting) {
+      this.waiting({ done: true, value: undefined });
+      this.waiting = null;
+    }
+  }
+
+  public get isEnded(): boolean {
+    return this.ended;
+  }
+
+  public next(): Promise<IteratorResult<ProgressEvent>> {
+    const event = this.queue.shift();
+    if (event !== undefined) {
+      return Promise.resolve({ done: false, value: event });
+    } else if (this.ended) {
+      return Promise.resolve({ done: true, value: undefined });
+    }
+    return new Promise(resolve => this.waiting = resolve);
+  }
+
+  public return(): Promise<IteratorResult<ProgressEvent>> {
+    this.queue.length = 0;
+    this.end();
+    return Promise.resolve({ done: true, value: undefined });
+  }
+
+  [Symbol.asyncIterator](): AsyncIterableIterator<ProgressEvent> {
+    return this;
+  }
+}
+
+/**
+ * Waits for the given work, but rejects with the reason of the signal as soon
+ * as it is aborted. The work itself is not stopped: the caller should clean
+ * up (e.g. terminate its workers) when this rejects.
+ */
+export async function raceAbort<T>(work: Promise<T>, signal?: AbortSignal): Promise<T> {
+  if (!signal) {
+    return await work;
+  }
+  // The work may still fail after the abort, which is not an unhandled error
+  work.catch(() => undefined);
+  signal.throwIfAborted();
+  let onAbort = (): void => undefined;
+  const aborted = new Promise<never>((_, reject) => {
+    onAbort = () => reject(signal.reason);
+    signal.addEventListener("abort", onAbort, { once: true });
+  });
+  try {
+    return await Promise.race([work, aborted]);
+  } finally {
+    signal.removeEventListener("abort", onAbort);
+  }
+}
@@ -11,7 +11,8 @@ import fs from "fs/promises";
 export async function readFiles(
   locations: Array<string>
 ): Promise<Result<Array<File>>> {
-  return Result.all(locations.map(location => readPath(location)));
+  const results = await mapLimit(locations, maxOpenFiles, location => readPath(location));
+  return Result.all(results.map(result => Promise.resolve(result)));
 }
 
 /**
@@ -28,3 +29,29 @@ export async function readPath(location: string, extra?: ExtraInfo): Promise<Res
     )
   );
 }
+
+/**
+ * The maximum amount of files that are read at the same time.
+ */
+export const maxOpenFiles = 64;
+
+/**
+ * Applies the asynchronous function to every item, with at most `limit`
+ * calls running at the same time. The results are in the order of the items.
+ */
+export async function mapLimit<T, R>(
+  items: Array<T>,
+  limit: number,
+  f: (item: T) => Promise<R>
+): Promise<Array<R>> {
+  const results = new Array<R>(items.length);
+  let next = 0;
+  const run = async (): Promise<void> => {
+    while (next < items.length) {
+      const i = next++;
+      results[i] = await f(items[i]);
+    }
+  };
+  await Promise.all(Array.from({ length: Math.min(limit, items.length) }, run));
+  return results;
+}
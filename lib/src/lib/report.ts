@@ -1,8 +1,18 @@
-import { TokenizedFile, FingerprintIndex, Pair, SharedFingerprint, FileEntry } from "@dodona/dolos-core";
+import {
+  BoundedHeap,
+  FileEntry,
+  FingerprintIndex,
+  Pair,
+  PairMetrics,
+  SharedFingerprint,
+  TokenizedFile,
+} from "@dodona/dolos-core";
 import { DolosOptions, Options } from "./options.js";
+import { PairScorer } from "./pairScorer.js";
 import { Language } from "./language.js";
+import { Profile, ProfileData } from "./profile.js";
 
-export interface Metadata extends DolosOptions {
+export interface Metadata extends DolosOptions, ProfileData {
   languageDetected: boolean;
   createdAt: string;
   warnings: string[];
@@ -10,7 +20,8 @@ export interface Metadata extends DolosOptions {
 
 export class Report {
 
-  private pairs: Array<Pair> = [];
+  // The pairs returned by allPairs, once they are computed
+  private pairs: Array<Pair> | null = null;
 
   public readonly name: string;
   public readonly createdAt: string = new Date().toISOString();
@@ -22,6 +33,7 @@ export class Report {
     public readonly index: FingerprintIndex,
     name?: string,
     public readonly warnings: string[] = [],
+    public readonly profile: Profile = new Profile(),
   ) {
     if (this.options.reportName) {
       this.name = this.options.reportName;
@@ -34,17 +46,174 @@ export class Report {
     return this.index.getPair(file1, file2);
   }
 
+  /**
+   * Returns the pairs of this report sorted by the `sortBy` option.
+   *
+   * If `limitResults` is set, only that amount of best pairs is returned
+   * (see `topPairs`). Pairs with a similarity below `minSimilarity` are left
+   * out.
+   *
+   * When the files were compared against an index (the `against` option),
+   * only the pairs of the files of this report are returned (see
+   * `queryPairs`).
+   */
   public allPairs(): Array<Pair> {
-    if (this.pairs.length === 0) {
-      this.pairs = this.index.allPairs(this.options.sortBy);
+    if (this.pairs === null) {
+      const limit = this.options.limitResults;
+      const pairs = this.profile.timeSync("scorePairs", () => {
+        if (this.options.against) {
+          return this.queryPairs();
+        } else if (limit != null) {
+          return this.topPairs(limit);
+        }
+        return this.index.allPairs(
+          this.options.sortBy,
+          this.options.minSharedFingerprints,
+          this.options.minSimilarity
+        );
+      });
+      this.profile.progress("score", pairs.length, pairs.length);
+      this.pairs = pairs;
     }
     return this.pairs;
   }
 
+  /**
+   * Returns the best pairs of each of the given files with all other files
+   * in the index, sorted by the `sortBy` option. Other pairs of files in the
+   * index are not computed. A pair of two of the given files is only included
+   * once.
+   *
+   * @param files The files to return the pairs of, defaults to the files of
+   * this report.
+   * @param k The maximum amount of pairs per file, defaults to `limitResults`
+   * (all pairs if it is not set).
+   */
+  public queryPairs(
+    files: Array<TokenizedFile> = this.files,
+    k: number = this.options.limitResults ?? Infinity
+  ): Array<Pair> {
+    const pairs: Array<Pair> = [];
+    const seen = new Set<string>();
+    for (const file of files) {
+      const top = this.index.topPairsOf(
+        file,
+        k,
+        this.options.sortBy,
+        this.options.minSimilarity,
+        this.options.minSharedFingerprints
+      );
+      for (const pair of top) {
+        const { id: left } = pair.leftFile;
+        const { id: right } = pair.rightFile;
+        const key = left < right ? `${left}-${right}` : `${right}-${left}`;
+        if (!seen.has(key)) {
+          seen.add(key);
+          pairs.push(pair);
+        }
+      }
+    }
+    return FingerprintIndex.sortPairs(pairs, this.options.sortBy);
+  }
+
+  /**
+   * Computes the pairs returned by `allPairs` using the given amount of worker
+   * threads (see PairScorer). This freezes the index of this report.
+   *
+   * If `limitResults` is set, only the metrics of the best pairs are kept
+   * while scoring, and only those are turned into Pairs.
+   *
+   * @param workers The amount of worker threads, defaults to the `workers`
+   * option.
+   * @param signal Stops scoring the pairs when aborted.
+   */
+  public async scorePairs(workers = this.options.workers, signal?: AbortSignal): Promise<Array<Pair>> {
+    const pairs = await this.profile.time("scorePairs", async () => {
+      const candidates = this.index.candidatePairs(
+        this.options.minSharedFingerprints,
+        this.options.minSimilarity
+      );
+      this.profile.progress("score", 0, candidates.length);
+      const scorer = new PairScorer(this.index, workers);
+      const onScored = (count: number): void => this.profile.progress("score", count, candidates.length);
+
+      const limit = this.options.limitResults;
+      if (limit == null) {
+        const pairs = await scorer.scorePairs(candidates, onScored, signal);
+        return FingerprintIndex.sortPairs(pairs, this.options.sortBy);
+      }
+
+      // Pairs with an equal score keep the order of the candidates, like sortPairs
+      interface Scored { score: number; index: number; metrics: PairMetrics }
+      const metric = FingerprintIndex.sortMetric(this.options.sortBy);
+      const heap = new BoundedHeap<Scored>(limit, (a, b) => a.score - b.score || b.index - a.index);
+      await scorer.scoreMetrics(candidates, (index, metrics) => {
+        const [left, right] = candidates[index];
+        const score = metric({
+          similarity: Pair.computeSimilarity(left, right, metrics),
+          overlap: metrics.leftCovered + metrics.rightCovered,
+          longest: metrics.longest,
+        });
+        heap.push({ score, index, metrics });
+      }, onScored, signal);
+      return heap.toSortedArray().map(({ index, metrics }) =>
+        new Pair(candidates[index][0], candidates[index][1], metrics)
+      );
+    });
+
+    this.pairs = pairs;
+    return pairs;
+  }
+
+  /**
+   * Returns the `k` best pairs according to the `sortBy` option, with a
+   * similarity of at least `minSimilarity`. Only O(k) pairs are kept in
+   * memory while searching.
+   *
+   * @param k The maximum amount of pairs to return.
+   */
+  public topPairs(k: number): Array<Pair> {
+    return this.index.topPairs(
+      k,
+      this.options.sortBy,
+      this.options.minSimilarity,
+      this.options.minSharedFingerprints
+    );
+  }
+
+  /**
+   * Lazily yields the (unsorted) pairs with a similarity of at least
+   * `minSimilarity`, without retaining them.
+   *
+   * @param minSimilarity The minimum similarity, defaults to the
+   * `minSimilarity` option.
+   */
+  public pairsAbove(minSimilarity = this.options.minSimilarity): Generator<Pair> {
+    return this.index.pairsAbove(minSimilarity, this.options.minSharedFingerprints);
+  }
+
+  /**
+   * Lazily yields the pairs of `allPairs`, without retaining them when all
+   * pairs above `minSimilarity` are requested. These pairs are not sorted.
+   * When `limitResults` or `against` is set, or the pairs were already
+   * computed, the (sorted) pairs of `allPairs` are yielded instead.
+   */
+  public *iteratePairs(): Generator<Pair> {
+    if (this.pairs !== null || this.options.against || this.options.limitResults != null) {
+      yield* this.allPairs();
+    } else {
+      yield* this.pairsAbove();
+    }
+  }
+
   public sharedFingerprints(): Array<SharedFingerprint> {
     return this.index.sharedFingerprints();
   }
 
+  public iterateSharedFingerprints(): IterableIterator<SharedFingerprint> {
+    return this.index.iterateSharedFingerprints();
+  }
+
   public entries(): Array<FileEntry> {
     return this.index.entries();
   }
@@ -61,6 +230,7 @@ export class Report {
       language: this.language?.name ?? null,
       languageDetected: this.options.language == undefined,
       warnings: this.warnings,
+      ...this.profile.asObject(),
     };
   }
 }
@@ -0,0 +1,89 @@
+import { closeSync, mkdtempSync, openSync, readSync, rmSync, writeSync } from "node:fs";
+import { tmpdir } from "node:os";
+import path from "node:path";
+import { TokenizedFile } from "@dodona/dolos-core";
+
+/**
+ * A temporary file to offload the tokens and mappings of tokenized files to,
+ * so they do not stay in memory after the files have been added to an index
+ * (see TokenizedFile.offload).
+ *
+ * The tokens of a file are appended as its token ids followed by its packed
+ * regions (as unsigned 32-bit integers in the byte order of the machine), and
+ * are read back on demand. The temporary file is removed when the spill is
+ * closed, or when the process exits.
+ */
+export class TokenSpill {
+
+  private readonly directory: string;
+  private fd: number | null;
+  private position = 0;
+  private readonly cleanup = (): void => this.close();
+
+  constructor() {
+    this.directory = mkdtempSync(path.join(tmpdir(), "dolos-tokens-"));
+    this.fd = openSync(path.join(this.directory, "tokens"), "w+");
+    process.once("exit", this.cleanup);
+  }
+
+  private write(array: Uint32Array): void {
+    const bytes = new Uint8Array(array.buffer, array.byteOffset, array.byteLength);
+    let written = 0;
+    while (written < bytes.length) {
+      written += writeSync(this.fd!, bytes, written, bytes.length - written, this.position + written);
+    }
+    this.position += bytes.length;
+  }
+
+  private read(position: number, array: Uint32Array): void {
+    const bytes = new Uint8Array(array.buffer, array.byteOffset, array.byteLength);
+    let read = 0;
+    while (read < bytes.length) {
+      const bytesRead = readSync(this.fd!, bytes, read, bytes.length - read, position + read);
+      if (bytesRead === 0) {
+        throw new Error("Unexpected end of the offloaded tokens");
+      }
+      read += bytesRead;
+    }
+  }
+
+  /**
+   * Writes the tokens and mapping of the given file to the spill file and
+   * removes them from memory. Files created from token strings are kept in
+   * memory.
+   */
+  public offload(file: TokenizedFile): void {
+    if (file.isOffloaded || file.tokenIds === null) {
+      return;
+    }
+    const count = file.tokenCount;
+    const idsPosition = this.position;
+    const mappingPosition = idsPosition + 4 * count;
+    this.write(file.tokenIds);
+    this.write(file.packedMapping);
+    file.offload({
+      readIds: (start, end) => {
+        const ids = new Uint32Array(end - start);
+        this.read(idsPosition + 4 * start, ids);
+        return ids;
+      },
+      readMapping: (start, end) => {
+        const mapping = new Uint32Array(4 * (end - start));
+        this.read(mappingPosition + 16 * start, mapping);
+        return mapping;
+      },
+    });
+  }
+
+  /**
+   * Removes the spill file, the offloaded files can no longer be read.
+   */
+  public close(): void {
+    if (this.fd !== null) {
+      closeSync(this.fd);
+      this.fd = null;
+      rmSync(this.directory, { recursive: true, force: true });
+      process.removeListener("exit", this.cleanup);
+    }
+  }
+}
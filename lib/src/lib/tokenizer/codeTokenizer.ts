@@ -1,6 +1,7 @@
-import { default as Parser, SyntaxNode } from "tree-sitter";
+import { createHash } from "node:crypto";
+import { default as Parser, Tree, TreeCursor } from "tree-sitter";
 import { Region } from "@dodona/dolos-core";
-import { Token, Tokenizer, TokenizerOptions } from "./tokenizer.js";
+import { Token, TokenBuffer, Tokenizer, TokenizerOptions } from "./tokenizer.js";
 import { ProgrammingLanguage } from "../language.js";
 
 export class CodeTokenizer extends Tokenizer {
@@ -20,6 +21,18 @@ export class CodeTokenizer extends Tokenizer {
     this.parser.setLanguage(language.getLanguageModule());
   }
 
+  /**
+   * A hash of the node types of the grammar, which change when the grammar is
+   * updated. Grammars without node type info (e.g. some custom packages) are
+   * identified by the names of their node types and fields instead, which
+   * tree-sitter reads from the compiled grammar when it is set on a parser.
+   */
+  get grammarVersion(): string {
+    const module = (this.language as ProgrammingLanguage).getLanguageModule();
+    const nodeTypes = module.nodeTypeInfo ?? [module.nodeTypeNamesById, module.nodeFieldNamesById];
+    return createHash("sha256").update(JSON.stringify(nodeTypes)).digest("hex");
+  }
+
   /**
    * Runs the parser on a given string. Returns a stringified version of the
    * abstract syntax tree.
@@ -27,8 +40,11 @@ export class CodeTokenizer extends Tokenizer {
    * @param text The text string to parse
    */
   public tokenize(text: string): string {
-    const tree = this.parser.parse(text, undefined, { bufferSize: Math.max(32 * 1024, text.length * 2) });
-    return tree.rootNode.toString();
+    return this.parse(text).rootNode.toString();
+  }
+
+  private parse(text: string): Tree {
+    return this.parser.parse(text, undefined, { bufferSize: Math.max(32 * 1024, text.length * 2) });
   }
 
   /**
@@ -39,50 +55,91 @@ export class CodeTokenizer extends Tokenizer {
    * @param text The text string to parse
    */
   public generateTokens(text: string): Token[] {
-    const tree = this.parser.parse(text, undefined, { bufferSize: Math.max(32 * 1024, text.length * 2) });
-    const tokens: Token[] = [];
-    this.tokenizeNode(tree.rootNode, tokens);
+    const table = this.language.tokenTable;
+    const [ids, regions] = this.tokenizePacked(text);
+    const tokens = new Array<Token>(ids.length);
+    for (let i = 0; i < ids.length; i++) {
+      const location = new Region(regions[4 * i], regions[4 * i + 1], regions[4 * i + 2], regions[4 * i + 3]);
+      tokens[i] = this.newToken(table.token(ids[i]), location);
+    }
     return tokens;
   }
 
+  public tokenizePacked(text: string): [Uint32Array, Uint32Array] {
+    return this.tokenizeTree(this.parse(text).walk());
+  }
+
   /**
-   * Tokenizes the given node and its child nodes. It will create a list of Tokens
-   * containing the stringified version of the token and the corresponding position.
+   * Tokenizes the tree of the given cursor, without recursion so deeply nested
+   * trees do not overflow the stack. Returns the ids of the tokens in the token
+   * table of the language and their packed regions.
    *
-   * @param node The node (and child nodes) that will be tokenized.
-   * @param tokens A list of tokens that will be filled during the execution of the function
-   * @returns A tuple `(startRow, startCol)`, It represents
-   * the starting position of the given tokenized node.
+   * Every named node results in the tokens "(", its type and ")", unless it is
+   * a comment and comments are not included. These three tokens share the
+   * region of the node, which ends at the start of its first named child if
+   * the code of the node is (partly) captured by its children.
    */
-  private tokenizeNode(node: SyntaxNode, tokens: Token[]): [number,number]{
-    const location = new Region(
-      node.startPosition.row,
-      node.startPosition.column,
-      node.endPosition.row,
-      node.endPosition.column
-    );
+  private tokenizeTree(cursor: TreeCursor): [Uint32Array, Uint32Array] {
+    const table = this.language.tokenTable;
+    const buffer = new TokenBuffer();
+    // Per node on the path from the root to the current node: the index of
+    // its "(" token (or -1 if it is not included) and its region
+    const stack: number[] = [];
 
-    const includeToken = !node.type.includes("comment") || this.options.includeComments;
-    if (includeToken) {
-      tokens.push(this.newToken("(", location));
-      tokens.push(this.newToken(node.type, location));
-    }
-    for (const child of node.namedChildren) {
+    for (;;) {
+      // Enter the named node of the cursor
+      const start = cursor.startPosition;
+      const end = cursor.endPosition;
+      let open = -1;
+      if (!cursor.nodeType.includes("comment") || this.options.includeComments) {
+        open = buffer.push(table.intern("("), start.row, start.column, end.row, end.column);
+        buffer.push(table.intern(cursor.nodeType), start.row, start.column, end.row, end.column);
+      }
+      stack.push(open, start.row, start.column, end.row, end.column);
+      if (cursor.gotoFirstChild()) {
+        if (cursor.nodeIsNamed || CodeTokenizer.gotoNextNamedSibling(cursor)) {
+          continue;
+        }
+        cursor.gotoParent();
+      }
 
-      const [childStartRow, childStartCol] = this.tokenizeNode(child, tokens);
+      // Leave nodes until one of them has a next named sibling
+      for (;;) {
+        const top = stack.length - 5;
+        const index = stack[top];
+        const startRow = stack[top + 1], startCol = stack[top + 2];
+        const endRow = stack[top + 3], endCol = stack[top + 4];
+        stack.length = top;
+        if (index >= 0) {
+          buffer.setRegion(index, startRow, startCol, endRow, endCol);
+          buffer.setRegion(index + 1, startRow, startCol, endRow, endCol);
+          buffer.push(table.intern(")"), startRow, startCol, endRow, endCol);
+        }
+        if (top === 0) {
+          return buffer.finish();
+        }
 
-      // If the code is already captured in one of the children, the region of the current node can be shortened.
-      if ((childStartRow < location.endRow) || (childStartRow === location.endRow && childStartCol < location.endCol)) {
-        location.endRow = childStartRow;
-        location.endCol = childStartCol;
+        // If the code is already captured in one of the children, the region of the parent can be shortened.
+        const parentEndRow = stack[top - 2];
+        if (startRow < parentEndRow || (startRow === parentEndRow && startCol < stack[top - 1])) {
+          stack[top - 2] = startRow;
+          stack[top - 1] = startCol;
+        }
+
+        if (CodeTokenizer.gotoNextNamedSibling(cursor)) {
+          break;
+        }
+        cursor.gotoParent();
       }
     }
+  }
 
-    if (includeToken) {
-      tokens.push(this.newToken(")", location));
+  private static gotoNextNamedSibling(cursor: TreeCursor): boolean {
+    while (cursor.gotoNextSibling()) {
+      if (cursor.nodeIsNamed) {
+        return true;
+      }
     }
-
-    // Also return the startRow and startCol, this can be used by the parent node.
-    return [location.startRow, location.startCol];
+    return false;
   }
 }
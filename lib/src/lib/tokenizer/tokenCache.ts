@@ -0,0 +1,294 @@
+import { createHash } from "node:crypto";
+import { mkdir, readdir, readFile, rename, stat, unlink, utimes, writeFile } from "node:fs/promises";
+import path from "node:path";
+import { File, TokenizedFile } from "@dodona/dolos-core";
+import { Language } from "../language.js";
+import { mapLimit, maxOpenFiles } from "../reader.js";
+import { Tokenizer } from "./tokenizer.js";
+
+/**
+ * A persistent cache of tokenized files in a directory on disk, so files that
+ * did not change since a previous run do not need to be parsed again.
+ *
+ * Entries are keyed by a hash of the content of the file, the language, the
+ * grammar version of the tokenizer and whether comments are included. Each
+ * entry is stored in its own file with the following binary format (all
+ * numbers are little-endian unsigned 32-bit integers):
+ *
+ *   magic "DTC1" | symbol count | (byte length | UTF-8 bytes) per symbol
+ *   | token count | symbol index per token
+ *   | (startRow, startCol, endRow, endCol) per token
+ *
+ * The modification time of an entry is updated when it is read, so `prune`
+ * can evict the least recently used entries when the cache grows larger than
+ * its maximum size. The estimated total size of the entries is kept in a
+ * manifest file, so the cache directory is only scanned when the estimate
+ * exceeds the maximum size.
+ */
+export class TokenCache {
+
+  // Change when the tokens produced by the tokenizers change
+  public static readonly version = 1;
+  public static readonly defaultMaxSize = 512 * 1024 * 1024;
+
+  private static readonly magic = 0x31435444; // "DTC1"
+  private static readonly extension = ".tokens";
+  private static readonly manifest = "size.json";
+
+  private readonly keyPrefix: string;
+
+  /**
+   * @param directory The directory to store the cache in, created if needed
+   * @param tokenizer The tokenizer the cached files are tokenized with
+   * @param maxSize The maximum total size of the cache in bytes
+   */
+  constructor(
+    public readonly directory: string,
+    private readonly tokenizer: Tokenizer,
+    public readonly maxSize: number = TokenCache.defaultMaxSize
+  ) {
+    this.keyPrefix = [
+      TokenCache.version,
+      tokenizer.language.name,
+      tokenizer.grammarVersion,
+      tokenizer.includeComments,
+    ].join("\0");
+  }
+
+  private get language(): Language {
+    return this.tokenizer.language;
+  }
+
+  public key(file: File): string {
+    return createHash("sha256")
+      .update(this.keyPrefix)
+      .update("\0")
+      .update(file.content)
+      .digest("hex");
+  }
+
+  private entryPath(key: string): string {
+    return path.join(this.directory, key.slice(0, 2), key + TokenCache.extension);
+  }
+
+  /**
+   * Returns the cached tokens of the given file, or null if the file is not in
+   * the cache or its entry could not be read.
+   */
+  public async get(file: File): Promise<TokenizedFile | null> {
+    const entry = this.entryPath(this.key(file));
+    let buffer;
+    try {
+      buffer = await readFile(entry);
+    } catch {
+      return null;
+    }
+    const tokenized = this.decode(file, buffer);
+    if (tokenized !== null) {
+      const now = new Date();
+      await utimes(entry, now, now).catch(() => undefined);
+    }
+    return tokenized;
+  }
+
+  /**
+   * Stores the tokens of the given file in the cache and returns the size of
+   * its entry in bytes. The entry is written to a temporary file first, so
+   * concurrent runs never read a partial entry.
+   */
+  public async set(tokenized: TokenizedFile): Promise<number> {
+    const entry = this.entryPath(this.key(tokenized));
+    await mkdir(path.dirname(entry), { recursive: true });
+    const bytes = this.encode(tokenized);
+    await this.writeAtomically(entry, bytes);
+    return bytes.length;
+  }
+
+  private async writeAtomically(file: string, data: Uint8Array | string): Promise<void> {
+    const temporary = `${file}.${process.pid}.tmp`;
+    await writeFile(temporary, data);
+    await rename(temporary, file);
+  }
+
+  /**
+   * Tokenizes the given files, using the cached tokens of the files that are in
+   * the cache. The files that were not cached are tokenized with `tokenize`
+   * and added to the cache. At most `maxOpenFiles` entries are read or
+   * written at the same time.
+   */
+  public async tokenizeFiles(
+    files: Array<File>,
+    tokenize: (files: Array<File>) => Promise<Array<TokenizedFile>>
+  ): Promise<Array<TokenizedFile>> {
+    const results = await mapLimit(files, maxOpenFiles, f => this.get(f));
+    const missing = [];
+    for (let i = 0; i < files.length; i++) {
+      if (results[i] === null) {
+        missing.push(i);
+      }
+    }
+    if (missing.length > 0) {
+      const tokenized = await tokenize(missing.map(i => files[i]));
+      for (let j = 0; j < missing.length; j++) {
+        results[missing[j]] = tokenized[j];
+      }
+      const sizes = await mapLimit(tokenized, maxOpenFiles, f => this.set(f));
+      await this.grow(sizes.reduce((sum, size) => sum + size, 0));
+    }
+    return results as Array<TokenizedFile>;
+  }
+
+  /**
+   * Adds the given number of bytes to the estimated size of the cache, and
+   * prunes the cache if the estimate is unknown or exceeds the maximum size.
+   * The estimate only grows between two prunes (an overwritten entry is
+   * counted twice), so the cache is pruned too early rather than too late.
+   */
+  private async grow(bytes: number): Promise<void> {
+    const estimate = await this.readSize();
+    if (estimate === null || estimate + bytes > this.maxSize) {
+      await this.prune();
+    } else {
+      await this.writeSize(estimate + bytes);
+    }
+  }
+
+  private async readSize(): Promise<number | null> {
+    try {
+      const { size } = JSON.parse(await readFile(path.join(this.directory, TokenCache.manifest), "utf8"));
+      return typeof size === "number" && size >= 0 ? size : null;
+    } catch {
+      return null;
+    }
+  }
+
+  private async writeSize(size: number): Promise<void> {
+    await this.writeAtomically(path.join(this.directory, TokenCache.manifest), JSON.stringify({ size }));
+  }
+
+  /**
+   * Removes the least recently used entries until the total size of the cache
+   * is at most its maximum size, and records the remaining size in the
+   * manifest.
+   */
+  public async prune(): Promise<void> {
+    const entries: Array<{ path: string, size: number, used: number }> = [];
+    for (const dir of await readdir(this.directory)) {
+      let names;
+      try {
+        names = await readdir(path.join(this.directory, dir));
+      } catch {
+        continue;
+      }
+      for (const name of names.filter(n => n.endsWith(TokenCache.extension))) {
+        const entry = path.join(this.directory, dir, name);
+        const stats = await stat(entry).catch(() => null);
+        if (stats !== null) {
+          entries.push({ path: entry, size: stats.size, used: stats.mtimeMs });
+        }
+      }
+    }
+
+    let total = entries.reduce((sum, e) => sum + e.size, 0);
+    entries.sort((a, b) => a.used - b.used);
+    for (const entry of entries) {
+      if (total <= this.maxSize) {
+        break;
+      }
+      await unlink(entry.path).catch(() => undefined);
+      total -= entry.size;
+    }
+    await this.writeSize(total);
+  }
+
+  private encode(tokenized: TokenizedFile): Uint8Array {
+    const table = this.language.tokenTable;
+    const count = tokenized.tokenCount;
+    const ids = tokenized.tokenIds ?? Uint32Array.from(tokenized.decodeTokens(), t => table.intern(t));
+
+    // Only store the symbols that occur in this file
+    const symbolIndex = new Map<number, number>();
+    const indices = new Uint32Array(count);
+    for (let i = 0; i < count; i++) {
+      let index = symbolIndex.get(ids[i]);
+      if (index === undefined) {
+        index = symbolIndex.size;
+        symbolIndex.set(ids[i], index);
+      }
+      indices[i] = index;
+    }
+    const encoder = new TextEncoder();
+    const symbols = Array.from(symbolIndex.keys(), id => encoder.encode(table.token(id)));
+
+    const symbolBytes = symbols.reduce((sum, s) => sum + 4 + s.length, 0);
+    const buffer = new ArrayBuffer(4 + 4 + symbolBytes + 4 + 4 * count + 16 * count);
+    const view = new DataView(buffer);
+    const bytes = new Uint8Array(buffer);
+    let offset = 0;
+    const writeUint = (value: number): void => {
+      view.setUint32(offset, value, true);
+      offset += 4;
+    };
+
+    writeUint(TokenCache.magic);
+    writeUint(symbols.length);
+    for (const symbol of symbols) {
+      writeUint(symbol.length);
+      bytes.set(symbol, offset);
+      offset += symbol.length;
+    }
+    writeUint(count);
+    for (let i = 0; i < count; i++) {
+      writeUint(indices[i]);
+    }
+    for (const value of tokenized.packedMapping) {
+      writeUint(value);
+    }
+    return bytes;
+  }
+
+  private decode(file: File, buffer: Uint8Array): TokenizedFile | null {
+    const view = new DataView(buffer.buffer, buffer.byteOffset, buffer.byteLength);
+    let offset = 0;
+    const readUint = (): number => {
+      const value = view.getUint32(offset, true);
+      offset += 4;
+      return value;
+    };
+
+    try {
+      if (readUint() !== TokenCache.magic) {
+        return null;
+      }
+      const table = this.language.tokenTable;
+      const decoder = new TextDecoder();
+      const ids = new Array<number>(readUint());
+      for (let s = 0; s < ids.length; s++) {
+        const length = readUint();
+        ids[s] = table.intern(decoder.decode(buffer.subarray(offset, offset + length)));
+        offset += length;
+      }
+
+      const count = readUint();
+      if (offset + 20 * count !== buffer.byteLength) {
+        return null;
+      }
+      const tokens = new Uint32Array(count);
+      for (let i = 0; i < count; i++) {
+        const index = readUint();
+        if (index >= ids.length) {
+          return null;
+        }
+        tokens[i] = ids[index];
+      }
+      const mapping = new Uint32Array(4 * count);
+      for (let i = 0; i < mapping.length; i++) {
+        mapping[i] = readUint();
+      }
+      return new TokenizedFile(file, tokens, mapping, table);
+    } catch {
+      // A truncated entry
+      return null;
+    }
+  }
+}
@@ -10,10 +10,65 @@ export type TokenizerOptions = Partial<{
   includeComments: boolean;
 }>
 
+/**
+ * Collects token ids and their regions in growable typed arrays, with the
+ * region of each token packed as four numbers (startRow, startCol, endRow,
+ * endCol) like the packed mapping of a TokenizedFile.
+ */
+export class TokenBuffer {
+  private ids = new Uint32Array(1024);
+  private regions = new Uint32Array(4 * 1024);
+  public length = 0;
+
+  /**
+   * Adds a token and returns its index.
+   */
+  public push(id: number, startRow: number, startCol: number, endRow: number, endCol: number): number {
+    if (this.length === this.ids.length) {
+      const ids = new Uint32Array(2 * this.ids.length);
+      ids.set(this.ids);
+      this.ids = ids;
+      const regions = new Uint32Array(2 * this.regions.length);
+      regions.set(this.regions);
+      this.regions = regions;
+    }
+    this.ids[this.length] = id;
+    this.setRegion(this.length, startRow, startCol, endRow, endCol);
+    return this.length++;
+  }
+
+  public setRegion(index: number, startRow: number, startCol: number, endRow: number, endCol: number): void {
+    const offset = 4 * index;
+    this.regions[offset] = startRow;
+    this.regions[offset + 1] = startCol;
+    this.regions[offset + 2] = endRow;
+    this.regions[offset + 3] = endCol;
+  }
+
+  /**
+   * The token ids and packed regions, trimmed to the amount of tokens.
+   */
+  public finish(): [Uint32Array, Uint32Array] {
+    return [this.ids.slice(0, this.length), this.regions.slice(0, 4 * this.length)];
+  }
+}
+
 export abstract class Tokenizer {
 
   constructor(public readonly language: Language, protected readonly options: TokenizerOptions = {}) {}
 
+  get includeComments(): boolean {
+    return this.options.includeComments === true;
+  }
+
+  /**
+   * Identifies the grammar this tokenizer uses, tokens cached with a different
+   * grammar version are not reused.
+   */
+  get grammarVersion(): string {
+    return this.constructor.name;
+  }
+
   /**
    * Runs the parser on a given string. Returns a list of Tokens
    * containing the stringified version of the token and the
@@ -24,13 +79,29 @@ export abstract class Tokenizer {
   public abstract generateTokens(text:string): Token[];
 
   /**
-   * Returns a tokenized version of the given file.
+   * Tokenizes the given text. Returns the ids of the tokens in the token table
+   * of the language and their regions, packed as four numbers per token.
+   *
+   * @param text The text string to parse
+   */
+  public tokenizePacked(text: string): [Uint32Array, Uint32Array] {
+    const table = this.language.tokenTable;
+    const buffer = new TokenBuffer();
+    for (const { token, location } of this.generateTokens(text)) {
+      buffer.push(table.intern(token), location.startRow, location.startCol, location.endRow, location.endCol);
+    }
+    return buffer.finish();
+  }
+
+  /**
+   * Returns a tokenized version of the given file. The tokens are stored as
+   * their ids in the token table of the language.
    *
    * @param file The file to parse
    */
   public tokenizeFile(file: File): TokenizedFile {
-    const [ast, mapping] = this.tokenizeWithMapping(file.content);
-    return new TokenizedFile(file, ast, mapping);
+    const [ids, mapping] = this.tokenizePacked(file.content);
+    return new TokenizedFile(file, ids, mapping, this.language.tokenTable);
   }
 
   /**
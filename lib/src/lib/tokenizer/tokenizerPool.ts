@@ -0,0 +1,209 @@
+import { Worker } from "node:worker_threads";
+import { File, TokenizedFile } from "@dodona/dolos-core";
+import { CustomTreeSitterLanguage, Language, ProgrammingLanguage } from "../language.js";
+import { TokenizerOptions } from "./tokenizer.js";
+import { raceAbort } from "../progress.js";
+
+/**
+ * The information a worker needs to create its own tokenizer.
+ */
+export interface TokenizerWorkerData {
+  name: string;
+  extensions: string[];
+  customTreeSitterPackage: string | null;
+  options: TokenizerOptions;
+}
+
+/**
+ * A request to tokenize the file with the given index.
+ */
+export interface TokenizeRequest {
+  index: number;
+  content: string;
+}
+
+/**
+ * The tokens of a file, encoded in transferable buffers.
+ *
+ * Each token is stored as an index in `symbols`, the distinct tokens of the
+ * file, which are mapped to the ids of the token table of the language on the
+ * main thread. The region of each token is stored as four consecutive numbers
+ * (startRow, startCol, endRow, endCol) in `mapping`.
+ */
+export interface TokenizeResponse {
+  index: number;
+  symbols: string[];
+  tokens: Uint32Array;
+  mapping: Uint32Array;
+}
+
+/**
+ * The error that occurred when tokenizing the file with the given index.
+ */
+export interface TokenizeFailure {
+  index: number;
+  error: string;
+}
+
+/**
+ * Tokenizes files in parallel using a pool of worker threads, each with its
+ * own tokenizer (and tree-sitter parser) for the given language.
+ *
+ * The tokenized files are returned in the same order as the given files and
+ * are identical to the result of tokenizing them on the main thread.
+ */
+export class TokenizerPool {
+
+  /**
+   * Whether the given language can be tokenized in a worker thread: the
+   * worker needs to be able to load the language by its name or package.
+   * Languages with a custom tokenizer or language loader function are
+   * tokenized on the main thread.
+   */
+  public static supports(language: Language): boolean {
+    if (language instanceof CustomTreeSitterLanguage) {
+      return typeof language.customTreeSitterPackage === "string";
+    }
+    return language instanceof ProgrammingLanguage;
+  }
+
+  private static workerData(language: Language, options: TokenizerOptions): TokenizerWorkerData {
+    let customTreeSitterPackage = null;
+    if (language instanceof CustomTreeSitterLanguage && typeof language.customTreeSitterPackage === "string") {
+      customTreeSitterPackage = language.customTreeSitterPackage;
+    }
+    return {
+      name: language.name,
+      extensions: language.extensions,
+      customTreeSitterPackage,
+      options,
+    };
+  }
+
+  // The started workers, which are kept between calls to tokenizeFiles so
+  // their parsers stay loaded
+  private workers: Array<Worker> = [];
+
+  constructor(
+    private readonly language: Language,
+    private readonly options: TokenizerOptions,
+    private readonly size: number
+  ) {}
+
+  /**
+   * Converts the tokens received from a worker to a tokenized file, with the
+   * token ids of the token table of the language.
+   */
+  private decode(file: File, response: TokenizeResponse): TokenizedFile {
+    const { symbols, tokens, mapping } = response;
+    const table = this.language.tokenTable;
+    const ids = symbols.map(symbol => table.intern(symbol));
+    for (let i = 0; i < tokens.length; i++) {
+      tokens[i] = ids[tokens[i]];
+    }
+    return new TokenizedFile(file, tokens, mapping, table);
+  }
+
+  /**
+   * Starts workers until there are `count` of them. Workers that stopped are
+   * replaced.
+   */
+  private start(count: number): Array<Worker> {
+    const workerData = TokenizerPool.workerData(this.language, this.options);
+    while (this.workers.length < count) {
+      const worker = new Worker(new URL("./tokenizerWorker.js", import.meta.url), { workerData });
+      // Errors are reported to the running call, if any, and are followed by
+      // the exit of the worker
+      worker.on("error", () => undefined);
+      worker.once("exit", () => {
+        this.workers = this.workers.filter(w => w !== worker);
+      });
+      // Idle workers do not keep the process alive
+      worker.unref();
+      this.workers.push(worker);
+    }
+    return this.workers.slice(0, count);
+  }
+
+  /**
+   * Tokenizes the given files using at most `size` worker threads. The
+   * workers are started by the first call and reused by the next ones until
+   * the pool is terminated. They are stopped as soon as the signal is aborted
+   * or a file could not be tokenized.
+   *
+   * @param onTokenized Called with the amount of files that are tokenized
+   * so far, every time a file is tokenized.
+   */
+  public async tokenizeFiles(
+    files: Array<File>,
+    onTokenized?: (count: number) => void,
+    signal?: AbortSignal
+  ): Promise<Array<TokenizedFile>> {
+    signal?.throwIfAborted();
+    const results = new Array<TokenizedFile>(files.length);
+    if (files.length === 0) {
+      return results;
+    }
+    const workers = this.start(Math.min(this.size, files.length));
+
+    let next = 0;
+    let tokenized = 0;
+    const cleanups: Array<() => void> = [];
+    const run = (worker: Worker): Promise<void> => new Promise((resolve, reject) => {
+      const send = (): void => {
+        if (next < files.length) {
+          const request: TokenizeRequest = { index: next, content: files[next].content };
+          next += 1;
+          worker.postMessage(request);
+        } else {
+          resolve();
+        }
+      };
+      const onMessage = (response: TokenizeResponse | TokenizeFailure): void => {
+        if ("error" in response) {
+          reject(new Error(`Could not tokenize ${files[response.index].path}: ${response.error}`));
+        } else {
+          results[response.index] = this.decode(files[response.index], response);
+          tokenized += 1;
+          onTokenized?.(tokenized);
+          send();
+        }
+      };
+      const onExit = (code: number): void => {
+        reject(new Error(`Tokenizer worker stopped with exit code ${code}`));
+      };
+      worker.on("message", onMessage);
+      worker.on("error", reject);
+      worker.on("exit", onExit);
+      worker.ref();
+      cleanups.push(() => {
+        worker.off("message", onMessage);
+        worker.off("error", reject);
+        worker.off("exit", onExit);
+        worker.unref();
+      });
+      send();
+    });
+
+    try {
+      await raceAbort(Promise.all(workers.map(run)), signal);
+    } catch (e) {
+      // The workers may still be tokenizing files of this call
+      await this.terminate();
+      throw e;
+    } finally {
+      cleanups.forEach(cleanup => cleanup());
+    }
+    return results;
+  }
+
+  /**
+   * Stops the workers of this pool. The pool can still be used afterwards,
+   * new workers are then started.
+   */
+  public async terminate(): Promise<void> {
+    const workers = this.workers;
+    this.workers = [];
+    await Promise.all(workers.map(w => w.terminate()));
+  }
+}
@@ -0,0 +1,34 @@
+import { parentPort, workerData } from "node:worker_threads";
+import { CustomTreeSitterLanguage, ProgrammingLanguage } from "../language.js";
+import { TokenizeFailure, TokenizeRequest, TokenizeResponse, TokenizerWorkerData } from "./tokenizerPool.js";
+
+// Entry point of the worker threads of a TokenizerPool.
+
+const data = workerData as TokenizerWorkerData;
+const language = data.customTreeSitterPackage === null ?
+  new ProgrammingLanguage(data.name, data.extensions) :
+  new CustomTreeSitterLanguage(data.name, data.extensions, data.customTreeSitterPackage);
+const tokenizer = await language.createTokenizer(data.options);
+
+parentPort?.on("message", ({ index, content }: TokenizeRequest) => {
+  try {
+    const [tokens, mapping] = tokenizer.tokenizePacked(content);
+    // Renumber the ids of the token table of this worker to the symbols of this file
+    const ids: Map<number, number> = new Map();
+    const symbols: string[] = [];
+    for (let i = 0; i < tokens.length; i++) {
+      let id = ids.get(tokens[i]);
+      if (id === undefined) {
+        id = symbols.length;
+        ids.set(tokens[i], id);
+        symbols.push(language.tokenTable.token(tokens[i]));
+      }
+      tokens[i] = id;
+    }
+    const response: TokenizeResponse = { index, symbols, tokens, mapping };
+    parentPort?.postMessage(response, [tokens.buffer, mapping.buffer]);
+  } catch (e) {
+    const failure: TokenizeFailure = { index, error: e instanceof Error ? e.message : String(e) };
+    parentPort?.postMessage(failure);
+  }
+});
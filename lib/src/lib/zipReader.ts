@@ -0,0 +1,201 @@
+import { crc32 } from "@dodona/dolos-core";
+import fs, { FileHandle } from "node:fs/promises";
+import { promisify } from "node:util";
+import { inflateRaw } from "node:zlib";
+
+const inflate = promisify(inflateRaw);
+
+/**
+ * An entry in the central directory of a ZIP archive.
+ */
+export interface ZipEntry {
+  name: string;
+  isDirectory: boolean;
+  // 0 (stored) or 8 (deflated)
+  method: number;
+  crc: number;
+  compressedSize: number;
+  size: number;
+  // The offset of the local file header of this entry
+  offset: number;
+}
+
+/**
+ * Reads the entries of a ZIP archive without extracting it.
+ *
+ * The central directory is read when the archive is opened, the contents of
+ * an entry are only read (and decompressed) when requested, so only the
+ * entries that are needed are read from disk. ZIP64 archives are supported,
+ * encrypted entries and compression methods other than stored and deflated
+ * are not.
+ */
+export class ZipReader {
+
+  private static readonly endOfCentralDirectory = 0x06054b50;
+  private static readonly zip64EndOfCentralDirectory = 0x06064b50;
+  private static readonly zip64Locator = 0x07064b50;
+  private static readonly centralDirectoryHeader = 0x02014b50;
+  private static readonly localFileHeader = 0x04034b50;
+
+  private readonly byName: Map<string, ZipEntry>;
+
+  private constructor(
+    private readonly handle: FileHandle,
+    public readonly entries: Array<ZipEntry>
+  ) {
+    this.byName = new Map(entries.map(e => [e.name, e]));
+  }
+
+  /**
+   * Opens the ZIP archive at the given location and reads its central
+   * directory. The archive should be closed with `close` when done.
+   */
+  public static async open(location: string): Promise<ZipReader> {
+    const handle = await fs.open(location, "r");
+    try {
+      const entries = await ZipReader.readCentralDirectory(handle, location);
+      return new ZipReader(handle, entries);
+    } catch (error) {
+      await handle.close();
+      throw error;
+    }
+  }
+
+  private static async readAt(handle: FileHandle, position: number, length: number): Promise<Buffer> {
+    const buffer = Buffer.alloc(length);
+    let read = 0;
+    while (read < length) {
+      const { bytesRead } = await handle.read(buffer, read, length - read, position + read);
+      if (bytesRead === 0) {
+        throw new Error("Unexpected end of ZIP archive");
+      }
+      read += bytesRead;
+    }
+    return buffer;
+  }
+
+  private static async readCentralDirectory(handle: FileHandle, location: string): Promise<Array<ZipEntry>> {
+    const { size } = await handle.stat();
+    // The end of central directory record is 22 bytes, followed by a comment
+    // of at most 65535 bytes
+    const tailLength = Math.min(size, 22 + 0xffff);
+    const tail = await ZipReader.readAt(handle, size - tailLength, tailLength);
+    let end = tail.length - 22;
+    while (end >= 0 && tail.readUInt32LE(end) !== ZipReader.endOfCentralDirectory) {
+      end -= 1;
+    }
+    if (end < 0) {
+      throw new Error(`${location} is not a valid ZIP archive`);
+    }
+
+    let count = tail.readUInt16LE(end + 10);
+    let directorySize = tail.readUInt32LE(end + 12);
+    let directoryOffset = tail.readUInt32LE(end + 16);
+    if (count === 0xffff || directorySize === 0xffffffff || directoryOffset === 0xffffffff) {
+      const locatorPosition = size - tailLength + end - 20;
+      const locator = await ZipReader.readAt(handle, locatorPosition, 20);
+      if (locator.readUInt32LE(0) !== ZipReader.zip64Locator) {
+        throw new Error(`${location} is not a valid ZIP64 archive`);
+      }
+      const record = await ZipReader.readAt(handle, Number(locator.readBigUInt64LE(8)), 56);
+      if (record.readUInt32LE(0) !== ZipReader.zip64EndOfCentralDirectory) {
+        throw new Error(`${location} is not a valid ZIP64 archive`);
+      }
+      count = Number(record.readBigUInt64LE(32));
+      directorySize = Number(record.readBigUInt64LE(40));
+      directoryOffset = Number(record.readBigUInt64LE(48));
+    }
+
+    const directory = await ZipReader.readAt(handle, directoryOffset, directorySize);
+    const entries: Array<ZipEntry> = [];
+    let offset = 0;
+    for (let i = 0; i < count; i++) {
+      if (directory.readUInt32LE(offset) !== ZipReader.centralDirectoryHeader) {
+        throw new Error(`The central directory of ${location} is corrupted`);
+      }
+      const flags = directory.readUInt16LE(offset + 8);
+      const nameLength = directory.readUInt16LE(offset + 28);
+      const extraLength = directory.readUInt16LE(offset + 30);
+      const commentLength = directory.readUInt16LE(offset + 32);
+      const name = directory.toString("utf8", offset + 46, offset + 46 + nameLength);
+      const entry: ZipEntry = {
+        name,
+        isDirectory: name.endsWith("/"),
+        method: directory.readUInt16LE(offset + 10),
+        crc: directory.readUInt32LE(offset + 16),
+        compressedSize: directory.readUInt32LE(offset + 20),
+        size: directory.readUInt32LE(offset + 24),
+        offset: directory.readUInt32LE(offset + 42),
+      };
+      if (flags & 1) {
+        throw new Error(`${name} in ${location} is encrypted, which is not supported`);
+      }
+
+      // The ZIP64 extra field contains the sizes and offset that do not fit in 32 bits
+      let extra = offset + 46 + nameLength;
+      const extraEnd = extra + extraLength;
+      while (extra + 4 <= extraEnd) {
+        const id = directory.readUInt16LE(extra);
+        const length = directory.readUInt16LE(extra + 2);
+        if (id === 0x0001) {
+          let field = extra + 4;
+          if (entry.size === 0xffffffff) {
+            entry.size = Number(directory.readBigUInt64LE(field));
+            field += 8;
+          }
+          if (entry.compressedSize === 0xffffffff) {
+            entry.compressedSize = Number(directory.readBigUInt64LE(field));
+            field += 8;
+          }
+          if (entry.offset === 0xffffffff) {
+            entry.offset = Number(directory.readBigUInt64LE(field));
+          }
+        }
+        extra += 4 + length;
+      }
+
+      entries.push(entry);
+      offset = extraEnd + commentLength;
+    }
+    return entries;
+  }
+
+  /**
+   * Returns the entry with the given name, or undefined if it does not exist.
+   */
+  public entry(name: string): ZipEntry | undefined {
+    return this.byName.get(name);
+  }
+
+  /**
+   * Reads and decompresses the contents of the given entry, and verifies its
+   * size and checksum.
+   */
+  public async read(entry: ZipEntry): Promise<Buffer> {
+    const header = await ZipReader.readAt(this.handle, entry.offset, 30);
+    if (header.readUInt32LE(0) !== ZipReader.localFileHeader) {
+      throw new Error(`The local header of ${entry.name} is corrupted`);
+    }
+    const dataOffset = entry.offset + 30 + header.readUInt16LE(26) + header.readUInt16LE(28);
+    const compressed = await ZipReader.readAt(this.handle, dataOffset, entry.compressedSize);
+
+    let data;
+    if (entry.method === 0) {
+      data = compressed;
+    } else if (entry.method === 8) {
+      // Never inflate more than the declared size, which would be rejected below
+      data = await inflate(compressed, { maxOutputLength: Math.max(entry.size, 1) }).catch(() => null);
+    } else {
+      throw new Error(`${entry.name} uses an unsupported compression method (${entry.method})`);
+    }
+
+    if (data === null || data.length !== entry.size || crc32(data) !== entry.crc) {
+      throw new Error(`The contents of ${entry.name} are corrupted`);
+    }
+    return data;
+  }
+
+  public async close(): Promise<void> {
+    await this.handle.close();
+  }
+}
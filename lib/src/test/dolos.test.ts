@@ -1,6 +1,11 @@
 import test from "ava";
 import { Dolos } from "../lib/dolos.js";
-import { File, Region } from "@dodona/dolos-core";
+import { saveIndex } from "../lib/indexFile.js";
+import { mkdir, mkdtemp, readFile, rm, writeFile } from "node:fs/promises";
+import { tmpdir } from "node:os";
+import path from "node:path";
+import { File, Pair, Region } from "@dodona/dolos-core";
+import { ProgressEvent } from "../lib/progress.js";
 
 test("equal content should be a full match", async t => {
   const dolos = new Dolos();
@@ -304,10 +309,32 @@ test("should read ZIP-files without info.csv", async t => {
   t.true(pairs[0].similarity > 0.75);
 });
 
+test("should only read ZIP entries of the requested language", async t => {
+  const dolos = new Dolos({ language: "javascript" });
+
+  const report = await dolos.analyzePaths(["../samples/javascript/simple-dataset-no-csv.zip"]);
+
+  t.is(4, report.files.length);
+  t.true(report.files.every(f => f.path.endsWith(".js")));
+  t.is(report.metadata()["warnings"].length, 0);
+});
+
 test("empty files should match 0%", async t => {
   const dolos = new Dolos();
   const report = await dolos.analyze([new File("file1.js", ""), new File("file2.js", "")]);
+  t.is(0, report.allPairs().length);
+
+  const pair = report.getPair(report.files[0], report.files[1]);
+  t.is(0, pair.similarity);
+  t.is(0, pair.overlap);
+  t.is(0, pair.longest);
+});
+
+test("empty files should be compared with minSharedFingerprints 0", async t => {
+  const dolos = new Dolos({ minSharedFingerprints: 0 });
+  const report = await dolos.analyze([new File("file1.js", ""), new File("file2.js", "")]);
   const pairs = report.allPairs();
+  t.is(1, pairs.length);
   t.is(0, pairs[0].similarity);
   t.is(0, pairs[0].overlap);
   t.is(0, pairs[0].longest);
@@ -481,3 +508,192 @@ test.failing("repeating sequences should not cause too many fragments", async t
   const fragments = pairs[0].buildFragments();
   t.is(fragments.length, 2);
 });
+
+test("iterating the pairs should yield the pairs of the report", async t => {
+  const files = ["../samples/javascript/info.csv"];
+  const describe = (p: Pair): string => `${p.leftFile.path} ${p.rightFile.path} ${p.similarity}`;
+
+  const report = await new Dolos().analyzePaths(files);
+  const pairs = Array.from(report.iteratePairs(), describe);
+  t.deepEqual(pairs.sort(), report.allPairs().map(describe).sort());
+  t.is(report.iterateSharedFingerprints().next().value, report.sharedFingerprints()[0]);
+
+  const limited = await new Dolos({ limitResults: 2 }).analyzePaths(files);
+  t.deepEqual(Array.from(limited.iteratePairs(), describe), limited.allPairs().map(describe));
+});
+
+test("parallel scoring should result in the same pairs", async t => {
+  const sequential = await new Dolos({ workers: 1 }).analyzePaths(["../samples/javascript/info.csv"]);
+  const parallel = await new Dolos({ workers: 2, parallelScoring: true }).analyzePaths(["../samples/javascript/info.csv"]);
+
+  const expected = sequential.allPairs();
+  const pairs = parallel.allPairs();
+  t.is(pairs.length, expected.length);
+  for (let i = 0; i < pairs.length; i++) {
+    t.is(pairs[i].leftFile.path, expected[i].leftFile.path);
+    t.is(pairs[i].rightFile.path, expected[i].rightFile.path);
+    t.is(pairs[i].similarity, expected[i].similarity);
+    t.is(pairs[i].overlap, expected[i].overlap);
+    t.is(pairs[i].longest, expected[i].longest);
+  }
+});
+
+test("parallel scoring should keep the best pairs when the results are limited", async t => {
+  const files = ["../samples/javascript/info.csv"];
+  for (const sortBy of ["similarity", "longest fragment"]) {
+    const expected = (await new Dolos({ workers: 1, sortBy }).analyzePaths(files)).allPairs().slice(0, 2);
+    const options = { workers: 2, parallelScoring: true, limitResults: 2, sortBy };
+    const pairs = (await new Dolos(options).analyzePaths(files)).allPairs();
+    t.deepEqual(
+      pairs.map(p => [p.leftFile.path, p.rightFile.path, p.similarity, p.longest]),
+      expected.map(p => [p.leftFile.path, p.rightFile.path, p.similarity, p.longest])
+    );
+  }
+});
+
+test("files compared against a saved index should have the same pairs", async t => {
+  const corpus = [
+    "../samples/javascript/another_copied_function.js",
+    "../samples/javascript/copied_function.js",
+    "../samples/javascript/copy_of_sample.js",
+  ];
+  const query = "../samples/javascript/sample.js";
+  const directory = await mkdtemp(path.join(tmpdir(), "dolos-index-"));
+  try {
+    const location = path.join(directory, "corpus.index");
+    const corpusReport = await new Dolos().analyzePaths(corpus);
+    await saveIndex(corpusReport.index, location);
+
+    const full = await new Dolos().analyzePaths([...corpus, query]);
+    const expected = full.allPairs()
+      .filter(p => p.leftFile.path === query || p.rightFile.path === query)
+      .map(p => [p.leftFile.path === query ? p.rightFile.path : p.leftFile.path, p.similarity]);
+
+    const report = await new Dolos({ against: location }).analyzePaths([query]);
+    const pairs = report.allPairs();
+    t.true(pairs.length > 0);
+    t.true(pairs.every(p => p.leftFile.path === query));
+    t.deepEqual(pairs.map(p => [p.rightFile.path, p.similarity]), expected);
+
+    await t.throwsAsync(
+      () => new Dolos({ against: location, kgramLength: 10 }).analyzePaths([query]),
+      { message: /kgramLength is 23/ }
+    );
+  } finally {
+    await rm(directory, { recursive: true });
+  }
+});
+
+test("should read the files of a directory of the requested language", async t => {
+  const directory = await mkdtemp(path.join(tmpdir(), "dolos-directory-"));
+  try {
+    const sample = await readFile("../samples/javascript/sample.js");
+    const copy = await readFile("../samples/javascript/copy_of_sample.js");
+    await mkdir(path.join(directory, "alice", "node_modules"), { recursive: true });
+    await mkdir(path.join(directory, "bob", "lib"), { recursive: true });
+    await writeFile(path.join(directory, "alice", "index.js"), sample);
+    await writeFile(path.join(directory, "alice", "node_modules", "dependency.js"), sample);
+    await writeFile(path.join(directory, "bob", "lib", "index.js"), copy);
+    await writeFile(path.join(directory, "bob", "lib", "large.js"), "x".repeat(4096));
+    await writeFile(path.join(directory, "bob", "logo.js"), Buffer.from([0x89, 0x50, 0x4e, 0x47, 0, 0]));
+    await writeFile(path.join(directory, "bob", "notes.txt"), "notes");
+
+    const report = await new Dolos({ language: "javascript", maxFileSize: 2 }).analyzePaths([directory]);
+    t.is(report.name, path.basename(directory));
+    t.deepEqual(
+      report.files.map(f => path.relative(directory, f.path)).sort(),
+      [path.join("alice", "index.js"), path.join("bob", "lib", "index.js")]
+    );
+    t.is(report.warnings.length, 3);
+    t.is(report.allPairs().length, 1);
+  } finally {
+    await rm(directory, { recursive: true });
+  }
+});
+
+test("low-memory mode should result in the same pairs and fragments", async t => {
+  const files = ["../samples/javascript/info.csv"];
+  const expected = await new Dolos({ workers: 1 }).analyzePaths(files);
+  const report = await new Dolos({ workers: 1, lowMemory: true }).analyzePaths(files);
+
+  t.true(report.files.every(f => f.isOffloaded));
+  t.deepEqual(report.files.map(f => f.decodeTokens()), expected.files.map(f => f.decodeTokens()));
+  t.deepEqual(report.files.map(f => f.mapping), expected.files.map(f => f.mapping));
+
+  const expectedPairs = expected.allPairs();
+  const pairs = report.allPairs();
+  t.is(pairs.length, expectedPairs.length);
+  for (let i = 0; i < pairs.length; i++) {
+    t.is(pairs[i].leftFile.path, expectedPairs[i].leftFile.path);
+    t.is(pairs[i].rightFile.path, expectedPairs[i].rightFile.path);
+    t.is(pairs[i].similarity, expectedPairs[i].similarity);
+    t.deepEqual(
+      pairs[i].buildFragments().map(f => [f.leftSelection, f.rightSelection]),
+      expectedPairs[i].buildFragments().map(f => [f.leftSelection, f.rightSelection])
+    );
+  }
+});
+
+test("the profile of an analysis is included in the metadata and reported to hooks", async t => {
+  const ended = new Set<string>();
+  const dolos = new Dolos({}, { phaseEnded: phase => ended.add(phase) });
+  const report = await dolos.analyzePaths(["../samples/javascript/info.csv"]);
+  report.allPairs();
+
+  t.deepEqual(
+    Array.from(ended).sort(),
+    ["detectLanguage", "index", "read", "scorePairs", "tokenize"]
+  );
+  const metadata = report.metadata();
+  t.is(metadata.fileCount, report.files.length);
+  t.is(metadata.tokenCount, report.files.reduce((sum, f) => sum + f.tokenCount, 0));
+  t.is(metadata.fingerprintCount, report.sharedFingerprints().length);
+  t.true(metadata.kgramCount > 0);
+  t.true(metadata.tokenizeTime > 0);
+  t.is(metadata.writeReportTime, 0);
+});
+
+test("progress of an analysis is streamed until it is done", async t => {
+  const dolos = new Dolos({ workers: 1 });
+  const events: Array<ProgressEvent> = [];
+  const reading = (async () => {
+    for await (const event of dolos.progress()) {
+      events.push(event);
+    }
+  })();
+  const report = await dolos.analyzePaths(["../samples/javascript/info.csv"]);
+  await reading;
+
+  const count = report.files.length;
+  t.deepEqual(events[0], { stage: "read", done: count, total: count });
+  for (const stage of ["tokenize", "index"]) {
+    const done = events.filter(e => e.stage === stage).map(e => e.done);
+    t.deepEqual(done, [...done].sort((a, b) => a - b));
+    t.is(done[done.length - 1], count);
+  }
+});
+
+test("an aborted analysis is rejected with the reason of the signal", async t => {
+  const aborted = new AbortController();
+  aborted.abort(new Error("stop"));
+  await t.throwsAsync(
+    new Dolos().analyzePaths(["../samples/javascript/info.csv"], undefined, aborted.signal),
+    { message: "stop" }
+  );
+
+  const controller = new AbortController();
+  const stages = new Set<string>();
+  const dolos = new Dolos({ workers: 1 }, {
+    progress: ({ stage }) => {
+      stages.add(stage);
+      if (stage === "tokenize") {
+        controller.abort(new Error("stop while tokenizing"));
+      }
+    }
+  });
+  await t.throwsAsync(
+    dolos.analyzePaths(["../samples/javascript/info.csv"], undefined, controller.signal),
+    { message: "stop while tokenizing" }
+  );
+  t.false(stages.has("score"));
+});
@@ -0,0 +1,23 @@
+import test from "ava";
+import { GlobFilter, globToRegExp } from "../lib/glob.js";
+
+test("glob patterns match paths with forward slashes", t => {
+  t.true(globToRegExp("*.js").test("index.js"));
+  t.false(globToRegExp("*.js").test("src/index.js"));
+  t.true(globToRegExp("src/**/*.js").test("src/index.js"));
+  t.true(globToRegExp("src/**/*.js").test("src/lib/util/index.js"));
+  t.true(globToRegExp("build/**").test("build/out/index.js"));
+  t.true(globToRegExp("file?.[ch]").test("file1.c"));
+  t.false(globToRegExp("file?.[!ch]").test("file1.h"));
+  t.false(globToRegExp("a.b").test("axb"));
+});
+
+test("glob filter matches names and relative paths", t => {
+  const filter = new GlobFilter([".*", "node_modules", "*.min.js", "/build/"]);
+  t.true(filter.excludes(".git"));
+  t.true(filter.excludes("student/node_modules"));
+  t.true(filter.excludes("student/lib/jquery.min.js"));
+  t.true(filter.excludes("build"));
+  t.false(filter.excludes("student/build"));
+  t.false(filter.excludes("student/index.js"));
+});
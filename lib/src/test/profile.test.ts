@@ -0,0 +1,62 @@
+import test from "ava";
+import { Phase, Profile } from "../lib/profile.js";
+
+test("durations of a phase are summed and reported to the hooks", async t => {
+  const events: Array<[string, Phase]> = [];
+  const profile = new Profile({
+    phaseStarted: phase => events.push(["start", phase]),
+    phaseEnded: (phase, duration) => {
+      t.true(duration >= 0);
+      events.push(["end", phase]);
+    },
+  });
+
+  const result = await profile.time("tokenize", async () => {
+    await new Promise(resolve => setTimeout(resolve, 20));
+    return 42;
+  });
+  t.is(result, 42);
+  const first = profile.durations.tokenize;
+  t.true(first >= 15);
+
+  profile.timeSync("tokenize", () => null);
+  t.true(profile.durations.tokenize >= first);
+  t.deepEqual(events, [["start", "tokenize"], ["end", "tokenize"], ["start", "tokenize"], ["end", "tokenize"]]);
+  t.is(profile.durations.index, 0);
+  t.true(profile.counters.peakHeap > 0);
+});
+
+test("phases are ended when they throw", async t => {
+  const profile = new Profile();
+  await t.throwsAsync(() => profile.time("read", () => Promise.reject(new Error("unreadable"))), {
+    message: "unreadable"
+  });
+  t.throws(() => profile.end("read"), { message: /not started/ });
+});
+
+test("running phases are included in the profile data", t => {
+  const profile = new Profile();
+  profile.counters.files = 3;
+  profile.start("writeReport");
+  const start = Date.now();
+  while (Date.now() - start < 5) {
+    // busy wait
+  }
+  const data = profile.asObject();
+  t.true(data.writeReportTime > 0);
+  t.is(data.readTime, 0);
+  t.is(data.fileCount, 3);
+  profile.end("writeReport");
+  t.true(profile.durations.writeReport >= data.writeReportTime);
+});
+
+test("the heap is sampled while a phase runs", async t => {
+  const profile = new Profile();
+  await profile.time("index", async () => {
+    const started = profile.counters.peakHeap;
+    const data = Array.from({ length: 1000000 }, (_, i) => ({ i }));
+    await new Promise(resolve => setTimeout(resolve, 3 * Profile.heapSampleInterval));
+    t.true(profile.counters.peakHeap > started);
+    t.is(data.length, 1000000);
+  });
+});
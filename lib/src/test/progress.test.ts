@@ -0,0 +1,41 @@
+import test from "ava";
+import { ProgressEvent, ProgressStream, raceAbort } from "../lib/progress.js";
+
+test("progress stream buffers events until it is read and ends", async t => {
+  const stream = new ProgressStream();
+  stream.push({ stage: "read", done: 2, total: 2 });
+  const reading = (async () => {
+    const events: Array<ProgressEvent> = [];
+    for await (const event of stream) {
+      events.push(event);
+    }
+    return events;
+  })();
+  stream.push({ stage: "tokenize", done: 1, total: 2 });
+  await new Promise(resolve => setImmediate(resolve));
+  stream.push({ stage: "tokenize", done: 2, total: 2 });
+  stream.end();
+  stream.push({ stage: "index", done: 2, total: 2 });
+
+  t.deepEqual(await reading, [
+    { stage: "read", done: 2, total: 2 },
+    { stage: "tokenize", done: 1, total: 2 },
+    { stage: "tokenize", done: 2, total: 2 },
+  ]);
+  t.true(stream.isEnded);
+});
+
+test("racing with an aborted signal rejects with its reason", async t => {
+  t.is(await raceAbort(Promise.resolve(1)), 1);
+  t.is(await raceAbort(Promise.resolve(2), new AbortController().signal), 2);
+
+  const controller = new AbortController();
+  const never = new Promise<number>(() => undefined);
+  const racing = raceAbort(never, controller.signal);
+  controller.abort(new Error("stop"));
+  await t.throwsAsync(racing, { message: "stop" });
+
+  await t.throwsAsync(raceAbort(Promise.resolve(3), controller.signal), { message: "stop" });
+  // A failure of the work after the abort is not unhandled
+  await t.throwsAsync(raceAbort(Promise.reject(new Error("failed")), controller.signal), { message: "stop" });
+});
@@ -0,0 +1,64 @@
+import test from "ava";
+import { FingerprintIndex, File, TokenTable, TokenizedFile } from "@dodona/dolos-core";
+import { TokenSpill } from "../lib/tokenSpill.js";
+
+function createTokenizedFile(name: string, content: string, table: TokenTable): TokenizedFile {
+  const ids = Uint32Array.from(content.split(""), token => table.intern(token));
+  const mapping = new Uint32Array(4 * ids.length);
+  for (let i = 0; i < ids.length; i++) {
+    mapping.set([0, i, 0, i + 1], 4 * i);
+  }
+  return new TokenizedFile(new File(name, content), ids, mapping, table);
+}
+
+const contents = [
+  "the quick brown fox jumps over the lazy dog",
+  "a quick brown fox jumps over a lazy dog, the quick brown fox",
+  "a slow white cat jumps over the lazy dog",
+];
+
+test("offloaded files have the same tokens, mapping and pairs", t => {
+  const table = new TokenTable();
+  const expected = new FingerprintIndex(4, 3, true);
+  expected.addFiles(contents.map((c, i) => createTokenizedFile(`file${i}`, c, table)));
+
+  const spill = new TokenSpill();
+  try {
+    const index = new FingerprintIndex(4, 3, true);
+    const files = contents.map((c, i) => createTokenizedFile(`file${i}`, c, table));
+    index.addFiles(files);
+    files.forEach(f => spill.offload(f));
+
+    for (let i = 0; i < files.length; i++) {
+      const original = expected.entries()[i].file;
+      t.true(files[i].isOffloaded);
+      t.deepEqual(files[i].decodeTokens(), original.decodeTokens());
+      t.deepEqual(files[i].mapping, original.mapping);
+      t.deepEqual(files[i].tokenSlice(3, 8), original.tokenSlice(3, 8));
+      t.is(files[i].token(5), original.token(5));
+      t.deepEqual(files[i].region(7), original.region(7));
+    }
+
+    const pairs = index.allPairs();
+    const expectedPairs = expected.allPairs();
+    t.is(pairs.length, expectedPairs.length);
+    for (let i = 0; i < pairs.length; i++) {
+      t.is(pairs[i].similarity, expectedPairs[i].similarity);
+      t.deepEqual(
+        pairs[i].buildFragments().map(f => [f.leftSelection, f.rightSelection, f.mergedData]),
+        expectedPairs[i].buildFragments().map(f => [f.leftSelection, f.rightSelection, f.mergedData])
+      );
+    }
+  } finally {
+    spill.close();
+  }
+});
+
+test("closing a spill removes its exit listener", t => {
+  const listeners = process.listenerCount("exit");
+  const spill = new TokenSpill();
+  t.is(process.listenerCount("exit"), listeners + 1);
+  spill.close();
+  spill.close();
+  t.is(process.listenerCount("exit"), listeners);
+});
@@ -2,6 +2,11 @@ import test from "ava";
 import { File, Region } from "@dodona/dolos-core";
 import { LanguagePicker } from "../lib/language.js";
 import { readPath } from "../lib/reader.js";
+import { TokenizerPool } from "../lib/tokenizer/tokenizerPool.js";
+import { TokenCache } from "../lib/tokenizer/tokenCache.js";
+import { mkdtemp, readdir, rm, stat } from "node:fs/promises";
+import { tmpdir } from "node:os";
+import path from "node:path";
 
 const languageFiles = {
   "bash": "../samples/bash/caesar.sh",
@@ -49,7 +54,7 @@ for (const [languageName, languageFile] of Object.entries(languageFiles)) {
     const tokenizer = await language.createTokenizer();
     t.truthy(tokenizer);
 
-    const { tokens } = tokenizer.tokenizeFile(file);
+    const tokens = tokenizer.tokenizeFile(file).decodeTokens();
     t.truthy(tokens);
     t.snapshot(tokens, "stable tokenization");
   });
@@ -76,7 +81,7 @@ test.skip("should be able to use external tree-sitter parsers (tree-sitter-json)
   const tokenizer = await language.createTokenizer();
   t.truthy(tokenizer);
 
-  const { tokens } = tokenizer.tokenizeFile(file);
+  const tokens = tokenizer.tokenizeFile(file).decodeTokens();
   t.truthy(tokens);
 });
 
@@ -87,7 +92,7 @@ test("should be able to parse larger files", async t => {
   const tokenizer = await language.createTokenizer();
   t.truthy(tokenizer);
 
-  const { tokens } = tokenizer.tokenizeFile(file);
+  const tokens = tokenizer.tokenizeFile(file).decodeTokens();
   t.truthy(tokens);
 });
 
@@ -96,7 +101,9 @@ test("should be able to correctly tokenize a variable", async t => {
   const language = await (new LanguagePicker().findLanguage("javascript"));
   const tokenizer = await language.createTokenizer();
 
-  const { tokens, mapping } = tokenizer.tokenizeFile(file);
+  const tokenized = tokenizer.tokenizeFile(file);
+  const tokens = tokenized.decodeTokens();
+  const mapping = tokenized.mapping;
   t.is(tokens.join(""), "(program(variable_declaration(variable_declarator(identifier)(number))))");
   t.is(mapping.length, 15);
   t.deepEqual([
@@ -123,7 +130,9 @@ test("should be able to correctly tokenize a loop", async t => {
   const language = await (new LanguagePicker().findLanguage("javascript"));
 
   const tokenizer = await language.createTokenizer();
-  const { tokens, mapping } = tokenizer.tokenizeFile(file);
+  const tokenized = tokenizer.tokenizeFile(file);
+  const tokens = tokenized.decodeTokens();
+  const mapping = tokenized.mapping;
   t.is(tokens.join(""), "(program(lexical_declaration(variable_declarator(identifier)(number)))" +
       "(while_statement(parenthesized_expression(binary_expression(identifier)(number)))" +
       "(statement_block(expression_statement(augmented_assignment_expression(identifier)(number))))))");
@@ -179,11 +188,163 @@ test("should be able to correctly tokenize a loop", async t => {
 });
 
 
+test("should be able to tokenize deeply nested code", async t => {
+  const depth = 20000;
+  const file = new File("nested.js", "x = " + "[".repeat(depth) + "]".repeat(depth) + ";");
+  const language = await (new LanguagePicker().findLanguage("javascript"));
+  const tokenizer = await language.createTokenizer();
+
+  const tokenized = tokenizer.tokenizeFile(file);
+  const tokens = tokenized.decodeTokens();
+  const mapping = tokenized.mapping;
+  t.is(
+    tokens.join(""),
+    "(program(expression_statement(assignment_expression(identifier)" +
+      "(array".repeat(depth) + ")".repeat(depth) + ")))"
+  );
+  // Every array ends at the start of the array it contains, except the innermost one
+  const arrays = mapping.filter((_, i) => tokens[i] === "array");
+  t.is(arrays.length, depth);
+  t.true(arrays.every((region, i) =>
+    region.startRow === 0 && region.startCol === 4 + i &&
+    region.endRow === 0 && region.endCol === (i < depth - 1 ? 5 + i : 5 + depth)
+  ));
+});
+
+test("should tokenize nested nodes with the regions of their own code", async t => {
+  const file = new File("nested.js", "x = [[]];");
+  const language = await (new LanguagePicker().findLanguage("javascript"));
+  const tokenizer = await language.createTokenizer();
+
+  const tokenized = tokenizer.tokenizeFile(file);
+  t.deepEqual(tokenized.decodeTokens(), [
+    "(", "program", "(", "expression_statement", "(", "assignment_expression",
+    "(", "identifier", ")", "(", "array", "(", "array", ")", ")", ")", ")", ")",
+  ]);
+  t.deepEqual(tokenized.mapping, [
+    new Region(0, 0, 0, 0),
+    new Region(0, 0, 0, 0),
+    new Region(0, 0, 0, 0),
+    new Region(0, 0, 0, 0),
+    new Region(0, 0, 0, 0),
+    new Region(0, 0, 0, 0),
+    new Region(0, 0, 0, 1),
+    new Region(0, 0, 0, 1),
+    new Region(0, 0, 0, 1),
+    new Region(0, 4, 0, 5),
+    new Region(0, 4, 0, 5),
+    new Region(0, 5, 0, 7),
+    new Region(0, 5, 0, 7),
+    new Region(0, 5, 0, 7),
+    new Region(0, 4, 0, 5),
+    new Region(0, 0, 0, 0),
+    new Region(0, 0, 0, 0),
+    new Region(0, 0, 0, 0),
+  ]);
+});
+
 test("tokens should contain comments when includeComments is true", async t => {
   const file = new File("comments.js", "let i = 0;\nwhile (i < 10) { // comment\n  i += 1;\n}");
   const language = await (new LanguagePicker().findLanguage("javascript"));
 
   const tokenizer = await language.createTokenizer({ includeComments: true });
-  const { tokens } = tokenizer.tokenizeFile(file);
+  const tokens = tokenizer.tokenizeFile(file).decodeTokens();
   t.true(tokens.includes("comment"));
 });
+
+test("tokenizer pool returns the same tokens as the tokenizer", async t => {
+  const files = [];
+  for (const languageFile of [languageFiles["java"], languageFiles["python"], languageFiles["python"]]) {
+    files.push((await readPath(languageFile)).ok());
+  }
+  const java = await new LanguagePicker().findLanguage("java");
+  const python = await new LanguagePicker().findLanguage("python");
+  t.true(TokenizerPool.supports(python));
+  t.false(TokenizerPool.supports(await new LanguagePicker().findLanguage("char")));
+
+  for (const [language, group] of [[java, files.slice(0, 1)], [python, files.slice(1)]] as const) {
+    const tokenizer = await language.createTokenizer();
+    const pool = new TokenizerPool(language, {}, 2);
+    const pooled = await pool.tokenizeFiles(group);
+    // The workers are reused by the next call
+    t.deepEqual(
+      (await pool.tokenizeFiles(group)).map(f => f.decodeTokens()),
+      pooled.map(f => f.decodeTokens())
+    );
+    await pool.terminate();
+    t.is(pooled.length, group.length);
+    for (let i = 0; i < group.length; i++) {
+      const expected = tokenizer.tokenizeFile(group[i]);
+      t.is(pooled[i].file, group[i]);
+      t.deepEqual(pooled[i].decodeTokens(), expected.decodeTokens());
+      t.deepEqual(pooled[i].mapping, expected.mapping);
+    }
+  }
+});
+
+test("token cache returns the cached tokens of unchanged files", async t => {
+  const directory = await mkdtemp(path.join(tmpdir(), "dolos-cache-"));
+  try {
+    const language = await new LanguagePicker().findLanguage("char");
+    const tokenizer = await language.createTokenizer();
+    const files = [
+      new File("a.txt", "first file\nwith two lines"),
+      new File("b.txt", "second file"),
+    ];
+    const parsed: Array<File> = [];
+    const tokenize = async (missing: Array<File>) => {
+      parsed.push(...missing);
+      return missing.map(f => tokenizer.tokenizeFile(f));
+    };
+
+    const cache = new TokenCache(directory, tokenizer);
+    const first = await cache.tokenizeFiles(files, tokenize);
+    t.deepEqual(parsed, files);
+
+    const changed = [files[0], new File("b.txt", "second file, changed")];
+    const second = await new TokenCache(directory, tokenizer).tokenizeFiles(changed, tokenize);
+    t.deepEqual(parsed, [...files, changed[1]]);
+    t.is(second[0].file, changed[0]);
+    t.deepEqual(second[0].decodeTokens(), first[0].decodeTokens());
+    t.deepEqual(second[0].mapping, first[0].mapping);
+    t.deepEqual(second[1].decodeTokens(), tokenizer.tokenizeFile(changed[1]).decodeTokens());
+
+    const withComments = await language.createTokenizer({ includeComments: true });
+    t.not(new TokenCache(directory, withComments).key(files[0]), cache.key(files[0]));
+  } finally {
+    await rm(directory, { recursive: true });
+  }
+});
+
+test("token cache evicts entries when it is too large", async t => {
+  const directory = await mkdtemp(path.join(tmpdir(), "dolos-cache-"));
+  try {
+    const language = await new LanguagePicker().findLanguage("char");
+    const tokenizer = await language.createTokenizer();
+    const files = Array.from({ length: 10 }, (_, i) => new File(`${i}.txt`, `file number ${i}`));
+    const cache = new TokenCache(directory, tokenizer, 1000);
+    await cache.tokenizeFiles(files, async missing => missing.map(f => tokenizer.tokenizeFile(f)));
+
+    const entries = async () => {
+      let total = 0;
+      for (const dir of await readdir(directory, { withFileTypes: true })) {
+        if (dir.isDirectory()) {
+          for (const name of await readdir(path.join(directory, dir.name))) {
+            total += (await stat(path.join(directory, dir.name, name))).size;
+          }
+        }
+      }
+      return total;
+    };
+    const total = await entries();
+    t.true(total > 0);
+    t.true(total <= 1000);
+
+    // Later runs keep the cache within its maximum size
+    const more = Array.from({ length: 10 }, (_, i) => new File(`more${i}.txt`, `another file ${i}`));
+    await cache.tokenizeFiles(more, async missing => missing.map(f => tokenizer.tokenizeFile(f)));
+    t.true(await entries() <= 1000);
+  } finally {
+    await rm(directory, { recursive: true });
+  }
+});
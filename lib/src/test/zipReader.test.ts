@@ -0,0 +1,52 @@
+import test from "ava";
+import fs from "node:fs/promises";
+import { ZipReader } from "../lib/zipReader.js";
+
+test("zip reader lists the entries of an archive", async t => {
+  const zip = await ZipReader.open("../samples/javascript/simple-dataset-no-write.zip");
+  try {
+    t.deepEqual(
+      zip.entries.filter(e => !e.isDirectory).map(e => e.name).sort(),
+      [
+        "simple-dataset/another_copied_function/another_copied_function.js",
+        "simple-dataset/copied_function/copied_function.js",
+        "simple-dataset/copy_of_sample/copy_of_sample.js",
+        "simple-dataset/info.csv",
+        "simple-dataset/sample/sample.js",
+      ]
+    );
+    t.true(zip.entry("simple-dataset/")?.isDirectory);
+    t.is(zip.entry("missing.js"), undefined);
+  } finally {
+    await zip.close();
+  }
+});
+
+test("zip reader reads the contents of entries", async t => {
+  const zip = await ZipReader.open("../samples/javascript/simple-dataset.zip");
+  try {
+    for (const name of ["sample.js", "copied_function.js"]) {
+      const entry = zip.entry(name);
+      t.truthy(entry);
+      const expected = await fs.readFile(`../samples/javascript/${name}`);
+      t.deepEqual(await zip.read(entry!), expected);
+    }
+  } finally {
+    await zip.close();
+  }
+});
+
+test("zip reader does not inflate entries beyond their size", async t => {
+  const zip = await ZipReader.open("../samples/javascript/simple-dataset.zip");
+  try {
+    const entry = zip.entry("sample.js")!;
+    t.is(entry.method, 8);
+    await t.throwsAsync(() => zip.read({ ...entry, size: 16 }), { message: /are corrupted/ });
+  } finally {
+    await zip.close();
+  }
+});
+
+test("zip reader throws an error for other files", async t => {
+  await t.throwsAsync(() => ZipReader.open("../samples/javascript/sample.js"), { message: /not a valid ZIP archive/ });
+});
@@ -1,4 +1,5 @@
 import { describe, it, expect } from "vitest";
+import { TokenEncoding } from "@dodona/dolos-core";
 import { parseFiles, DEFAULT_LABEL } from "./parseFiles";
 
 function makeRow(overrides: Record<string, string> = {}) {
@@ -88,4 +89,24 @@ describe("parseFiles", () => {
     expect(file.pseudo.path).toMatch(/\.js$/);
     expect(file.original.path).toBe("submissions/file.js");
   });
+
+  it("parses compact encoded tokens and mappings", () => {
+    const vocabulary = ["(", "program", ")"];
+    const row = makeRow({
+      ast: TokenEncoding.encodeTokens([0, 1, 2]),
+      mapping: TokenEncoding.encodeMapping(new Uint32Array([0, 0, 1, 4, 0, 0, 1, 4, 0, 0, 0, 0])),
+    });
+    const { files } = parseFiles([row], vocabulary);
+    expect(files[1].ast).toEqual(["(", "program", ")"]);
+    expect(files[1].mapping).toEqual([
+      { startRow: 0, startCol: 0, endRow: 1, endCol: 4 },
+      { startRow: 0, startCol: 0, endRow: 1, endCol: 4 },
+      { startRow: 0, startCol: 0, endRow: 0, endCol: 0 },
+    ]);
+  });
+
+  it("requires the vocabulary for compact encoded tokens", () => {
+    const row = makeRow({ ast: TokenEncoding.encodeTokens([0]) });
+    expect(() => parseFiles([row])).toThrow(/vocabulary/);
+  });
 });
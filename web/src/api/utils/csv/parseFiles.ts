@@ -1,5 +1,6 @@
 import { names, animals, uniqueNamesGenerator } from "unique-names-generator";
-import { File, Label, Legend } from "@/api/models";
+import { TokenEncoding } from "@dodona/dolos-core";
+import { File, Label, Legend, Selection } from "@/api/models";
 import { commonFilenamePrefix } from "@/api/utils/file";
 
 export const DEFAULT_LABEL: Label = {
@@ -26,7 +27,49 @@ export interface ParseFilesResult {
   hasTimestamps: boolean;
 }
 
-export function parseFiles(fileData: any[]): ParseFilesResult {
+/**
+ * Parse the `ast` column of a file. Reports written by older versions of Dolos
+ * store the tokens as a JSON array, newer ones in the compact encoding with
+ * indices in the vocabulary of the report (see TokenEncoding).
+ */
+export function parseAst(ast: string, vocabulary?: string[]): string[] {
+  if (!TokenEncoding.isCompact(ast)) {
+    return JSON.parse(ast);
+  }
+  if (vocabulary === undefined) {
+    throw new Error("The report does not contain the vocabulary of its tokens");
+  }
+  return TokenEncoding.decodeTokens(ast, vocabulary);
+}
+
+/**
+ * Parse the `mapping` column of a file, either a JSON array of selections or
+ * the compact encoding of the packed regions.
+ */
+export function parseMapping(mapping: string): Selection[] {
+  if (!TokenEncoding.isCompact(mapping)) {
+    return JSON.parse(mapping);
+  }
+  const packed = TokenEncoding.decodeMapping(mapping);
+  const selections = new Array<Selection>(packed.length / 4);
+  for (let i = 0; i < selections.length; i++) {
+    selections[i] = {
+      startRow: packed[4 * i],
+      startCol: packed[4 * i + 1],
+      endRow: packed[4 * i + 2],
+      endCol: packed[4 * i + 3],
+    };
+  }
+  return selections;
+}
+
+/**
+ * Parse the rows of files.csv.
+ * @param fileData The rows of the CSV file.
+ * @param vocabulary The vocabulary of the tokens of the report, stored in the
+ * metadata of reports with compact encoded tokens.
+ */
+export function parseFiles(fileData: any[], vocabulary?: string[]): ParseFilesResult {
   const randomName = (): string =>
     uniqueNamesGenerator({ dictionaries: [names], length: 1 });
   const randomLabel = (): string =>
@@ -49,8 +92,8 @@ export function parseFiles(fileData: any[]): ParseFilesResult {
     hasTimestamps = hasTimestamps || !!extra.timestamp;
     file.ignored = row.ignored === "true";
     file.extra = extra;
-    file.ast = JSON.parse(row.ast);
-    file.mapping = JSON.parse(row.mapping);
+    file.ast = parseAst(row.ast, vocabulary);
+    file.mapping = parseMapping(row.mapping);
     file.astAndMappingLoaded = true;
     file.amountOfKgrams = file.amountOfKgrams || file.ast.length;
 
@@ -8,7 +8,7 @@ import {
   PairedOccurrence,
   Hash,
 } from "@/api/models";
-import { Fragment as DolosFragment, FingerprintIndex, TokenizedFile, Pair as DolosPair } from "@dodona/dolos-core";
+import { Fragment as DolosFragment, FingerprintIndex, HashEngine, TokenizedFile, Pair as DolosPair } from "@dodona/dolos-core";
 
 // Parse a list of Dolos fragments into a list of fragment models.
 export function parseFragments(
@@ -72,7 +72,15 @@ export function populateFragments(
   const customOptions = metadata;
   const kmers = kgrams;
 
-  const index = new FingerprintIndex(customOptions.kgramLength, customOptions.kgramsInWindow);
+  // Reports created before the hash engine was configurable use the default
+  const hashEngine = HashEngine.byName(customOptions.hashEngine ?? HashEngine.default.name);
+  const index = new FingerprintIndex(
+    customOptions.kgramLength,
+    customOptions.kgramsInWindow,
+    false,
+    undefined,
+    hashEngine
+  );
   const leftFile = fileToTokenizedFile(pair.leftFile);
   const rightFile = fileToTokenizedFile(pair.rightFile);
   index.addFiles([leftFile, rightFile]);
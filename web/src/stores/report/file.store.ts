@@ -1,7 +1,7 @@
 import { defineStore } from "pinia";
 import { shallowRef, computed, watch, ref, ComputedRef } from "vue";
 import { File, Legend, Pair } from "@/api/models";
-import { useLoaderStore, useSettingsStore, usePairStore } from "@/stores/report";
+import { useLoaderStore, useSettingsStore, usePairStore, useMetadataStore } from "@/stores/report";
 import { useAppMode } from "@/composables";
 import { parseCsv, parseFiles } from "@/api/utils";
 import {
@@ -30,6 +30,7 @@ export const useFileStore = defineStore("file", () => {
   const loaderStore = useLoaderStore();
   const settingsStore = useSettingsStore();
   const pairStore = usePairStore();
+  const metadataStore = useMetadataStore();
   const { dataUrl } = useAppMode();
 
   // State
@@ -91,7 +92,9 @@ export const useFileStore = defineStore("file", () => {
   // Functions
 
   async function hydrate(): Promise<void> {
-    const parsed = parseFiles(await fetch());
+    // Reports with compact encoded tokens store their vocabulary in the metadata
+    const vocabulary = metadataStore.metadata.tokenVocabulary;
+    const parsed = parseFiles(await fetch(), vocabulary ? JSON.parse(vocabulary) : undefined);
     filesById.value = parsed.files;
     filesActiveById.value = parsed.files;
     ignoredFile.value = parsed.ignoredFile;